@@ -1,16 +1,28 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime, timedelta
+from datetime import datetime
+import atexit
 import json
 import time
 import random
 import os
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Text, MetaData, Table, ForeignKey, Boolean
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+import re
+
+from omnistream.checkpoint import Checkpointer
+from omnistream.engine import CHART_WIDTHS, PipelineEngine
+from omnistream.figcache import FigureCache
+from omnistream.ingestlog import DEFAULT_RETENTION_BYTES, DEFAULT_RETENTION_SECONDS, IngestLog
+from omnistream.latency import ALL_SOURCES, WINDOWS as LATENCY_WINDOWS
+from omnistream.lazy import lazy_import
+from omnistream.persistence import WriteBehindWriter
+from omnistream.stages import STAGE_LABELS
+from omnistream.views import source_status_frame
+
+# Plotly Express (and the pandas plotting glue it brings in) loads the first
+# time a figure is actually built, not on every cold start of the script
+px = lazy_import("plotly.express")
+go = lazy_import("plotly.graph_objects")
 
 # Set page configuration
 st.set_page_config(
@@ -21,7 +33,7 @@ st.set_page_config(
 )
 
 # Define CSS for custom styling
-st.markdown("""
+CUSTOM_CSS = """
 <style>
 /* Base text and background colors to ensure visibility */
 .stApp {
@@ -324,7 +336,17 @@ p, div, span, li, td, th, caption, h1, h2, h3, h4, h5, h6 {
     color: #1F2937 !important;
 }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+
+@st.cache_data
+def compact_css(css):
+    """Drop comments and collapse whitespace so every rerun sends a smaller style block"""
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.DOTALL)
+    return re.sub(r"\s+", " ", css).strip()
+
+
+st.markdown(compact_css(CUSTOM_CSS), unsafe_allow_html=True)
 
 # Add sidebar with additional information
 with st.sidebar:
@@ -337,10 +359,10 @@ with st.sidebar:
     all_sources = ["Stock Market API", "Weather API", "Social Media", "Retail", "IoT Sensors"]
     active_sources = st.multiselect("Active Sources", all_sources, default=all_sources)
     
-    # Fake refresh rate slider
+    # Interval at which the live dashboard sections refresh
     refresh_rate = st.slider("Update Frequency (sec)", 1, 60, 5)
     
-    # Fake time range selector
+    # Span of the metric history charts
     time_range = st.selectbox("Time Range", ["Last Hour", "Last Day", "Last Week", "Last Month"])
     
     # Fake environment selector
@@ -365,206 +387,42 @@ with st.sidebar:
     st.success("All Systems Operational")
     st.markdown("Last Updated: " + datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
 
-# Initialize state for demonstration
+def release_engine(engine):
+    """Stop the engine, which writes a final checkpoint and saves the entity index"""
+    engine.stop(timeout=5)
+
+
+@st.cache_resource(on_release=release_engine)
+def shared_engine():
+    """One headless pipeline engine per server process, shared by every viewer.
+
+    The engine is stopped when Streamlit evicts it from the cache and, as a
+    fallback, when the server process exits.
+    """
+    engine = PipelineEngine(
+        persistence=WriteBehindWriter(),
+        ingest_log=IngestLog(
+            os.environ.get("OMNISTREAM_LOG_DIR", "omnistream-log"),
+            retention_bytes=DEFAULT_RETENTION_BYTES,
+            retention_seconds=DEFAULT_RETENTION_SECONDS
+        ),
+        checkpoint=Checkpointer(
+            os.environ.get("OMNISTREAM_CHECKPOINT_DIR", "omnistream-checkpoints"),
+            interval=float(os.environ.get("OMNISTREAM_CHECKPOINT_INTERVAL", "10"))
+        ),
+        workers=int(os.environ.get("OMNISTREAM_WORKERS", "0")),
+        entity_dir=os.environ.get("OMNISTREAM_ENTITY_DIR", "omnistream-entities"),
+        metrics_port=int(os.environ["OMNISTREAM_METRICS_PORT"]) if os.environ.get("OMNISTREAM_METRICS_PORT") else None
+    ).start()
+    atexit.register(release_engine, engine)
+    return engine
+
+
+# Attach this session to the shared engine; the dashboard only reads its published snapshots
 if 'initialized' not in st.session_state:
     st.session_state.initialized = True
-    st.session_state.start_time = datetime.now()
-    st.session_state.last_update = datetime.now()
-    
-    # Initialize metrics and counters
-    st.session_state.data_sources = {
-        "stock_market": {
-            "name": "Stock Market API",
-            "status": "active",
-            "records_processed": 0,
-            "failures": 0,
-            "last_update": datetime.now() - timedelta(minutes=2),
-            "latency_ms": random.randint(50, 150),
-        },
-        "weather_data": {
-            "name": "Weather API",
-            "status": "active",
-            "records_processed": 0,
-            "failures": 0,
-            "last_update": datetime.now() - timedelta(minutes=3),
-            "latency_ms": random.randint(100, 250),
-        },
-        "social_media": {
-            "name": "Social Media Analytics",
-            "status": "active",
-            "records_processed": 0,
-            "failures": 0,
-            "last_update": datetime.now() - timedelta(minutes=1),
-            "latency_ms": random.randint(150, 300),
-        },
-        "retail_transactions": {
-            "name": "Retail Transactions",
-            "status": "active",
-            "records_processed": 0,
-            "failures": 0,
-            "last_update": datetime.now() - timedelta(minutes=4),
-            "latency_ms": random.randint(75, 200),
-        },
-        "iot_sensors": {
-            "name": "IoT Sensor Network",
-            "status": "active",
-            "records_processed": 0,
-            "failures": 0,
-            "last_update": datetime.now() - timedelta(minutes=2),
-            "latency_ms": random.randint(20, 80),
-        }
-    }
-    
-    st.session_state.processing_steps = [
-        "data_ingestion",
-        "data_validation",
-        "data_transformation",
-        "data_enrichment",
-        "data_loading",
-        "anomaly_detection"
-    ]
-    
-    st.session_state.pipeline_metrics = {
-        "total_records_processed": 0,
-        "total_errors": 0,
-        "overall_latency_ms": 0,
-        "data_quality_score": 98.5,
-        "pipeline_uptime": 99.98,
-        "active_sources": 5,
-        "active_destinations": 3,
-        "schema_violations": 0,
-        "data_drift_incidents": 0
-    }
-    
-    # Create some historical processing data
-    hours_back = 48
-    st.session_state.timeseries_data = {
-        "timestamps": [(datetime.now() - timedelta(hours=i)).strftime("%Y-%m-%d %H:%M:%S") for i in range(hours_back, 0, -1)],
-        "throughput": [random.randint(5000, 15000) for _ in range(hours_back)],
-        "latency": [random.randint(50, 500) for _ in range(hours_back)],
-        "error_rate": [random.uniform(0, 2) for _ in range(hours_back)],
-        "quality_score": [random.uniform(95, 100) for _ in range(hours_back)]
-    }
-    
-    # Recent alerts and events
-    st.session_state.alerts = []
-    st.session_state.events = []
-
-# Function to simulate real-time data updates
-def update_pipeline_metrics():
-    """Update pipeline metrics to simulate real-time processing"""
-    now = datetime.now()
-    
-    # Only update every 1-2 seconds to avoid excessive recomputation
-    if (now - st.session_state.last_update).total_seconds() < 1.5:
-        return
-    
-    # Update source metrics
-    for source_id, source in st.session_state.data_sources.items():
-        # Calculate records to process this cycle
-        time_diff = (now - source["last_update"]).total_seconds()
-        records_this_cycle = int(time_diff * random.randint(10, 50))
-        
-        # Determine if we should simulate a failure
-        failure_chance = 0.05  # 5% chance of failure
-        will_fail = random.random() < failure_chance
-        
-        if will_fail:
-            source["failures"] += 1
-            failure_type = random.choice([
-                "API Timeout", 
-                "Connection Error", 
-                "Authentication Failure",
-                "Rate Limit Exceeded",
-                "Malformed Response"
-            ])
-            
-            # Add an alert for the failure
-            st.session_state.alerts.append({
-                "timestamp": now.strftime("%Y-%m-%d %H:%M:%S"),
-                "source": source["name"],
-                "message": f"{failure_type} encountered when processing {source_id}",
-                "severity": "high" if failure_type in ["Authentication Failure", "Connection Error"] else "medium",
-                "status": "active"
-            })
-        
-        # Update metrics
-        source["records_processed"] += records_this_cycle
-        source["last_update"] = now
-        source["latency_ms"] = random.randint(
-            max(10, source["latency_ms"] - 20),
-            min(500, source["latency_ms"] + 20)
-        )
-        
-        # Log an event for large batches
-        if records_this_cycle > 30:
-            st.session_state.events.append({
-                "timestamp": now.strftime("%Y-%m-%d %H:%M:%S"),
-                "component": source["name"],
-                "message": f"Processed large batch: {records_this_cycle} records",
-                "type": "info"
-            })
-    
-    # Update overall pipeline metrics
-    total_records = sum(s["records_processed"] for s in st.session_state.data_sources.values())
-    new_records = total_records - st.session_state.pipeline_metrics["total_records_processed"]
-    
-    st.session_state.pipeline_metrics["total_records_processed"] = total_records
-    
-    # Calculate a weighted average latency
-    latencies = [s["latency_ms"] for s in st.session_state.data_sources.values()]
-    st.session_state.pipeline_metrics["overall_latency_ms"] = sum(latencies) / len(latencies)
-    
-    # Count total errors
-    total_errors = sum(s["failures"] for s in st.session_state.data_sources.values())
-    st.session_state.pipeline_metrics["total_errors"] = total_errors
-    
-    # Simulate occasional data quality issues
-    if random.random() < 0.1:  # 10% chance each update
-        quality_shift = random.uniform(-0.5, 0.2)
-        st.session_state.pipeline_metrics["data_quality_score"] = min(100, max(90, 
-            st.session_state.pipeline_metrics["data_quality_score"] + quality_shift
-        ))
-        
-        # If quality decreased significantly, add an alert
-        if quality_shift < -0.3:
-            st.session_state.alerts.append({
-                "timestamp": now.strftime("%Y-%m-%d %H:%M:%S"),
-                "source": "Data Quality Monitor",
-                "message": f"Data quality score decreased to {st.session_state.pipeline_metrics['data_quality_score']:.2f}%",
-                "severity": "medium",
-                "status": "active"
-            })
-            
-            # Also track as a schema violation or data drift
-            if random.random() < 0.5:
-                st.session_state.pipeline_metrics["schema_violations"] += 1
-            else:
-                st.session_state.pipeline_metrics["data_drift_incidents"] += 1
-    
-    # Update time series data
-    hour_key = now.strftime("%Y-%m-%d %H:00:00")
-    if hour_key not in st.session_state.timeseries_data["timestamps"]:
-        st.session_state.timeseries_data["timestamps"].append(hour_key)
-        st.session_state.timeseries_data["throughput"].append(new_records)
-        st.session_state.timeseries_data["latency"].append(st.session_state.pipeline_metrics["overall_latency_ms"])
-        
-        error_rate = 100 * total_errors / max(1, total_records)
-        st.session_state.timeseries_data["error_rate"].append(error_rate)
-        st.session_state.timeseries_data["quality_score"].append(st.session_state.pipeline_metrics["data_quality_score"])
-        
-        # Keep only the most recent data points
-        max_points = 48  # Two days worth of hourly data
-        if len(st.session_state.timeseries_data["timestamps"]) > max_points:
-            for key in st.session_state.timeseries_data:
-                st.session_state.timeseries_data[key] = st.session_state.timeseries_data[key][-max_points:]
-    
-    # Limit alerts and events to the most recent 20
-    st.session_state.alerts = st.session_state.alerts[-20:]
-    st.session_state.events = st.session_state.events[-20:]
-    
-    # Update the last update timestamp
-    st.session_state.last_update = now
+    st.session_state.engine = shared_engine()
+    st.session_state.figure_cache = FigureCache()
 
 # Simulate occasional full pipeline execution for demo
 def demo_full_pipeline_execution():
@@ -719,12 +577,11 @@ def demo_full_pipeline_execution():
         step_time = time.time() - step_start
         # Calculate total records for this step (20-100 records per substep)
         step_records = random.randint(100, 500) * len(step["substeps"])
-        st.session_state.events.append({
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "component": step["name"],
-            "message": f"{step['name']} completed in {step_time:.2f}s - processed {step_records} records",
-            "type": "success"
-        })
+        st.session_state.engine.add_event(
+            step["name"],
+            f"{step['name']} completed in {step_time:.2f}s - processed {step_records} records",
+            "success"
+        )
     
     # Final update
     total_time = time.time() - start_time
@@ -735,12 +592,11 @@ def demo_full_pipeline_execution():
     substep_status.markdown(f"Total records processed: {records_processed:,} in {total_time:.2f} seconds")
     
     # Add summary to events
-    st.session_state.events.append({
-        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "component": "Pipeline Manager",
-        "message": f"Full pipeline execution completed - {records_processed:,} records, {errors_found} errors, {quality_score:.1f}% quality score",
-        "type": "info"
-    })
+    st.session_state.engine.add_event(
+        "Pipeline Manager",
+        f"Full pipeline execution completed - {records_processed:,} records, {errors_found} errors, {quality_score:.1f}% quality score",
+        "info"
+    )
     
     # Pause briefly to show completion
     time.sleep(1)
@@ -769,12 +625,37 @@ tab1, tab2, tab3, tab4 = st.tabs([
     "📈 Performance Analytics"
 ])
 
-# Update metrics for real-time simulation
-update_pipeline_metrics()
+# Read a consistent view of the pipeline for this render
+pipeline = st.session_state.engine.snapshot()
+
+# Entries per page in the alert and event log explorer
+LOG_PAGE_SIZE = 25
+
+# History is published per time range for half- and full-width plots
+HALF_CHART_PX, FULL_CHART_PX = CHART_WIDTHS
+
+RESOLUTION_LABELS = {1: "1 s", 60: "1 min", 3600: "1 h", 86400: "1 day"}
+
+
+def add_range_band(fig, frame, column, color):
+    """Shade the min-max range of a history column, so spikes merged into a bucket stay visible"""
+    fig.add_trace(go.Scatter(x=frame.index, y=frame[f"{column}_max"], mode="lines",
+                             line=dict(width=0), hoverinfo="skip", showlegend=False))
+    fig.add_trace(go.Scatter(x=frame.index, y=frame[f"{column}_min"], mode="lines", line=dict(width=0),
+                             fill="tonexty", fillcolor=color, hoverinfo="skip", showlegend=False))
+
+
+def repeat_label(entry):
+    """Suffix for a coalesced log entry, e.g. (x12, last 10:42:07)"""
+    if entry["count"] <= 1:
+        return ""
+    return f' (x{entry["count"]}, last {entry["last_seen"].strftime("%H:%M:%S")})'
+
 
 # Tab 1: Pipeline Dashboard
-with tab1:
-    st.markdown('<p class="sub-header">Real-time Pipeline Monitoring</p>', unsafe_allow_html=True)
+def render_pipeline_monitoring():
+    """Live section of tab 1; reruns on its own at the sidebar's update frequency"""
+    pipeline = st.session_state.engine.snapshot()
     
     # System status overview
     st.markdown('<p class="section-title">System Status</p>', unsafe_allow_html=True)
@@ -784,25 +665,25 @@ with tab1:
     
     with col1:
         st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.markdown(f'<div class="metric-value">{st.session_state.pipeline_metrics["active_sources"]}/{len(st.session_state.data_sources)}</div>', unsafe_allow_html=True)
+        st.markdown(f'<div class="metric-value">{pipeline["pipeline_metrics"]["active_sources"]}/{len(pipeline["data_sources"])}</div>', unsafe_allow_html=True)
         st.markdown('<div class="metric-label">Active Data Sources</div>', unsafe_allow_html=True)
         st.markdown('</div>', unsafe_allow_html=True)
     
     with col2:
         st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.markdown(f'<div class="metric-value">{st.session_state.pipeline_metrics["total_records_processed"]:,}</div>', unsafe_allow_html=True)
+        st.markdown(f'<div class="metric-value">{pipeline["pipeline_metrics"]["total_records_processed"]:,}</div>', unsafe_allow_html=True)
         st.markdown('<div class="metric-label">Total Records Processed</div>', unsafe_allow_html=True)
         st.markdown('</div>', unsafe_allow_html=True)
     
     with col3:
         st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.markdown(f'<div class="metric-value">{st.session_state.pipeline_metrics["overall_latency_ms"]:.0f}ms</div>', unsafe_allow_html=True)
+        st.markdown(f'<div class="metric-value">{pipeline["pipeline_metrics"]["overall_latency_ms"]:.0f}ms</div>', unsafe_allow_html=True)
         st.markdown('<div class="metric-label">Avg Processing Latency</div>', unsafe_allow_html=True)
         st.markdown('</div>', unsafe_allow_html=True)
     
     with col4:
         st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.markdown(f'<div class="metric-value">{st.session_state.pipeline_metrics["data_quality_score"]:.1f}%</div>', unsafe_allow_html=True)
+        st.markdown(f'<div class="metric-value">{pipeline["pipeline_metrics"]["data_quality_score"]:.1f}%</div>', unsafe_allow_html=True)
         st.markdown('<div class="metric-label">Overall Data Quality</div>', unsafe_allow_html=True)
         st.markdown('</div>', unsafe_allow_html=True)
     
@@ -810,18 +691,7 @@ with tab1:
     st.markdown('<p class="section-title">Data Source Status</p>', unsafe_allow_html=True)
     
     # Create a dataframe for display
-    source_data = []
-    for source_id, source in st.session_state.data_sources.items():
-        source_data.append({
-            "Source Name": source["name"],
-            "Status": source["status"],
-            "Records Processed": f"{source['records_processed']:,}",
-            "Failures": source["failures"],
-            "Last Update": source["last_update"].strftime("%H:%M:%S"),
-            "Latency (ms)": source["latency_ms"]
-        })
-    
-    source_df = pd.DataFrame(source_data)
+    source_df = source_status_frame(pipeline["data_sources"])
     
     # Use Streamlit's dataframe with styling
     st.dataframe(
@@ -836,14 +706,14 @@ with tab1:
     with col1:
         st.markdown('<p class="section-title">Recent Alerts</p>', unsafe_allow_html=True)
         
-        if not st.session_state.alerts:
+        if not pipeline["alerts"]:
             st.info("No alerts to display.")
         else:
-            for alert in st.session_state.alerts[:5]:  # Show only the 5 most recent
+            for alert in pipeline["alerts"][:5]:  # Newest first
                 severity_class = "alert-card" if alert["severity"] == "high" else "warning-card"
                 st.markdown(f"""
                 <div class="{severity_class}">
-                    <small>{alert["timestamp"]}</small><br>
+                    <small>{alert["timestamp"]}{repeat_label(alert)}</small><br>
                     <strong>{alert["source"]}</strong>: {alert["message"]}
                 </div>
                 """, unsafe_allow_html=True)
@@ -851,38 +721,132 @@ with tab1:
     with col2:
         st.markdown('<p class="section-title">Recent Events</p>', unsafe_allow_html=True)
         
-        if not st.session_state.events:
+        if not pipeline["events"]:
             st.info("No events to display.")
         else:
-            for event in st.session_state.events[:5]:  # Show only the 5 most recent
+            for event in pipeline["events"][:5]:  # Newest first
                 event_class = "success-card" if event["type"] == "success" else "insight-card"
                 st.markdown(f"""
                 <div class="{event_class}">
-                    <small>{event["timestamp"]}</small><br>
+                    <small>{event["timestamp"]}{repeat_label(event)}</small><br>
                     <strong>{event["component"]}</strong>: {event["message"]}
                 </div>
                 """, unsafe_allow_html=True)
     
+    # Full alert and event history, paged through the engine's indexed log
+    with st.expander("Alert & Event Log"):
+        log_col1, log_col2, log_col3, log_col4 = st.columns(4)
+        with log_col1:
+            log_name = st.selectbox("Log", ["alerts", "events"], format_func=str.title, key="log_name")
+        level_field, source_field, source_label = (
+            ("severity", "source", "Source") if log_name == "alerts" else ("type", "component", "Component")
+        )
+        levels = ["high", "medium", "low"] if log_name == "alerts" else ["info", "success", "warning", "error"]
+        with log_col2:
+            log_level = st.selectbox(level_field.title(), ["All"] + levels, key="log_level")
+        _, _, log_sources = st.session_state.engine.query_log(log_name, page_size=0)
+        with log_col3:
+            log_source = st.selectbox(source_label, ["All"] + log_sources, key="log_source")
+        with log_col4:
+            log_page = st.number_input("Page", min_value=1, value=1, step=1, key="log_page")
+        
+        entries, total, _ = st.session_state.engine.query_log(
+            log_name,
+            level=None if log_level == "All" else log_level,
+            source=None if log_source == "All" else log_source,
+            page=int(log_page) - 1,
+            page_size=LOG_PAGE_SIZE
+        )
+        if entries:
+            st.dataframe(pd.DataFrame({
+                "First Seen": [e["timestamp"] for e in entries],
+                "Last Seen": [e["last_seen"].strftime("%Y-%m-%d %H:%M:%S") for e in entries],
+                "Count": [e["count"] for e in entries],
+                source_label: [e[source_field] for e in entries],
+                level_field.title(): [e[level_field] for e in entries],
+                "Message": [e["message"] for e in entries]
+            }), use_container_width=True, hide_index=True)
+        pages = max(1, -(-total // LOG_PAGE_SIZE))
+        st.caption(f"{total:,} entries, page {int(log_page)} of {pages}")
+    
     # Processing statistics
     st.markdown('<p class="section-title">Pipeline Processing Statistics</p>', unsafe_allow_html=True)
     
+    persistence = pipeline["persistence"]
+    if persistence:
+        st.caption(
+            f"Persistence ({persistence['database_url']}): {persistence['rows_written']:,} rows written, "
+            f"{persistence['pending']:,} pending, {persistence['rows_dropped']:,} dropped, "
+            f"last flush {persistence['last_flush_ms']:.1f} ms"
+            + ("" if persistence["schema_ready"] else f"; database not ready: {persistence['last_error']}")
+        )
+    executor = pipeline["executor"]
+    if executor["mode"] == "process":
+        st.caption(
+            f"Stage workers: {executor['workers']} processes, {executor['in_flight']}/{executor['max_pending']} "
+            f"batches in flight, {executor['batches_offloaded']:,} offloaded, "
+            f"{executor['submit_wait_s']:.1f}s waiting on backpressure"
+        )
+    exporter = pipeline["exporter"]
+    if exporter:
+        if exporter["error"]:
+            st.caption(f"Prometheus exporter not serving: {exporter['error']}")
+        else:
+            st.caption(f"Prometheus metrics at {exporter['address']} ({exporter['scrapes']:,} scrapes)")
+    anomalies = pipeline["anomaly_stats"]
+    st.caption(
+        f"Anomaly detection: {anomalies['series']:,} source x metric series, "
+        f"{anomalies['anomalies']:,} anomalies raised ({anomalies['active']:,} ongoing), "
+        f"last tick scored in {anomalies['last_score_ms']:.2f} ms"
+    )
+    ingest_log = pipeline["ingest_log"]
+    if ingest_log:
+        st.caption(
+            f"Ingestion log ({ingest_log['directory']}): {sum(p['end_offset'] for p in ingest_log['partitions']):,} "
+            f"batches appended, {sum(p['lag'] or 0 for p in ingest_log['partitions']):,} waiting, "
+            f"{sum(p['bytes'] for p in ingest_log['partitions']) / 1024 ** 2:.1f} MB on disk"
+        )
+    checkpoint = pipeline["checkpoint"]
+    if checkpoint:
+        recovery = pipeline["recovery"]
+        resumed = (
+            f"; resumed in {recovery['load_ms'] + recovery['apply_ms']:.0f} ms from a checkpoint "
+            f"{recovery['checkpoint_age_s']:.0f}s old" if recovery else ""
+        )
+        st.caption(
+            f"Checkpoints ({checkpoint['directory']}, every {checkpoint['interval_s']:g}s): "
+            f"{checkpoint['checkpoints']:,} written, last {checkpoint['last_bytes'] / 1024 ** 2:.1f} MB "
+            f"({checkpoint['last_capture_ms']:.1f} ms captured, {checkpoint['last_write_ms']:.1f} ms written)"
+            f"{resumed}"
+        )
+    
     # Throughput chart
-    if st.session_state.timeseries_data["timestamps"]:
-        throughput_df = pd.DataFrame({
-            "Timestamp": st.session_state.timeseries_data["timestamps"],
-            "Records Processed": st.session_state.timeseries_data["throughput"]
-        })
-        throughput_df["Timestamp"] = pd.to_datetime(throughput_df["Timestamp"])
-        
-        fig = px.line(
-            throughput_df, 
-            x="Timestamp", 
-            y="Records Processed",
-            title="Pipeline Throughput Over Time"
+    history = pipeline["timeseries"][time_range][FULL_CHART_PX]
+    if not history.empty:
+        # Graph objects directly: this chart draws on every rerun and Streamlit
+        # has already imported them, so the overview never loads Plotly Express
+        fig = go.Figure(go.Scatter(
+            x=history.index,
+            y=history["throughput"],
+            mode="lines",
+            name="Records/sec",
+        ))
+        add_range_band(fig, history, "throughput", "rgba(59, 130, 246, 0.2)")
+        fig.update_layout(
+            title=f"Pipeline Throughput, {time_range} ({RESOLUTION_LABELS[history.attrs['resolution']]} buckets)",
+            xaxis_title="Timestamp",
+            yaxis_title="Records/sec",
+            height=350,
+            showlegend=False
         )
-        fig.update_layout(height=350)
         st.plotly_chart(fig, use_container_width=True)
 
+with tab1:
+    st.markdown('<p class="sub-header">Real-time Pipeline Monitoring</p>', unsafe_allow_html=True)
+    
+    # Only this fragment reruns on the timer; the rest of the page renders once per interaction
+    st.fragment(run_every=refresh_rate)(render_pipeline_monitoring)()
+
 # Tab 2: Data Quality Metrics
 with tab2:
     st.markdown('<p class="sub-header">Data Quality Monitoring</p>', unsafe_allow_html=True)
@@ -894,24 +858,24 @@ with tab2:
     
     with quality_col1:
         st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.markdown(f'<div class="metric-value">{st.session_state.pipeline_metrics["data_quality_score"]:.1f}%</div>', unsafe_allow_html=True)
+        st.markdown(f'<div class="metric-value">{pipeline["pipeline_metrics"]["data_quality_score"]:.1f}%</div>', unsafe_allow_html=True)
         st.markdown('<div class="metric-label">Overall Quality Score</div>', unsafe_allow_html=True)
         st.markdown('</div>', unsafe_allow_html=True)
     
     with quality_col2:
         st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.markdown(f'<div class="metric-value">{st.session_state.pipeline_metrics["schema_violations"]}</div>', unsafe_allow_html=True)
+        st.markdown(f'<div class="metric-value">{pipeline["pipeline_metrics"]["schema_violations"]}</div>', unsafe_allow_html=True)
         st.markdown('<div class="metric-label">Schema Violations</div>', unsafe_allow_html=True)
         st.markdown('</div>', unsafe_allow_html=True)
     
     with quality_col3:
         st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.markdown(f'<div class="metric-value">{st.session_state.pipeline_metrics["data_drift_incidents"]}</div>', unsafe_allow_html=True)
+        st.markdown(f'<div class="metric-value">{pipeline["pipeline_metrics"]["data_drift_incidents"]}</div>', unsafe_allow_html=True)
         st.markdown('<div class="metric-label">Data Drift Incidents</div>', unsafe_allow_html=True)
         st.markdown('</div>', unsafe_allow_html=True)
     
     with quality_col4:
-        error_rate = 100 * st.session_state.pipeline_metrics["total_errors"] / max(1, st.session_state.pipeline_metrics["total_records_processed"])
+        error_rate = 100 * pipeline["pipeline_metrics"]["total_errors"] / max(1, pipeline["pipeline_metrics"]["total_records_processed"])
         st.markdown('<div class="metric-card">', unsafe_allow_html=True)
         st.markdown(f'<div class="metric-value">{error_rate:.2f}%</div>', unsafe_allow_html=True)
         st.markdown('<div class="metric-label">Error Rate</div>', unsafe_allow_html=True)
@@ -920,25 +884,20 @@ with tab2:
     # Quality trend chart
     st.markdown('<p class="section-title">Data Quality Trends</p>', unsafe_allow_html=True)
     
-    if st.session_state.timeseries_data["timestamps"]:
-        quality_df = pd.DataFrame({
-            "Timestamp": st.session_state.timeseries_data["timestamps"],
-            "Quality Score": st.session_state.timeseries_data["quality_score"],
-            "Error Rate": st.session_state.timeseries_data["error_rate"]
-        })
-        quality_df["Timestamp"] = pd.to_datetime(quality_df["Timestamp"])
+    quality_df = pipeline["timeseries"][time_range][FULL_CHART_PX]
+    if not quality_df.empty:
         
         fig = go.Figure()
         fig.add_trace(go.Scatter(
-            x=quality_df["Timestamp"], 
-            y=quality_df["Quality Score"],
+            x=quality_df.index, 
+            y=quality_df["quality_score"],
             mode='lines',
             name='Quality Score (%)',
             line=dict(color='#3B82F6', width=2)
         ))
         fig.add_trace(go.Scatter(
-            x=quality_df["Timestamp"], 
-            y=quality_df["Error Rate"],
+            x=quality_df.index, 
+            y=quality_df["error_rate"],
             mode='lines',
             name='Error Rate (%)',
             line=dict(color='#EF4444', width=2),
@@ -966,70 +925,45 @@ with tab2:
     # Data Quality Rules
     st.markdown('<p class="section-title">Automated Data Quality Rules</p>', unsafe_allow_html=True)
     
-    # Sample quality rules
-    quality_rules = [
-        {
-            "rule_id": "QR-001",
-            "name": "Completeness Check",
-            "description": "Ensures critical fields are not null",
-            "target": "All Sources",
-            "severity": "High",
-            "status": "Active"
-        },
-        {
-            "rule_id": "QR-002",
-            "name": "Range Validation",
-            "description": "Validates numerical values fall within expected ranges",
-            "target": "Stock Market API, IoT Sensor Network",
-            "severity": "Medium",
-            "status": "Active"
-        },
-        {
-            "rule_id": "QR-003",
-            "name": "Format Validation",
-            "description": "Checks string fields match expected formats (email, phone, etc.)",
-            "target": "Social Media Analytics, Retail Transactions",
-            "severity": "Medium",
-            "status": "Active"
-        },
-        {
-            "rule_id": "QR-004",
-            "name": "Freshness Check",
-            "description": "Ensures data is not older than predefined threshold",
-            "target": "All Sources",
-            "severity": "High",
-            "status": "Active"
-        },
-        {
-            "rule_id": "QR-005",
-            "name": "Consistency Check",
-            "description": "Verifies related data points are consistent across sources",
-            "target": "All Sources",
-            "severity": "Medium",
-            "status": "Active"
-        },
-        {
-            "rule_id": "QR-006",
-            "name": "Statistical Validation",
-            "description": "Applies statistical tests to identify outliers",
-            "target": "Stock Market API, Weather API, IoT Sensor Network",
-            "severity": "Low",
-            "status": "Active"
-        },
-        {
-            "rule_id": "QR-007",
-            "name": "Referential Integrity",
-            "description": "Ensures foreign key references are valid",
-            "target": "Retail Transactions",
-            "severity": "High",
-            "status": "Active"
-        }
-    ]
+    # Rules evaluated by the quality engine, with live violation counts
+    rules_df = pd.DataFrame([{
+        "rule_id": rule["rule_id"],
+        "name": rule["name"],
+        "description": rule["description"],
+        "target": rule["target"],
+        "severity": rule["severity"],
+        "status": rule["status"],
+        "violations": rule["violations"],
+        "violation rate (%)": round(rule["violation_rate"], 3),
+        "rows/sec": round(rule["rows_per_sec"])
+    } for rule in pipeline["quality_rules"]])
     
     # Display rules as a table
-    rules_df = pd.DataFrame(quality_rules)
     st.dataframe(rules_df, use_container_width=True, hide_index=True)
-    
+
+    # Drift scores of every tracked column's live window against its reference window
+    st.markdown('<p class="section-title">Data Drift Monitoring</p>', unsafe_allow_html=True)
+
+    drift_stats = pipeline["drift_stats"]
+    st.caption(
+        f"{drift_stats['columns']} columns sketched in {drift_stats['sketch_bytes'] / 1024:.0f} KB, "
+        f"checked on every batch: {drift_stats['us_per_batch']:.0f} µs per batch, "
+        f"{drift_stats['rows_per_sec']:,.0f} rows/sec"
+    )
+    if pipeline["drift_columns"]:
+        drift_df = pd.DataFrame([{
+            "source": pipeline["data_sources"][row["source"]]["name"],
+            "column": row["column"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "PSI": None if row["psi"] is None else round(row["psi"], 3),
+            "KS": None if row["ks"] is None else round(row["ks"], 3),
+            "live rows": row["live_rows"],
+            "windows": row["windows"],
+            "incidents": row["incidents"],
+        } for row in pipeline["drift_columns"]])
+        st.dataframe(drift_df, use_container_width=True, hide_index=True)
+
     # Data Enrichment Processes
     st.markdown('<p class="section-title">Data Enrichment Processes</p>', unsafe_allow_html=True)
     
@@ -1048,6 +982,12 @@ with tab2:
             </ul>
         </div>
         """, unsafe_allow_html=True)
+        geo = pipeline["geo_stats"]
+        st.caption(
+            f"{geo['resolved']:,} of {geo['records']:,} located records matched to {geo['places']} places, "
+            f"{geo['cells']:,} geohash cells cached ({geo['cell_hit_rate']:.0%} hit rate), "
+            f"{geo['us_per_record']:.0f} µs per record"
+        )
         
         st.markdown("""
         <div class="insight-card">
@@ -1061,7 +1001,13 @@ with tab2:
             </ul>
         </div>
         """, unsafe_allow_html=True)
-    
+        calendar = pipeline["calendar_stats"]
+        st.caption(
+            f"{calendar['records']:,} records tagged from calendar tables for {calendar['years'][0]}–"
+            f"{calendar['years'][1]} in {calendar['zones']} time zones ({calendar['table_bytes'] / 1024:.0f} KB), "
+            f"{calendar['us_per_record']:.0f} µs per record"
+        )
+
     with enrichment_col2:
         st.markdown("""
         <div class="insight-card">
@@ -1075,6 +1021,13 @@ with tab2:
             </ul>
         </div>
         """, unsafe_allow_html=True)
+        entities = pipeline["entity_stats"]
+        st.caption(
+            f"{entities['entities']:,} entities indexed ({entities['index_bytes'] / 1024:.0f} KB"
+            f"{', memory-mapped' if entities['mapped'] else ''}), {entities['keys_matched']:,} of "
+            f"{entities['keys_resolved']:,} keys matched, {entities['candidates_per_key']:.1f} candidates "
+            f"compared per key, {entities['us_per_record']:.0f} µs per record"
+        )
         
         st.markdown("""
         <div class="insight-card">
@@ -1151,20 +1104,25 @@ with tab3:
         <div class="insight-card">
             <strong>Data Ingestion Layer</strong>
             <p class="technical-details">
-            Implements Apache Kafka for stream processing and Apache Airflow for orchestration of batch workflows. 
-            Custom connectors handle API integration with rate limiting and automatic retries. Data sources are 
-            monitored through a Prometheus-based health check system.
+            Connectors append every fetched batch to a local, Kafka-like partitioned log: segmented files
+            with a sparse offset index, read through memory maps and trimmed by size and age. The stages
+            consume it at their own pace, so a slow stage never stalls a source and a crash loses nothing
+            already ingested. Custom connectors handle API integration with rate limiting and automatic retries.
             </p>
             <pre class="code-block">
-# Example Kafka Consumer Configuration
-consumer_config = {
-    'bootstrap.servers': 'kafka-broker:9092',
-    'group.id': 'financial-data-processor',
-    'auto.offset.reset': 'earliest',
-    'enable.auto.commit': False,
-    'max.poll.interval.ms': 300000,
-    'session.timeout.ms': 30000
-}
+# Ingestion log and consumer (omnistream.ingestlog)
+ingest_log = IngestLog(
+    'omnistream-log',                    # one directory per topic partition
+    segment_bytes=16 * 1024 * 1024,      # roll to a new segment file
+    index_interval_bytes=4096,           # sparse offset index density
+    retention_bytes=256 * 1024 * 1024,   # per partition
+    retention_seconds=24 * 3600
+)
+consumer = LogConsumer(ingest_log, topics=sources)  # earliest offset
+records = consumer.poll(max_messages=1000)
+
+# Offsets and running state, committed atomically off the tick thread
+checkpointer = Checkpointer('omnistream-checkpoints', interval=10.0)
             </pre>
         </div>
         """, unsafe_allow_html=True)
@@ -1272,68 +1230,60 @@ DATA_QUALITY_SCORE = Gauge(
             </pre>
         </div>
         """, unsafe_allow_html=True)
+    
+    # Partitions of the local ingestion log and how far the stages are behind
+    ingest_log = pipeline["ingest_log"]
+    if ingest_log:
+        st.markdown('<p class="section-title">Ingestion Log</p>', unsafe_allow_html=True)
+        st.dataframe(pd.DataFrame({
+            "Topic": [p["topic"] for p in ingest_log["partitions"]],
+            "Partition": [p["partition"] for p in ingest_log["partitions"]],
+            "Log Start": [p["start_offset"] for p in ingest_log["partitions"]],
+            "Log End": [p["end_offset"] for p in ingest_log["partitions"]],
+            "Consumer Position": [p["position"] for p in ingest_log["partitions"]],
+            "Lag": [p["lag"] for p in ingest_log["partitions"]],
+            "Segments": [p["segments"] for p in ingest_log["partitions"]],
+            "Size (MB)": [round(p["bytes"] / 1024 ** 2, 2) for p in ingest_log["partitions"]],
+        }), use_container_width=True, hide_index=True)
+        st.caption(
+            f"{ingest_log['messages_consumed']:,} batches consumed, {ingest_log['messages_skipped']:,} skipped by "
+            f"retention, {ingest_log['append_ms']:,.0f} ms spent appending, {ingest_log['log_errors']:,} append errors"
+        )
 
 # Tab 4: Performance Analytics
-with tab4:
-    st.markdown('<p class="sub-header">Performance Metrics & Analytics</p>', unsafe_allow_html=True)
-    
-    # Performance metrics
-    perf_col1, perf_col2, perf_col3, perf_col4 = st.columns(4)
-    
-    with perf_col1:
-        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.markdown(f'<div class="metric-value">{st.session_state.pipeline_metrics["pipeline_uptime"]}%</div>', unsafe_allow_html=True)
-        st.markdown('<div class="metric-label">Pipeline Uptime</div>', unsafe_allow_html=True)
-        st.markdown('</div>', unsafe_allow_html=True)
-    
-    with perf_col2:
-        avg_throughput = sum(st.session_state.timeseries_data["throughput"][-5:]) / 5 if st.session_state.timeseries_data["throughput"] else 0
-        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.markdown(f'<div class="metric-value">{avg_throughput:.0f}</div>', unsafe_allow_html=True)
-        st.markdown('<div class="metric-label">Avg Records/Hour</div>', unsafe_allow_html=True)
-        st.markdown('</div>', unsafe_allow_html=True)
-    
-    with perf_col3:
-        avg_latency = sum(st.session_state.timeseries_data["latency"][-5:]) / 5 if st.session_state.timeseries_data["latency"] else 0
-        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.markdown(f'<div class="metric-value">{avg_latency:.0f}ms</div>', unsafe_allow_html=True)
-        st.markdown('<div class="metric-label">Avg Processing Latency</div>', unsafe_allow_html=True)
-        st.markdown('</div>', unsafe_allow_html=True)
+def cached_chart(name, version, build):
+    """Render a figure from the figure cache, rebuilding it only when its input version changed"""
+    figure_cache = st.session_state.figure_cache
+    fig = figure_cache.get(name, version, build)
+    started = time.perf_counter()
+    st.plotly_chart(fig, use_container_width=True)
+    figure_cache.record_render(name, time.perf_counter() - started)
+
+
+def render_latency_subtab(pipeline):
+    """Latency Metrics sub-tab of Performance Analytics"""
+    versions = pipeline["versions"]
     
-    with perf_col4:
-        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.markdown(f'<div class="metric-value">{len(st.session_state.processing_steps)}</div>', unsafe_allow_html=True)
-        st.markdown('<div class="metric-label">Processing Stages</div>', unsafe_allow_html=True)
-        st.markdown('</div>', unsafe_allow_html=True)
+    st.markdown("### Processing Latency Analysis")
     
-    # Enhanced Performance Dashboard
-    st.markdown('<p class="section-title">Performance Dashboard</p>', unsafe_allow_html=True)
-    
-    # Create a multi-metric dashboard using tabs within the tab
-    perf_subtabs = st.tabs(["Latency Metrics", "Throughput Analysis", "Resource Utilization", "Error Tracking"])
+    # Dual chart layout
+    lat_col1, lat_col2 = st.columns(2)
     
-    with perf_subtabs[0]:  # Latency Metrics
-        st.markdown("### Processing Latency Analysis")
-        
-        # Dual chart layout
-        lat_col1, lat_col2 = st.columns(2)
-        
-        with lat_col1:
-            # Latency over time chart
-            if st.session_state.timeseries_data["timestamps"]:
-                latency_df = pd.DataFrame({
-                    "Timestamp": st.session_state.timeseries_data["timestamps"],
-                    "Latency (ms)": st.session_state.timeseries_data["latency"]
-                })
-                latency_df["Timestamp"] = pd.to_datetime(latency_df["Timestamp"])
-                
+    with lat_col1:
+        # Latency over time chart
+        history = pipeline["timeseries"][time_range][HALF_CHART_PX]
+        if not history.empty:
+            latency_df = history.rename(columns={"latency": "Latency (ms)"})
+            
+            def build_latency_trend():
                 fig = px.line(
                     latency_df, 
-                    x="Timestamp", 
+                    x=latency_df.index, 
                     y="Latency (ms)",
                     title="Processing Latency Over Time",
                     labels={"Latency (ms)": "Processing Time (ms)"}
                 )
+                add_range_band(fig, latency_df, "latency", "rgba(99, 110, 250, 0.15)")
                 fig.update_layout(
                     height=350,
                     xaxis_title="Time",
@@ -1350,29 +1300,40 @@ with tab4:
                         gridcolor='#E5E7EB',
                     ),
                 )
-                st.plotly_chart(fig, use_container_width=True)
+                return fig
+            cached_chart("latency_trend", (versions["timeseries"], time_range), build_latency_trend)
+    
+    # Percentiles come from streaming histograms over the selected sliding window
+    window = st.session_state.get("latency_window", "5m")
+    percentile_rows = [r for r in pipeline["latency_percentiles"] if r["window"] == window]
+    source_names = {source_id: s["name"] for source_id, s in pipeline["data_sources"].items()}
+    
+    with lat_col2:
+        # End-to-end latency percentiles by data source - grouped bar chart
+        source_rows = [r for r in percentile_rows if r["stage"] == "end_to_end" and r["source"] != ALL_SOURCES]
+        source_latencies = pd.DataFrame({
+            "Source": [source_names.get(r["source"], r["source"]) for r in source_rows],
+            "p50": [r["p50"] for r in source_rows],
+            "p90": [r["p90"] for r in source_rows],
+            "p99": [r["p99"] for r in source_rows]
+        })
         
-        with lat_col2:
-            # Latency by data source - bar chart
-            source_latencies = pd.DataFrame({
-                "Source": [s["name"] for s in st.session_state.data_sources.values()],
-                "Latency (ms)": [s["latency_ms"] for s in st.session_state.data_sources.values()]
-            })
-            
-            fig = px.bar(
-                source_latencies,
-                x="Source",
-                y="Latency (ms)",
-                title="Latency by Data Source",
-                color="Latency (ms)",
-                color_continuous_scale="blues",
-                labels={"Latency (ms)": "Avg Latency (ms)"}
-            )
+        def build_latency_by_source():
+            fig = go.Figure()
+            for column, color in (("p50", "#BFDBFE"), ("p90", "#3B82F6"), ("p99", "#1E40AF")):
+                fig.add_trace(go.Bar(
+                    x=source_latencies["Source"],
+                    y=source_latencies[column],
+                    name=column,
+                    marker_color=color,
+                    hovertemplate="%{x}: %{y:.1f} ms (" + column + ")<extra></extra>"
+                ))
             fig.update_layout(
+                title=f"End-to-End Latency by Data Source ({window})",
+                barmode='group',
                 height=350,
                 xaxis_title="Data Source",
                 yaxis_title="Latency (ms)",
-                coloraxis_showscale=False,
                 margin=dict(l=10, r=10, t=50, b=10),
                 plot_bgcolor="white",
                 xaxis=dict(
@@ -1383,58 +1344,51 @@ with tab4:
                     showgrid=True,
                     gridcolor='#E5E7EB',
                 ),
+                legend=dict(
+                    orientation="h",
+                    yanchor="bottom",
+                    y=1.02,
+                    xanchor="right",
+                    x=1
+                )
             )
-            st.plotly_chart(fig, use_container_width=True)
-        
-        # Detailed latency breakdown
-        st.markdown("### Latency Breakdown by Processing Stage")
-        
-        # Generate simulated latency breakdown by stage
-        stages = ["Data Ingestion", "Data Validation", "Transformation", "Enrichment", "Loading", "Post-Processing"]
-        stage_lat_data = pd.DataFrame({
-            "Stage": stages,
-            "Avg Latency (ms)": [random.randint(20, 120) for _ in range(len(stages))],
-            "Min Latency (ms)": [random.randint(10, 40) for _ in range(len(stages))],
-            "Max Latency (ms)": [random.randint(150, 350) for _ in range(len(stages))]
-        })
-        
-        # Plot stacked bar chart for min/avg/max latency by stage
+            return fig
+        cached_chart("latency_by_source", (versions["sources"], window), build_latency_by_source)
+    
+    # Detailed latency breakdown
+    st.markdown("### Latency Breakdown by Processing Stage")
+    st.radio("Percentile window", list(LATENCY_WINDOWS), index=list(LATENCY_WINDOWS).index(window),
+             horizontal=True, key="latency_window")
+    
+    # Tail percentiles per stage, merged across all sources
+    stage_rows = {r["stage"]: r for r in percentile_rows if r["source"] == ALL_SOURCES}
+    stage_order = [step for step in pipeline["processing_steps"] if step in stage_rows]
+    stage_lat_data = pd.DataFrame({
+        "Stage": [STAGE_LABELS.get(step, step) for step in stage_order],
+        "p50": [stage_rows[step]["p50"] for step in stage_order],
+        "p90": [stage_rows[step]["p90"] for step in stage_order],
+        "p99": [stage_rows[step]["p99"] for step in stage_order],
+        "p99.9": [stage_rows[step]["p99.9"] for step in stage_order]
+    })
+    
+    # Plot grouped bar chart of latency percentiles by stage
+    def build_stage_latency():
         fig = go.Figure()
         
-        # Add min latency bars
-        fig.add_trace(go.Bar(
-            y=stage_lat_data["Stage"],
-            x=stage_lat_data["Min Latency (ms)"],
-            name="Min Latency",
-            orientation='h',
-            marker=dict(color="#BFDBFE"),
-            hovertemplate="%{y}: %{x} ms (min)<extra></extra>"
-        ))
-        
-        # Add average latency bars (the difference between avg and min)
-        fig.add_trace(go.Bar(
-            y=stage_lat_data["Stage"],
-            x=stage_lat_data["Avg Latency (ms)"] - stage_lat_data["Min Latency (ms)"],
-            name="Avg Latency",
-            orientation='h',
-            marker=dict(color="#3B82F6"),
-            hovertemplate="%{y}: %{x} ms (avg portion)<extra></extra>"
-        ))
-        
-        # Add max latency bars (the difference between max and avg)
-        fig.add_trace(go.Bar(
-            y=stage_lat_data["Stage"],
-            x=stage_lat_data["Max Latency (ms)"] - stage_lat_data["Avg Latency (ms)"],
-            name="Max Latency",
-            orientation='h',
-            marker=dict(color="#1E40AF"),
-            hovertemplate="%{y}: %{x} ms (max portion)<extra></extra>"
-        ))
+        for column, color in (("p50", "#BFDBFE"), ("p90", "#60A5FA"), ("p99", "#2563EB"), ("p99.9", "#1E3A8A")):
+            fig.add_trace(go.Bar(
+                y=stage_lat_data["Stage"],
+                x=stage_lat_data[column],
+                name=column,
+                orientation='h',
+                marker=dict(color=color),
+                hovertemplate="%{y}: %{x:.2f} ms (" + column + ")<extra></extra>"
+            ))
         
         # Customize layout
         fig.update_layout(
-            title="Latency Distribution by Processing Stage",
-            barmode='stack',
+            title=f"Latency Percentiles by Processing Stage ({window})",
+            barmode='group',
             height=400,
             margin=dict(l=10, r=10, t=50, b=10),
             plot_bgcolor="white",
@@ -1446,7 +1400,7 @@ with tab4:
             yaxis=dict(
                 title="Processing Stage",
                 showgrid=False,
-                categoryorder='total ascending'
+                autorange="reversed"
             ),
             legend=dict(
                 orientation="h",
@@ -1456,29 +1410,61 @@ with tab4:
                 x=1
             )
         )
-        st.plotly_chart(fig, use_container_width=True)
+        return fig
+    cached_chart("stage_latency", (versions["sources"], window), build_stage_latency)
+    
+    # p99 for every source x stage pair in the window
+    with st.expander("p99 Latency by Source and Stage (ms)"):
+        p99_rows = [r for r in percentile_rows if r["source"] != ALL_SOURCES]
+        if p99_rows:
+            p99_table = pd.DataFrame(p99_rows).pivot(index="source", columns="stage", values="p99")
+            p99_table = p99_table.rename(index=source_names, columns=STAGE_LABELS)
+            st.dataframe(p99_table.round(2), use_container_width=True)
+        else:
+            st.caption("No latencies recorded in this window yet")
+    
+    stage_stats = pipeline["stage_stats"]
+    
+    # Measured stage execution totals; the slowest stage per record is the bottleneck
+    st.markdown("### Stage Execution Statistics")
+    stage_table = pd.DataFrame({
+        "Stage": [s["label"] for s in stage_stats],
+        "Batches": [s["batches"] for s in stage_stats],
+        "Records In": [s["records_in"] for s in stage_stats],
+        "Records Out": [s["records_out"] for s in stage_stats],
+        "Errors": [s["errors"] for s in stage_stats],
+        "Wall Time (s)": [round(s["wall_time_s"], 3) for s in stage_stats],
+        "Records/sec": [round(s["records_per_sec"]) for s in stage_stats]
+    })
+    st.dataframe(stage_table, use_container_width=True, hide_index=True)
+    if any(s["batches"] for s in stage_stats):
+        bottleneck = max(stage_stats, key=lambda s: s["wall_time_s"])
+        st.markdown(f"Bottleneck stage: **{bottleneck['label']}** "
+                    f"({bottleneck['wall_time_s']:.2f}s total, {bottleneck['records_per_sec']:,.0f} records/sec)")
+
+
+def render_throughput_subtab(pipeline):
+    """Throughput Analysis sub-tab of Performance Analytics"""
+    versions = pipeline["versions"]
     
-    with perf_subtabs[1]:  # Throughput Analysis
-        st.markdown("### Data Throughput Metrics")
-        
-        # Create throughput visualization
-        throughput_col1, throughput_col2 = st.columns(2)
-        
-        with throughput_col1:
-            # Throughput over time
-            if st.session_state.timeseries_data["timestamps"]:
-                throughput_df = pd.DataFrame({
-                    "Timestamp": st.session_state.timeseries_data["timestamps"],
-                    "Records Processed": st.session_state.timeseries_data["throughput"]
-                })
-                throughput_df["Timestamp"] = pd.to_datetime(throughput_df["Timestamp"])
-                
+    st.markdown("### Data Throughput Metrics")
+    
+    # Create throughput visualization
+    throughput_col1, throughput_col2 = st.columns(2)
+    
+    with throughput_col1:
+        # Throughput over time
+        history = pipeline["timeseries"][time_range][HALF_CHART_PX]
+        if not history.empty:
+            throughput_df = history.rename(columns={"throughput": "Records Processed"})
+            
+            def build_throughput_trend():
                 fig = px.area(
                     throughput_df, 
-                    x="Timestamp", 
+                    x=throughput_df.index, 
                     y="Records Processed",
                     title="Pipeline Throughput Over Time",
-                    labels={"Records Processed": "Records/Hour"}
+                    labels={"Records Processed": "Records/sec"}
                 )
                 fig.update_traces(
                     fill='tozeroy', 
@@ -1488,7 +1474,7 @@ with tab4:
                 fig.update_layout(
                     height=350,
                     xaxis_title="Time",
-                    yaxis_title="Records Processed",
+                    yaxis_title="Records/sec",
                     hovermode="x unified",
                     margin=dict(l=10, r=10, t=50, b=10),
                     plot_bgcolor="white",
@@ -1501,17 +1487,19 @@ with tab4:
                         gridcolor='#E5E7EB',
                     ),
                 )
-                st.plotly_chart(fig, use_container_width=True)
-                
-        with throughput_col2:
-            # Throughput by source - Donut chart
-            source_throughput = pd.DataFrame({
-                "Source": [s["name"] for s in st.session_state.data_sources.values()],
-                "Records": [s["records_processed"] for s in st.session_state.data_sources.values()]
-            })
+                return fig
+            cached_chart("throughput_trend", (versions["timeseries"], time_range), build_throughput_trend)
             
-            # Only generate chart if there's data
-            if sum(source_throughput["Records"]) > 0:
+    with throughput_col2:
+        # Throughput by source - Donut chart
+        source_throughput = pd.DataFrame({
+            "Source": [s["name"] for s in pipeline["data_sources"].values()],
+            "Records": [s["records_processed"] for s in pipeline["data_sources"].values()]
+        })
+        
+        # Only generate chart if there's data
+        if sum(source_throughput["Records"]) > 0:
+            def build_volume_by_source():
                 fig = px.pie(
                     source_throughput,
                     values="Records",
@@ -1530,13 +1518,16 @@ with tab4:
                     showlegend=False,
                     margin=dict(l=10, r=10, t=50, b=10),
                 )
-                st.plotly_chart(fig, use_container_width=True)
-            else:
-                st.info("No throughput data available yet. Please wait for data processing to begin.")
-        
-        # Hourly throughput patterns - grouped bar chart
-        st.markdown("### Throughput by Hour of Day")
-        
+                return fig
+            cached_chart("volume_by_source", versions["sources"], build_volume_by_source)
+        else:
+            st.info("No throughput data available yet. Please wait for data processing to begin.")
+    
+    # Hourly throughput patterns - grouped bar chart
+    st.markdown("### Throughput by Hour of Day")
+    
+    # Plot grouped bar chart
+    def build_hourly_patterns():
         # Create simulated hourly pattern data (more realistic pattern)
         hours = list(range(24))
         hourly_patterns = pd.DataFrame({
@@ -1545,7 +1536,6 @@ with tab4:
             "Weekend": [random.randint(3000, 7000) if 10 <= h <= 16 else random.randint(500, 2500) for h in hours]
         })
         
-        # Plot grouped bar chart
         fig = go.Figure()
         
         fig.add_trace(go.Bar(
@@ -1590,28 +1580,47 @@ with tab4:
                 x=0.99
             )
         )
-        st.plotly_chart(fig, use_container_width=True)
+        return fig
+    cached_chart("hourly_patterns", 0, build_hourly_patterns)
 
-    with perf_subtabs[2]:  # Resource Utilization
-        st.markdown("### System Resource Utilization")
-        
-        # Generate some simulated resource usage for the demo
-        resources = pd.DataFrame({
-            "Resource": ["Main Processing Cluster", "Data Validation Workers", "Enrichment Nodes", "Edge Collectors"],
-            "CPU (%)": [random.uniform(30, 80) for _ in range(4)],
-            "Memory (%)": [random.uniform(40, 90) for _ in range(4)],
-            "Disk IO (MB/s)": [random.uniform(5, 150) for _ in range(4)],
-            "Network (MB/s)": [random.uniform(10, 200) for _ in range(4)]
-        })
-        
-        # Display resource usage
-        st.dataframe(resources, use_container_width=True, hide_index=True)
-        
-        # Add resource utilization charts
-        resource_col1, resource_col2 = st.columns(2)
-        
-        with resource_col1:
-            # CPU and Memory utilization - bar chart
+
+def render_resource_subtab(pipeline):
+    """Resource Utilization sub-tab of Performance Analytics"""
+    versions = pipeline["versions"]
+    
+    st.markdown("### System Resource Utilization")
+    
+    resource_stats = pipeline["resource_stats"]
+    if not resource_stats["available"] or not pipeline["resources"]:
+        st.info("Resource samples appear here once the engine has read /proc twice (Linux only).")
+        return
+    
+    # Sampled from /proc for the engine's processes and threads; processes first, busiest first
+    resources = pd.DataFrame(pipeline["resources"]).rename(columns={
+        "component": "Resource",
+        "kind": "Kind",
+        "cpu_pct": "CPU (%)",
+        "memory_pct": "Memory (%)",
+        "disk_mb_s": "Disk IO (MB/s)",
+        "syscall_mb_s": "Read/Write Syscalls (MB/s)",
+        "threads": "Threads",
+    })
+    resources = resources.sort_values(["Kind", "CPU (%)"], ascending=[True, False], ignore_index=True)
+    
+    # Display resource usage
+    st.dataframe(resources, use_container_width=True, hide_index=True)
+    st.caption(
+        f"CPU is a percentage of one core ({resource_stats['cpu_count']} available); memory is resident set "
+        f"size as a share of host RAM. Sampled every {resource_stats['interval_s']:g}s at "
+        f"{resource_stats['overhead_pct']:.2f}% of a core."
+    )
+    
+    # Add resource utilization charts
+    resource_col1, resource_col2 = st.columns(2)
+    
+    with resource_col1:
+        # CPU and Memory utilization - bar chart
+        def build_cpu_memory():
             fig = go.Figure()
             
             # Add bars for CPU usage
@@ -1638,7 +1647,7 @@ with tab4:
             fig.add_shape(
                 type="line",
                 x0=80, y0=-0.5,
-                x1=80, y1=3.5,
+                x1=80, y1=len(resources) - 0.5,
                 line=dict(
                     color="#F59E0B",
                     width=2,
@@ -1647,7 +1656,7 @@ with tab4:
             )
             
             fig.add_annotation(
-                x=80, y=3.7,
+                x=80, y=len(resources) - 0.3,
                 text="Warning Threshold",
                 showarrow=False,
                 font=dict(
@@ -1662,7 +1671,7 @@ with tab4:
                 barmode='group',
                 xaxis=dict(
                     title="Utilization (%)",
-                    range=[0, 100],
+                    range=[0, max(100, 1.1 * resources["CPU (%)"].max())],
                     showgrid=True,
                     gridcolor='#E5E7EB',
                 ),
@@ -1681,15 +1690,17 @@ with tab4:
                 margin=dict(l=10, r=10, t=50, b=10),
                 plot_bgcolor="white",
             )
-            st.plotly_chart(fig, use_container_width=True)
-        
-        with resource_col2:
-            # IO Metrics - scatter plot
+            return fig
+        cached_chart("cpu_memory", versions["resources"], build_cpu_memory)
+    
+    with resource_col2:
+        # IO Metrics - scatter plot
+        def build_io_scatter():
             fig = px.scatter(
-                resources,
+                resources.assign(**{"Marker Size": resources["CPU (%)"].clip(lower=1)}),
                 x="Disk IO (MB/s)",
-                y="Network (MB/s)",
-                size="Memory (%)",
+                y="Read/Write Syscalls (MB/s)",
+                size="Marker Size",
                 color="CPU (%)",
                 hover_name="Resource",
                 title="I/O Performance Metrics",
@@ -1704,7 +1715,7 @@ with tab4:
                     gridcolor='#E5E7EB',
                 ),
                 yaxis=dict(
-                    title="Network I/O (MB/s)",
+                    title="Read/Write Syscalls (MB/s)",
                     showgrid=True,
                     gridcolor='#E5E7EB',
                 ),
@@ -1712,42 +1723,22 @@ with tab4:
                 margin=dict(l=10, r=10, t=50, b=10),
                 plot_bgcolor="white",
             )
-            st.plotly_chart(fig, use_container_width=True)
-        
-        # Resource utilization over time chart
-        st.markdown("### Resource Utilization Trends")
-        
-        # Generate simulated time series data for resources
-        hours = 24
-        timestamps = [(datetime.now() - timedelta(hours=i)).strftime("%Y-%m-%d %H:%M:%S") for i in range(hours, 0, -1)]
-        
-        # Create patterns that look realistic (with peaks during business hours)
-        cpu_trend = []
-        mem_trend = []
-        io_trend = []
-        
-        for i in range(hours):
-            hour = (datetime.now() - timedelta(hours=i)).hour
-            # Higher usage during business hours
-            if 8 <= hour <= 18:
-                cpu_trend.append(random.uniform(50, 85))
-                mem_trend.append(random.uniform(60, 90))
-                io_trend.append(random.uniform(100, 200))
-            else:
-                cpu_trend.append(random.uniform(20, 50))
-                mem_trend.append(random.uniform(40, 70))
-                io_trend.append(random.uniform(30, 100))
-        
-        resource_trends = pd.DataFrame({
-            "Timestamp": timestamps,
-            "CPU Usage (%)": cpu_trend,
-            "Memory Usage (%)": mem_trend,
-            "I/O (MB/s)": io_trend
+            return fig
+        cached_chart("io_scatter", versions["resources"], build_io_scatter)
+    
+    # Resource utilization over time chart
+    st.markdown("### Resource Utilization Trends")
+    
+    # Create a multi-line chart
+    def build_resource_trends():
+        # Process totals from the sampler's ring buffer
+        resource_trends = pipeline["resource_history"].rename(columns={
+            "cpu_pct": "CPU Usage (%)",
+            "memory_pct": "Memory Usage (%)",
         })
+        resource_trends["I/O (MB/s)"] = resource_trends["disk_mb_s"] + resource_trends["syscall_mb_s"]
+        resource_trends = resource_trends.reset_index()
         
-        resource_trends["Timestamp"] = pd.to_datetime(resource_trends["Timestamp"])
-        
-        # Create a multi-line chart
         fig = go.Figure()
         
         fig.add_trace(go.Scatter(
@@ -1780,7 +1771,7 @@ with tab4:
                 gridcolor='#E5E7EB',
             ),
             yaxis=dict(
-                title="Utilization (%)",
+                title="Share of Host (%)",
                 range=[0, 100],
                 showgrid=True,
                 gridcolor='#E5E7EB',
@@ -1788,7 +1779,7 @@ with tab4:
             ),
             yaxis2=dict(
                 title="I/O (MB/s)",
-                range=[0, 250],
+                rangemode="tozero",
                 overlaying="y",
                 side="right",
                 showgrid=False,
@@ -1806,26 +1797,47 @@ with tab4:
             margin=dict(l=10, r=10, t=50, b=10),
             plot_bgcolor="white",
         )
-        st.plotly_chart(fig, use_container_width=True)
+        return fig
+    cached_chart("resource_trends", versions["resources"], build_resource_trends)
+    
+    # Stage profile: CPU time against wall time shows which stages are compute-bound
+    st.markdown("### Stage CPU Profile")
+    stage_profile = pd.DataFrame([
+        {
+            "Stage": step["label"],
+            "Wall Time (s)": step["wall_time_s"],
+            "CPU Time (s)": step["cpu_time_s"],
+            "CPU Share (%)": 100 * step["cpu_share"],
+            "Profile": "CPU-bound" if step["cpu_share"] >= 0.8
+            else "Mixed" if step["cpu_share"] >= 0.5
+            else "Waiting (I/O, locks, GIL)",
+        }
+        for step in pipeline["stage_stats"]
+        if step["batches"]
+    ])
+    st.dataframe(stage_profile.round(3), use_container_width=True, hide_index=True)
 
-    with perf_subtabs[3]:  # Error Tracking
-        st.markdown("### Error Analysis Dashboard")
-        
-        # Create error tracking visualizations
-        error_col1, error_col2 = st.columns(2)
-        
-        with error_col1:
-            # Error rate over time chart
-            if st.session_state.timeseries_data["timestamps"]:
-                error_df = pd.DataFrame({
-                    "Timestamp": st.session_state.timeseries_data["timestamps"],
-                    "Error Rate (%)": st.session_state.timeseries_data["error_rate"]
-                })
-                error_df["Timestamp"] = pd.to_datetime(error_df["Timestamp"])
-                
+
+
+def render_error_subtab(pipeline):
+    """Error Tracking sub-tab of Performance Analytics"""
+    versions = pipeline["versions"]
+    
+    st.markdown("### Error Analysis Dashboard")
+    
+    # Create error tracking visualizations
+    error_col1, error_col2 = st.columns(2)
+    
+    with error_col1:
+        # Error rate over time chart
+        history = pipeline["timeseries"][time_range][HALF_CHART_PX]
+        if not history.empty:
+            error_df = history.rename(columns={"error_rate": "Error Rate (%)"})
+            
+            def build_error_rate_trend():
                 fig = px.line(
                     error_df, 
-                    x="Timestamp", 
+                    x=error_df.index, 
                     y="Error Rate (%)",
                     title="Error Rate Trend"
                 )
@@ -1833,9 +1845,9 @@ with tab4:
                 # Add threshold lines
                 fig.add_shape(
                     type="line",
-                    x0=error_df["Timestamp"].min(),
+                    x0=error_df.index[0],
                     y0=1,
-                    x1=error_df["Timestamp"].max(),
+                    x1=error_df.index[-1],
                     y1=1,
                     line=dict(
                         color="#F59E0B",
@@ -1847,9 +1859,9 @@ with tab4:
                 
                 fig.add_shape(
                     type="line",
-                    x0=error_df["Timestamp"].min(),
+                    x0=error_df.index[0],
                     y0=2,
-                    x1=error_df["Timestamp"].max(),
+                    x1=error_df.index[-1],
                     y1=2,
                     line=dict(
                         color="#EF4444",
@@ -1860,6 +1872,7 @@ with tab4:
                 )
                 
                 fig.update_traces(line=dict(color="#FB7185", width=2))
+                add_range_band(fig, error_df, "error_rate", "rgba(251, 113, 133, 0.15)")
                 fig.update_layout(
                     height=350,
                     xaxis_title="Time",
@@ -1880,7 +1893,7 @@ with tab4:
                 
                 # Add annotations for thresholds
                 fig.add_annotation(
-                    x=error_df["Timestamp"].max(),
+                    x=error_df.index[-1],
                     y=1,
                     text="Warning",
                     showarrow=False,
@@ -1893,7 +1906,7 @@ with tab4:
                 )
                 
                 fig.add_annotation(
-                    x=error_df["Timestamp"].max(),
+                    x=error_df.index[-1],
                     y=2,
                     text="Critical",
                     showarrow=False,
@@ -1905,26 +1918,28 @@ with tab4:
                     )
                 )
                 
-                st.plotly_chart(fig, use_container_width=True)
+                return fig
+            cached_chart("error_rate_trend", (versions["timeseries"], time_range), build_error_rate_trend)
+    
+    with error_col2:
+        # Error types distribution - pie chart
+        error_types = [
+            "API Timeout",
+            "Connection Error",
+            "Authentication Failure",
+            "Rate Limit Exceeded",
+            "Malformed Response", 
+            "Data Validation Failure"
+        ]
+        
+        error_counts = [random.randint(5, 30) for _ in range(len(error_types))]
+        
+        error_data = pd.DataFrame({
+            "Error Type": error_types,
+            "Count": error_counts
+        })
         
-        with error_col2:
-            # Error types distribution - pie chart
-            error_types = [
-                "API Timeout",
-                "Connection Error",
-                "Authentication Failure",
-                "Rate Limit Exceeded",
-                "Malformed Response", 
-                "Data Validation Failure"
-            ]
-            
-            error_counts = [random.randint(5, 30) for _ in range(len(error_types))]
-            
-            error_data = pd.DataFrame({
-                "Error Type": error_types,
-                "Count": error_counts
-            })
-            
+        def build_error_types():
             fig = px.pie(
                 error_data,
                 values="Count",
@@ -1946,20 +1961,22 @@ with tab4:
                 showlegend=False
             )
             
-            st.plotly_chart(fig, use_container_width=True)
-        
-        # Error by data source - horizontal bar chart
-        st.markdown("### Errors by Data Source")
-        
-        error_by_source = pd.DataFrame({
-            "Source": [s["name"] for s in st.session_state.data_sources.values()],
-            "Errors": [s["failures"] for s in st.session_state.data_sources.values()],
-            "Error Rate (%)": [100 * s["failures"] / max(1, s["records_processed"]) for s in st.session_state.data_sources.values()]
-        })
-        
-        # Sort by error rate
-        error_by_source = error_by_source.sort_values("Error Rate (%)", ascending=False)
-        
+            return fig
+        cached_chart("error_types", versions["sources"], build_error_types)
+    
+    # Error by data source - horizontal bar chart
+    st.markdown("### Errors by Data Source")
+    
+    error_by_source = pd.DataFrame({
+        "Source": [s["name"] for s in pipeline["data_sources"].values()],
+        "Errors": [s["failures"] + s["records_rejected"] for s in pipeline["data_sources"].values()],
+        "Error Rate (%)": [100 * (s["failures"] + s["records_rejected"]) / max(1, s["records_processed"] + s["records_rejected"]) for s in pipeline["data_sources"].values()]
+    })
+    
+    # Sort by error rate
+    error_by_source = error_by_source.sort_values("Error Rate (%)", ascending=False)
+    
+    def build_errors_by_source():
         fig = px.bar(
             error_by_source,
             x="Error Rate (%)",
@@ -1994,7 +2011,87 @@ with tab4:
         # Add custom data for hover tooltip
         fig.update_traces(customdata=error_by_source["Errors"])
         
-        st.plotly_chart(fig, use_container_width=True)
+        return fig
+    cached_chart("errors_by_source", versions["sources"], build_errors_by_source)
+
+    # Threshold rules the engine evaluates on every tick
+    st.markdown('<p class="section-title">Alert Rules</p>', unsafe_allow_html=True)
+    alert_rules_df = pd.DataFrame(pipeline["alert_rules"])
+    alert_rules_df = alert_rules_df.rename(columns={
+        "name": "Rule",
+        "condition": "Condition",
+        "for_s": "For (s)",
+        "clear_threshold": "Clears At",
+        "severity": "Severity",
+        "state": "State",
+        "value": "Current Value",
+        "fired": "Times Fired",
+    })
+    st.dataframe(alert_rules_df, use_container_width=True, hide_index=True)
+
+
+with tab4:
+    st.markdown('<p class="sub-header">Performance Metrics & Analytics</p>', unsafe_allow_html=True)
+    
+    # Performance metrics
+    perf_col1, perf_col2, perf_col3, perf_col4 = st.columns(4)
+    
+    with perf_col1:
+        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+        st.markdown(f'<div class="metric-value">{pipeline["pipeline_metrics"]["pipeline_uptime"]}%</div>', unsafe_allow_html=True)
+        st.markdown('<div class="metric-label">Pipeline Uptime</div>', unsafe_allow_html=True)
+        st.markdown('</div>', unsafe_allow_html=True)
+    
+    with perf_col2:
+        history = pipeline["timeseries"][time_range][HALF_CHART_PX]
+        avg_throughput = 3600 * (history["throughput"] * history["samples"]).sum() / max(1, history["samples"].sum())
+        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+        st.markdown(f'<div class="metric-value">{avg_throughput:.0f}</div>', unsafe_allow_html=True)
+        st.markdown('<div class="metric-label">Avg Records/Hour</div>', unsafe_allow_html=True)
+        st.markdown('</div>', unsafe_allow_html=True)
+    
+    with perf_col3:
+        avg_latency = (history["latency"] * history["samples"]).sum() / max(1, history["samples"].sum())
+        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+        st.markdown(f'<div class="metric-value">{avg_latency:.0f}ms</div>', unsafe_allow_html=True)
+        st.markdown('<div class="metric-label">Avg Processing Latency</div>', unsafe_allow_html=True)
+        st.markdown('</div>', unsafe_allow_html=True)
+    
+    with perf_col4:
+        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+        st.markdown(f'<div class="metric-value">{len(pipeline["processing_steps"])}</div>', unsafe_allow_html=True)
+        st.markdown('<div class="metric-label">Processing Stages</div>', unsafe_allow_html=True)
+        st.markdown('</div>', unsafe_allow_html=True)
+    
+    # Enhanced Performance Dashboard
+    st.markdown('<p class="section-title">Performance Dashboard</p>', unsafe_allow_html=True)
+    
+    # Create a multi-metric dashboard using tabs within the tab
+    perf_subtabs = st.tabs(["Latency Metrics", "Throughput Analysis", "Resource Utilization", "Error Tracking"],
+                           key="perf_subtab", on_change="rerun")
+    perf_renderers = [render_latency_subtab, render_throughput_subtab, render_resource_subtab, render_error_subtab]
+    
+    # Only the open sub-tab is built; figures come from the cache until their data version changes
+    for subtab, render_subtab in zip(perf_subtabs, perf_renderers):
+        with subtab:
+            if subtab.open:
+                render_subtab(pipeline)
+    
+    with st.expander("Render Instrumentation"):
+        figure_stats = st.session_state.figure_cache.stats_snapshot()
+        if figure_stats:
+            st.dataframe(pd.DataFrame({
+                "Figure": [f["figure"] for f in figure_stats],
+                "Hits": [f["hits"] for f in figure_stats],
+                "Misses": [f["misses"] for f in figure_stats],
+                "Hit Rate (%)": [round(f["hit_rate"], 1) for f in figure_stats],
+                "Avg Build (ms)": [round(f["avg_build_ms"], 2) for f in figure_stats],
+                "Avg Render (ms)": [round(f["avg_render_ms"], 2) for f in figure_stats],
+                "Cached": [f["cached"] for f in figure_stats]
+            }), use_container_width=True, hide_index=True)
+            st.caption(f"Evictions: {st.session_state.figure_cache.evictions}")
+        else:
+            st.caption("No figures rendered yet")
     
     # Performance optimization recommendations
     st.markdown('<p class="section-title">Performance Optimization Recommendations</p>', unsafe_allow_html=True)
@@ -2138,12 +2235,3 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-# Add auto-refresh to simulate real-time updates (5 seconds)
-st.markdown("""
-<script>
-    // Auto refresh the page every 5 seconds
-    setTimeout(function(){
-        window.location.reload();
-    }, 5000);
-</script>
-""", unsafe_allow_html=True)
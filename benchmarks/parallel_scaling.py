@@ -0,0 +1,81 @@
+"""Records/sec of the validation and transformation stages from 1 to N worker processes
+
+Run from the repository root: ``python -m benchmarks.parallel_scaling --max-workers 8``
+"""
+import argparse
+import os
+import time
+from datetime import datetime
+
+from omnistream.parallel import ProcessStageExecutor, StageExecutor
+from omnistream.quality import QualityEngine
+from omnistream.sources import GENERATORS, BatchGenerator
+from omnistream.stages import StageRuntime, data_ingestion
+
+STEPS = ("data_validation", "data_transformation")
+
+
+def make_batches(count, size, seed=0):
+    """Ingested batches cycling through every source"""
+    sources = list(GENERATORS)
+    now = datetime.now()
+    batches = []
+    for i in range(count):
+        source_id = sources[i % len(sources)]
+        batch = BatchGenerator(source_id, seed=seed + i).generate(size, now)
+        batch, _ = data_ingestion(batch, source_id)
+        batches.append((source_id, batch))
+    return batches
+
+
+def run(workers, batches):
+    """Push every batch through the stages; returns records/sec"""
+    quality = QualityEngine()
+    runtime = StageRuntime(STEPS, overrides={"data_validation": quality.validate})
+    if workers:
+        executor = ProcessStageExecutor(runtime, quality, workers=workers, return_output=False).start()
+        # Warm the pool so process start-up is not part of the measurement
+        for source_id, batch in batches[:workers]:
+            executor.submit(batch, source_id)
+        warm = 0
+        while warm < workers:
+            warm += len(executor.completed())
+            time.sleep(0.001)
+    else:
+        executor = StageExecutor(runtime)
+
+    remaining = len(batches)
+    started = time.perf_counter()
+    for source_id, batch in batches:
+        executor.submit(batch, source_id)
+        remaining -= len(executor.completed())
+    while remaining:
+        remaining -= len(executor.completed())
+        time.sleep(0.001)
+    elapsed = time.perf_counter() - started
+    executor.stop()
+    return sum(len(batch) for _, batch in batches) / elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batches", type=int, default=80)
+    parser.add_argument("--batch-size", type=int, default=20_000)
+    args = parser.parse_args(argv)
+
+    batches = make_batches(args.batches, args.batch_size)
+    print(f"{args.batches} batches x {args.batch_size:,} records, {os.cpu_count()} CPUs")
+    print(f"{'workers':>8} {'records/sec':>14} {'speedup':>8} {'efficiency':>10}")
+    inline = run(0, batches)
+    print(f"{'inline':>8} {inline:>14,.0f} {'':>8} {'':>10}")
+    baseline = None
+    for workers in range(1, args.max_workers + 1):
+        rate = run(workers, batches)
+        baseline = baseline or rate
+        speedup = rate / baseline
+        print(f"{workers:>8} {rate:>14,.0f} {speedup:>7.2f}x {100 * speedup / workers:>9.0f}%")
+
+
+if __name__ == "__main__":
+    main()
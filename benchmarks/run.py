@@ -0,0 +1,644 @@
+"""Benchmark suite for the pipeline's hot paths, gated against JSON baselines
+
+Run from the repository root::
+
+    python -m benchmarks.run                    # compare with benchmarks/baselines.json
+    python -m benchmarks.run --update-baseline  # record the current numbers as the baseline
+    python -m benchmarks.run --quick --filter engine_tick
+
+Each case reports throughput, latency percentiles and the peak RSS reached
+while it ran; start-up cases also list their slowest imports. A case whose median latency exceeds its baseline by more than
+``--tolerance`` percent fails the run. Baselines are only comparable on the
+machine that recorded them.
+"""
+import argparse
+import gc
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from omnistream.anomaly import AnomalyDetector
+from omnistream.checkpoint import Checkpointer
+from omnistream.connectors import Connector, FetchResult
+from omnistream.drift import DriftDetector
+from omnistream.entities import EntityIndex, EntityResolver, entity_ids, minhash
+from omnistream.engine import ANOMALY_METRICS, CHART_WIDTHS, ROLLUP_LEVELS, SOURCE_DEFINITIONS, TIME_RANGES, TIMESERIES_COLUMNS, PipelineEngine
+from omnistream.figcache import FigureCache
+from omnistream.geo import PLACES_PATH, GeoEnricher, PlaceIndex
+from omnistream.ingestlog import IngestLog
+from omnistream.quality import QualityEngine
+from omnistream.sources import BatchGenerator
+from omnistream.stages import PROCESSING_STEPS, StageRuntime
+from omnistream.temporal import REGION_ZONES, CalendarEnricher, CalendarTable
+from omnistream.timeseries import RollupStore
+from omnistream.views import source_status_frame
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+# Sources reporting in each simulated tick; the rest only weigh on per-source aggregation
+RESULTS_PER_TICK = 100
+TICK_BATCH_SIZE = 50
+FAILURE_SHARE = 0.1
+
+# Cold start-up of each entry point in a fresh interpreter, and whether it must stay headless
+STARTUP_CASES = (
+    ("engine", ["-c", "import omnistream.engine"], True),
+    ("stage_worker", ["-c", "import omnistream.parallel"], True),
+    ("persistence", ["-c", "import omnistream.persistence"], True),
+    ("dashboard_imports", ["-c", "import streamlit, omnistream.engine, omnistream.persistence, omnistream.views"], False),
+    ("cli_run", ["-m", "omnistream", "--duration", "0"], True),
+)
+# Packages a headless entry point must not import
+UI_PACKAGES = ("streamlit", "plotly", "sqlalchemy")
+# Slowest top-level imports listed for each start-up case
+IMPORT_REPORT_SIZE = 5
+PERF_SUBTABS = ("Latency Metrics", "Throughput Analysis", "Resource Utilization", "Error Tracking")
+
+
+# ----------------------------------------------------------------------
+# Measurement
+# ----------------------------------------------------------------------
+def reset_peak_rss():
+    """Reset the kernel's high-water mark so each case reports its own peak (Linux only)"""
+    # Let earlier cases' fixtures go first so they do not count towards this one
+    gc.collect()
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # Lifetime peak where the high-water mark cannot be reset; kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def measure(name, params, operation, repeat, records=0, warmup=1):
+    """Time ``repeat`` calls of ``operation`` after ``warmup`` untimed calls.
+
+    Like ``timeit``, the cyclic garbage collector is paused while timing so
+    collections triggered by earlier cases' garbage do not land in this one.
+    """
+    for _ in range(warmup):
+        operation()
+    reset_peak_rss()
+    timings = []
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            operation()
+            timings.append(time.perf_counter() - started)
+    finally:
+        gc.enable()
+    return result_row(name, params, timings, records, peak_rss_mb())
+
+
+def result_row(name, params, timings, records, peak_rss):
+    timings_ms = np.asarray(timings) * 1000
+    mean_ms = float(timings_ms.mean())
+    p50, p90, p99 = np.percentile(timings_ms, (50, 90, 99)).tolist()
+    return {
+        "case": case_id(name, params),
+        "name": name,
+        "params": params,
+        "runs": len(timings),
+        "mean_ms": mean_ms,
+        "p50_ms": p50,
+        "p90_ms": p90,
+        "p99_ms": p99,
+        "ops_per_sec": 1000 / mean_ms if mean_ms else 0.0,
+        "records_per_sec": records * 1000 / mean_ms if records and mean_ms else None,
+        "peak_rss_mb": peak_rss,
+    }
+
+
+def case_id(name, params):
+    return name + "".join(f"[{key}={value}]" for key, value in params.items())
+
+
+# ----------------------------------------------------------------------
+# Fixtures
+# ----------------------------------------------------------------------
+def make_engine(sources, history_hours=48):
+    """Engine with the five simulated source kinds plus idle placeholder sources up to ``sources``.
+
+    Connectors are never started; ticks are fed from ``feed_ticks`` so the
+    measurement covers the engine, not network waits.
+    """
+    source_ids = list(SOURCE_DEFINITIONS)[:sources]
+    source_ids += [f"source_{i:05d}" for i in range(sources - len(source_ids))]
+    return PipelineEngine(history_hours=history_hours, connectors=[Connector(source_id) for source_id in source_ids])
+
+
+def feed_ticks(engine, seed=0):
+    """Replace the connector pool's drain with a stream of synthetic fetch results.
+
+    Every tick each real source kind returns a batch of ``TICK_BATCH_SIZE``
+    records, and up to ``RESULTS_PER_TICK`` placeholder sources report in
+    rotation with empty batches, so stage work stays constant while the
+    source count grows. ``FAILURE_SHARE`` of all fetches fail.
+    """
+    rng = np.random.default_rng(seed)
+    generators = {source_id: BatchGenerator(source_id, seed=seed) for source_id in engine.data_sources
+                  if source_id in SOURCE_DEFINITIONS}
+    placeholders = [source_id for source_id in engine.data_sources if source_id not in generators]
+    empty = pd.DataFrame()
+    position = [0]
+    clock = [datetime.now()]
+
+    def drain(limit=None):
+        now = clock[0]
+        reporting = list(generators)
+        for _ in range(min(RESULTS_PER_TICK, len(placeholders))):
+            reporting.append(placeholders[position[0] % len(placeholders)])
+            position[0] += 1
+        results = []
+        for source_id in reporting:
+            if rng.random() < FAILURE_SHARE:
+                results.append(FetchResult(source_id, now, failure_type="Connection Error", fetch_ms=50.0))
+                continue
+            generator = generators.get(source_id)
+            batch = generator.generate(TICK_BATCH_SIZE, now) if generator else empty
+            results.append(FetchResult(source_id, now, batch=batch, fetch_ms=float(rng.uniform(20, 200))))
+        return results
+
+    def tick():
+        clock[0] += timedelta(seconds=1)
+        engine.tick(clock[0])
+
+    engine.connectors.drain = drain
+    return tick
+
+
+# ----------------------------------------------------------------------
+# Cases
+# ----------------------------------------------------------------------
+def bench_engine_tick(quick):
+    """One engine tick: drain fetches, run stages, update metrics, evaluate alerts"""
+    for sources in (5, 100, 1000) if quick else (5, 100, 1000, 10_000):
+        engine = make_engine(sources)
+        tick = feed_ticks(engine)
+        yield measure("engine_tick", {"sources": sources}, tick, repeat=30 if quick else 100, warmup=5)
+
+
+def bench_snapshot(quick):
+    """Publishing the engine state once per tick, and reading it on every viewer's rerun"""
+    cases = [(5, 48), (5, 720), (1000, 48)] if quick else [(5, 48), (5, 720), (5, 8760), (1000, 48), (10_000, 48)]
+    for sources, history in cases:
+        engine = make_engine(sources, history_hours=history)
+        tick = feed_ticks(engine)
+        for _ in range(10):
+            tick()
+        yield measure("snapshot_publish", {"sources": sources, "history": history}, engine.publish, repeat=50)
+        yield measure("snapshot", {"sources": sources, "history": history}, engine.snapshot, repeat=50)
+
+
+def bench_rollups(quick):
+    """Folding one point into every rollup level, and reading each time range for a full-width chart"""
+    rollups = RollupStore(TIMESERIES_COLUMNS, ROLLUP_LEVELS)
+    rng = np.random.default_rng(0)
+    now = np.datetime64(datetime.now(), "s")
+    for level, (resolution, capacity) in enumerate(ROLLUP_LEVELS):
+        timestamps = rollups.stores[level].bucket(now) - np.arange(capacity, 0, -1) * np.timedelta64(resolution, "s")
+        rollups.extend(level, timestamps, {name: rng.uniform(0, 100, capacity) for name in TIMESERIES_COLUMNS})
+    clock = [now]
+
+    def add():
+        clock[0] += np.timedelta64(1, "s")
+        rollups.add(clock[0], {name: 50.0 for name in TIMESERIES_COLUMNS})
+
+    yield measure("rollup_add", {}, add, repeat=200 if quick else 1000)
+    width = max(CHART_WIDTHS)
+    for name, seconds in TIME_RANGES.items():
+        yield measure("rollup_query", {"range": name.lower().replace(" ", "_"), "width": width},
+                      lambda: rollups.query(seconds, width), repeat=20 if quick else 100)
+
+
+def bench_source_status_frame(quick):
+    """Data Source Status table on the Pipeline Dashboard tab"""
+    for sources in (5, 1000) if quick else (5, 1000, 10_000):
+        data_sources = make_engine(sources).snapshot()["data_sources"]
+        yield measure("source_status_frame", {"sources": sources}, lambda: source_status_frame(data_sources),
+                      repeat=20 if quick else 50, records=sources)
+
+
+def bench_stage_execution(quick):
+    """All six stages over one batch from each source kind"""
+    now = datetime.now()
+    for batch_size in (100, 10_000) if quick else (100, 10_000, 100_000):
+        quality = QualityEngine()
+        runtime = StageRuntime(PROCESSING_STEPS, overrides={"data_validation": quality.validate})
+        batches = [(source_id, BatchGenerator(source_id, seed=0).generate(batch_size, now))
+                   for source_id in SOURCE_DEFINITIONS]
+
+        def run_batches():
+            for source_id, batch in batches:
+                runtime.run(batch, source_id)
+
+        yield measure("stage_execution", {"batch_size": batch_size}, run_batches,
+                      repeat=5 if quick else 20, records=batch_size * len(batches))
+
+
+def bench_drift(quick):
+    """Drift checks on one batch from each source kind, after the reference windows are built"""
+    now = datetime.now()
+    for batch_size in (50, 10_000) if quick else (50, 1000, 10_000):
+        detector = DriftDetector()
+        generators = {source_id: BatchGenerator(source_id, seed=0) for source_id in SOURCE_DEFINITIONS}
+        for source_id, generator in generators.items():
+            detector.observe(generator.generate(detector.reference_rows, now), source_id)
+        batches = [(source_id, generator.generate(batch_size, now)) for source_id, generator in generators.items()]
+
+        def observe_batches():
+            for source_id, batch in batches:
+                detector.observe(batch, source_id)
+
+        yield measure("drift_observe", {"batch_size": batch_size}, observe_batches,
+                      repeat=20 if quick else 100, records=batch_size * len(batches))
+
+
+def bench_anomaly(quick):
+    """Scoring one tick of every source x metric series against warmed-up baselines"""
+    rng = np.random.default_rng(0)
+    for series in (10_000, 100_000):
+        sources = series // len(ANOMALY_METRICS)
+        detector = AnomalyDetector(sources, ANOMALY_METRICS)
+        level = rng.uniform(10, 1000, (sources, len(ANOMALY_METRICS)))
+        for hour in range(detector.window):
+            detector.observe(level * rng.normal(1, 0.05, level.shape), hour % 24)
+        values = level * rng.normal(1, 0.05, level.shape)
+        yield measure("anomaly_observe", {"series": series}, lambda: detector.observe(values, 12),
+                      repeat=20 if quick else 50, records=series)
+
+
+def bench_entities(quick):
+    """Resolving a batch against a memory-mapped entity index of growing size.
+
+    Half the batch's keys are known entities with one letter changed, half
+    are unknown; nothing is learnt, so every repetition sees the same index.
+    """
+    rng = np.random.default_rng(0)
+    for entities in (10_000, 100_000) if quick else (10_000, 1_000_000):
+        letters = rng.integers(ord("a"), ord("z") + 1, (entities + 500, 15), dtype=np.uint8)
+        letters[:, 7] = ord(" ")
+        texts = letters.view("S15").ravel().astype(str).astype(object)
+        known, unknown = texts[:500].copy(), texts[entities:]
+        known = np.array([text[:3] + "q" + text[4:] for text in known], dtype=object)
+        directory = tempfile.mkdtemp(prefix="omnistream-bench-")
+        try:
+            index = EntityIndex()
+            index.add(minhash(texts[:entities]), entity_ids(texts[:entities]))
+            index.save(directory)
+            resolver = EntityResolver(EntityIndex.open(directory), keys={"bench": ("name",)}, learn=False)
+            batch = pd.DataFrame({"name": np.concatenate([known, unknown])})
+            yield measure("entity_resolve", {"entities": entities}, lambda: resolver(batch.copy(), "bench"),
+                          repeat=20 if quick else 50, records=len(batch))
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+def bench_geo(quick):
+    """Reverse geocoding uniformly spread points, with the cell cache cold and warm, and the whole stage on a batch"""
+    places = pd.read_csv(PLACES_PATH)
+    rng = np.random.default_rng(0)
+    for points in (1000, 100_000):
+        latitude, longitude = rng.uniform(25, 48, points), rng.uniform(-124, -70, points)
+        yield measure("geo_lookup", {"points": points, "cache": "cold"},
+                      lambda: PlaceIndex(places).lookup(latitude, longitude),
+                      repeat=10 if quick else 30, records=points)
+        index = PlaceIndex(places)
+        index.lookup(latitude, longitude)
+        yield measure("geo_lookup", {"points": points, "cache": "warm"}, lambda: index.lookup(latitude, longitude),
+                      repeat=20 if quick else 50, records=points)
+    enricher = GeoEnricher(PlaceIndex(places))
+    for batch_size in (50, 5000):
+        batch = pd.DataFrame({"latitude": rng.uniform(25, 48, batch_size),
+                              "longitude": rng.uniform(-124, -70, batch_size)})
+        enricher(batch.copy(), "iot_sensors")
+        yield measure("geo_enrich", {"batch_size": batch_size}, lambda: enricher(batch.copy(), "iot_sensors"),
+                      repeat=50 if quick else 200, records=batch_size)
+
+
+def bench_temporal(quick):
+    """Tagging event times spread over a year from the calendar tables, and building the tables"""
+    rng = np.random.default_rng(0)
+    enricher = CalendarEnricher(source_zone="America/Chicago")
+    start = np.datetime64(f"{enricher.table.first_year + 1}-01-01", "ms")
+    regions = np.array(sorted(REGION_ZONES) + [None], dtype=object)
+    for batch_size in (50, 5000) if quick else (50, 5000, 100_000):
+        batch = pd.DataFrame({
+            "event_time": start + rng.integers(0, 365 * 86_400_000, batch_size).astype("timedelta64[ms]"),
+            "region": regions[rng.integers(len(regions), size=batch_size)],
+        })
+        yield measure("temporal_enrich", {"batch_size": batch_size},
+                      lambda: enricher(batch.copy(), "weather_data"),
+                      repeat=50 if quick else 200, records=batch_size)
+    first, last = enricher.table.first_year, enricher.table.last_year
+    yield measure("temporal_table", {"zones": len(enricher.zones), "years": last - first + 1},
+                  lambda: CalendarTable(enricher.zones, first, last), repeat=3 if quick else 10)
+
+
+def bench_ingest_log(quick):
+    """Appending batches to the ingestion log, and reading one back from a random offset"""
+    now = datetime.now()
+    for batch_size in (50, 5000) if quick else (50, 5000, 50_000):
+        directory = tempfile.mkdtemp(prefix="omnistream-bench-")
+        try:
+            log = IngestLog(directory, segment_bytes=4 * 1024 * 1024)
+            batch = BatchGenerator("retail_transactions", seed=0).generate(batch_size, now)
+            yield measure("ingest_append", {"batch_size": batch_size},
+                          lambda: log.append("retail_transactions", batch, headers={"fetch_ms": 1.0}),
+                          repeat=50 if quick else 200, records=batch_size)
+
+            partition = log.topic("retail_transactions")[0]
+            rng = np.random.default_rng(0)
+
+            def read_random():
+                record, = partition.read(int(rng.integers(partition.end_offset)), max_messages=1)
+                record.decode()
+
+            yield measure("ingest_read", {"batch_size": batch_size, "segments": len(partition.segments)},
+                          read_random, repeat=50 if quick else 200, records=batch_size)
+            log.close()
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+def bench_checkpoint(quick):
+    """Checkpointing engine state and recovering from it, as state grows with sources and history.
+
+    ``checkpoint_capture`` is the copy taken under the engine lock,
+    ``checkpoint_write`` the pickling, write and fsync done off the tick
+    thread, and ``checkpoint_recover`` reading the newest checkpoint back
+    and applying it to a fresh engine, i.e. the restart cost.
+    """
+    cases = [(5, 48), (1000, 48)] if quick else [(5, 48), (5, 8760), (1000, 48), (10_000, 48)]
+    for sources, history in cases:
+        directory = tempfile.mkdtemp(prefix="omnistream-bench-")
+        try:
+            engine = make_engine(sources, history_hours=history)
+            tick = feed_ticks(engine)
+            for _ in range(10):
+                tick()
+            checkpointer = Checkpointer(directory).bind(engine._checkpoint_state)
+            params = {"sources": sources, "history": history}
+            repeat = 5 if quick else 20
+            yield measure("checkpoint_capture", params, engine._checkpoint_state, repeat=repeat)
+            state = engine._checkpoint_state()
+            yield measure("checkpoint_write", params, lambda: checkpointer._write(state), repeat=repeat)
+            restored = make_engine(sources, history_hours=history)
+            restored.checkpoint = checkpointer
+            row = measure("checkpoint_recover", params, restored.recover, repeat=repeat)
+            row["checkpoint_mb"] = checkpointer.last_bytes / 1024 ** 2
+            yield row
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+def bench_figures(quick):
+    """Performance Analytics figures, built through the dashboard's figure cache.
+
+    Runs ``app.py`` headless with Streamlit's AppTest against a prepared
+    engine, clearing the cache before each rerun so every figure on the open
+    sub-tab is rebuilt. Reports each figure's build time and each sub-tab's
+    full rerun time.
+    """
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        print("skipping figure benchmarks: streamlit is not installed", file=sys.stderr)
+        return
+    repeat = 3 if quick else 10
+    for sources, history in [(5, 48)] if quick else [(5, 48), (5, 720), (1000, 48)]:
+        engine = make_engine(sources, history_hours=history)
+        tick = feed_ticks(engine)
+        for _ in range(10):
+            tick()
+        # Two samples give the Resource Utilization sub-tab its first rates
+        engine.resources.sample()
+        engine.resources.sample()
+        figure_cache = FigureCache()
+        app = AppTest.from_file(APP_PATH, default_timeout=300)
+        app.session_state["initialized"] = True
+        app.session_state["engine"] = engine
+        app.session_state["figure_cache"] = figure_cache
+        app.run()
+
+        builds = {}
+        misses = {}
+        for subtab in PERF_SUBTABS:
+            reset_peak_rss()
+            timings = []
+            for _ in range(repeat):
+                # The tab widget keeps a selection for one rerun only
+                app.session_state["perf_subtab"] = subtab
+                figure_cache.invalidate()
+                started = time.perf_counter()
+                app.run()
+                timings.append(time.perf_counter() - started)
+                if app.exception:
+                    raise RuntimeError(f"app.py raised on {subtab}: {app.exception[0].value}")
+                # Figures rebuilt by this rerun are the ones with a new cache miss
+                for row in figure_cache.stats_snapshot():
+                    if row["misses"] > misses.get(row["figure"], 0):
+                        builds.setdefault(row["figure"], []).append(row["last_build_ms"] / 1000)
+                    misses[row["figure"]] = row["misses"]
+            yield result_row("dashboard_rerun", {"subtab": subtab, "sources": sources, "history": history},
+                             timings, 0, peak_rss_mb())
+        for figure, timings in sorted(builds.items()):
+            yield result_row("figure_build", {"figure": figure, "sources": sources, "history": history},
+                             timings, 0, peak_rss_mb())
+
+
+def parse_importtime(stderr):
+    """Packages from ``-X importtime`` output as (package, cumulative ms), slowest first.
+
+    Only top-level package names are kept (``pandas``, not ``pandas.core.frame``);
+    a package's time includes whatever it imported in turn.
+    """
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, module = line.split("|")
+        module = module.strip()
+        if "." not in module and cumulative.strip().isdigit():
+            imports.append((module, int(cumulative) / 1000))
+    return sorted(imports, key=lambda item: item[1], reverse=True)
+
+
+def bench_startup(quick):
+    """Wall time from launching a fresh interpreter to it finishing each entry point.
+
+    Every run is a new process under ``-X importtime`` (which itself adds a
+    little overhead), so nothing is shared with this process's module cache.
+    Each row also lists the slowest packages the last run imported. Peak RSS
+    is not reported: a child's high-water mark starts from this process's.
+    """
+    repeat = 3 if quick else 10
+    for name, command, headless in STARTUP_CASES:
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            completed = subprocess.run([sys.executable, "-X", "importtime", *command],
+                                       capture_output=True, text=True, check=True)
+            timings.append(time.perf_counter() - started)
+        imports = parse_importtime(completed.stderr)
+        if headless:
+            loaded = sorted({module for module, _ in imports} & set(UI_PACKAGES))
+            if loaded:
+                raise RuntimeError(f"headless entry point {name} imported {', '.join(loaded)}")
+        row = result_row("startup", {"entry": name}, timings, 0, 0.0)
+        row["slowest_imports"] = imports[:IMPORT_REPORT_SIZE]
+        yield row
+
+
+CASES = {
+    "startup": bench_startup,
+    "engine_tick": bench_engine_tick,
+    "snapshot": bench_snapshot,
+    "rollups": bench_rollups,
+    "source_status_frame": bench_source_status_frame,
+    "stage_execution": bench_stage_execution,
+    "drift": bench_drift,
+    "anomaly": bench_anomaly,
+    "entities": bench_entities,
+    "geo": bench_geo,
+    "temporal": bench_temporal,
+    "ingest_log": bench_ingest_log,
+    "checkpoint": bench_checkpoint,
+    "figures": bench_figures,
+}
+
+
+# ----------------------------------------------------------------------
+# Baselines
+# ----------------------------------------------------------------------
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return {row["case"]: row for row in json.load(f)["results"]}
+
+
+def save_baseline(path, results):
+    merged = load_baseline(path)
+    merged.update({row["case"]: row for row in results})
+    with open(path, "w") as f:
+        json.dump({
+            "recorded_at": datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "cpus": os.cpu_count(),
+            "results": sorted(merged.values(), key=lambda row: row["case"]),
+        }, f, indent=2)
+        f.write("\n")
+
+
+def compare(results, baseline, tolerance):
+    """Annotate each result with its change against the baseline; returns the regressions"""
+    regressions = []
+    for row in results:
+        previous = baseline.get(row["case"])
+        if previous is None or not previous["p50_ms"]:
+            row["change_pct"] = None
+            continue
+        row["change_pct"] = 100 * (row["p50_ms"] / previous["p50_ms"] - 1)
+        if row["change_pct"] > tolerance:
+            regressions.append(row)
+    return regressions
+
+
+def print_row(row):
+    throughput = f"{row['records_per_sec']:,.0f} rec/s" if row["records_per_sec"] else f"{row['ops_per_sec']:,.1f} op/s"
+    change = "" if row.get("change_pct") is None else f"{row['change_pct']:+.1f}%"
+    print(f"{row['case']:<72} {row['p50_ms']:>10.3f} {row['p99_ms']:>10.3f} {throughput:>18} "
+          f"{row['peak_rss_mb']:>8.0f} {change:>8}")
+    for module, cumulative_ms in row.get("slowest_imports", ()):
+        print(f"    import {module:<63} {cumulative_ms:>10.1f}")
+
+
+def run_cases(groups, quick, case_filter=None):
+    """Yield result rows for every case in ``groups``, optionally keeping only ids containing ``case_filter``"""
+    for group in groups:
+        for row in CASES[group](quick):
+            if case_filter is None or case_filter in row["case"]:
+                row["group"] = group
+                yield row
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="smaller parameter grid and fewer repeats")
+    parser.add_argument("--filter", default=None,
+                        help="only run the group with this name, or cases whose id contains this text")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline JSON file")
+    parser.add_argument("--update-baseline", action="store_true", help="write results into the baseline file")
+    parser.add_argument("--tolerance", type=float, default=25.0,
+                        help="fail when a case's median is this many percent slower than its baseline")
+    parser.add_argument("--output", default=None, help="also write this run's results to a JSON file")
+    args = parser.parse_args(argv)
+
+    baseline = load_baseline(args.baseline)
+    groups = [args.filter] if args.filter in CASES else list(CASES)
+    case_filter = args.filter if args.filter not in CASES else None
+    print(f"{'case':<72} {'p50 ms':>10} {'p99 ms':>10} {'throughput':>18} {'rss MB':>8} {'change':>8}")
+    results = []
+    for row in run_cases(groups, args.quick, case_filter):
+        compare([row], baseline, args.tolerance)
+        print_row(row)
+        results.append(row)
+
+    regressions = [] if args.update_baseline else compare(results, baseline, args.tolerance)
+    if regressions:
+        # A one-off slow run on a busy host is not a regression: re-run the groups of the
+        # suspect cases and keep each case's faster median
+        suspects = {row["case"] for row in regressions}
+        print(f"\nre-running {len(suspects)} case(s) slower than baseline to confirm")
+        by_case = {row["case"]: row for row in results}
+        suspect_groups = [group for group in groups if any(row["group"] == group for row in regressions)]
+        for row in run_cases(suspect_groups, args.quick, case_filter):
+            if row["case"] in suspects:
+                compare([row], baseline, args.tolerance)
+                print_row(row)
+                if row["p50_ms"] < by_case[row["case"]]["p50_ms"]:
+                    results[results.index(by_case[row["case"]])] = row
+        regressions = compare(results, baseline, args.tolerance)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"results": results}, f, indent=2)
+    if args.update_baseline:
+        save_baseline(args.baseline, results)
+        print(f"baseline updated: {args.baseline}")
+        return 0
+
+    if regressions:
+        print(f"\n{len(regressions)} case(s) slower than baseline by more than {args.tolerance:g}%:")
+        for row in regressions:
+            print(f"  {row['case']}: {row['change_pct']:+.1f}%")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,5 @@
+"""OmniStream headless pipeline engine
+
+The dashboard in ``app.py`` only reads from this package; everything that
+advances the pipeline lives here so it can run without a browser attached.
+"""
@@ -0,0 +1,74 @@
+"""Run the pipeline engine headless: ``python -m omnistream --duration 30``"""
+import argparse
+import time
+
+from omnistream.checkpoint import Checkpointer
+from omnistream.engine import PipelineEngine
+from omnistream.ingestlog import DEFAULT_RETENTION_BYTES, DEFAULT_RETENTION_SECONDS, IngestLog
+from omnistream.latency import ALL_SOURCES
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the OmniStream pipeline engine without the dashboard")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run before exiting")
+    parser.add_argument("--tick-interval", type=float, default=1.0, help="seconds between engine ticks")
+    parser.add_argument("--workers", type=int, default=0, help="worker processes for the stages (0 runs them inline)")
+    parser.add_argument("--metrics-port", type=int, default=None, help="serve Prometheus metrics on this port")
+    parser.add_argument("--log-dir", default=None,
+                        help="buffer fetched batches in a segmented log in this directory "
+                             "(default: no log; batches go straight to the stages)")
+    parser.add_argument("--log-retention-bytes", type=int, default=DEFAULT_RETENTION_BYTES,
+                        help="delete a log partition's oldest segments once it grows past this size")
+    parser.add_argument("--log-retention-seconds", type=float, default=DEFAULT_RETENTION_SECONDS,
+                        help="delete log segments once their newest batch is older than this")
+    parser.add_argument("--checkpoint-dir", default=None,
+                        help="checkpoint offsets and running state here and resume from it on start")
+    parser.add_argument("--entity-dir", default=None,
+                        help="load the entity resolution index from this directory and save it back on exit")
+    parser.add_argument("--checkpoint-interval", type=float, default=10.0, help="seconds between checkpoints")
+    args = parser.parse_args(argv)
+
+    ingest_log = IngestLog(args.log_dir, retention_bytes=args.log_retention_bytes,
+                           retention_seconds=args.log_retention_seconds) if args.log_dir else None
+    checkpoint = Checkpointer(args.checkpoint_dir, interval=args.checkpoint_interval) if args.checkpoint_dir else None
+    engine = PipelineEngine(tick_interval=args.tick_interval, workers=args.workers, metrics_port=args.metrics_port,
+                            ingest_log=ingest_log, checkpoint=checkpoint, entity_dir=args.entity_dir)
+    if engine.recovery:
+        print(f"recovered:         {engine.recovery['path']} in "
+              f"{engine.recovery['load_ms'] + engine.recovery['apply_ms']:.1f} ms, "
+              f"{engine.recovery['messages_behind']:,} batches to catch up")
+    records_before = engine.snapshot()["pipeline_metrics"]["total_records_processed"]
+    started = time.perf_counter()
+    engine.start()
+    try:
+        time.sleep(args.duration)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.stop()
+    elapsed = time.perf_counter() - started
+
+    state = engine.snapshot()
+    metrics = state["pipeline_metrics"]
+    print(f"ticks:             {state['tick_count']}")
+    print(f"records processed: {metrics['total_records_processed']:,}")
+    print(f"records/sec:       {(metrics['total_records_processed'] - records_before) / elapsed:,.1f}")
+    print(f"errors:            {metrics['total_errors']}")
+    print(f"quality score:     {metrics['data_quality_score']:.2f}%")
+    print(f"drift incidents:   {metrics['data_drift_incidents']} "
+          f"({state['drift_stats']['us_per_batch']:.0f} µs per batch checked)")
+    print(f"anomalies:         {state['anomaly_stats']['anomalies']} "
+          f"({state['anomaly_stats']['avg_score_ms']:.2f} ms per tick scored)")
+    print(f"entities:          {state['entity_stats']['entities']:,} "
+          f"({state['entity_stats']['us_per_record']:.0f} µs per record resolved)")
+    for row in state["latency_percentiles"]:
+        if row["window"] == "15m" and row["source"] == ALL_SOURCES and row["stage"] == "end_to_end":
+            print(f"latency p50/p99:   {row['p50']:.1f} / {row['p99']:.1f} ms")
+    if state["ingest_log"]:
+        partitions = state["ingest_log"]["partitions"]
+        print(f"log appended/lag:  {sum(p['end_offset'] for p in partitions):,} / "
+              f"{sum(p['lag'] or 0 for p in partitions):,} batches")
+
+
+if __name__ == "__main__":
+    main()
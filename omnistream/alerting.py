@@ -0,0 +1,225 @@
+"""Streaming threshold alerts over windowed pipeline metrics"""
+import operator
+from collections import deque
+
+OPERATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+}
+
+AGGREGATES = ("avg", "sum", "min", "max", "last", "count")
+
+
+class WindowAggregate:
+    """Sum, count, min and max of the points seen in the last ``window`` seconds.
+
+    Min and max are kept in monotonic deques, so adding a point and
+    expiring old ones is amortised O(1) whatever the window length.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self._points = deque()  # (t, value)
+        self._min = deque()  # values increasing from the front
+        self._max = deque()  # values decreasing from the front
+        self.sum = 0.0
+
+    def add(self, t, value):
+        self._points.append((t, value))
+        self.sum += value
+        while self._min and self._min[-1][1] >= value:
+            self._min.pop()
+        self._min.append((t, value))
+        while self._max and self._max[-1][1] <= value:
+            self._max.pop()
+        self._max.append((t, value))
+        self._expire(t)
+
+    def _expire(self, now):
+        cutoff = now - self.window
+        while self._points and self._points[0][0] <= cutoff:
+            self.sum -= self._points.popleft()[1]
+        while self._min and self._min[0][0] <= cutoff:
+            self._min.popleft()
+        while self._max and self._max[0][0] <= cutoff:
+            self._max.popleft()
+        if not self._points:
+            self.sum = 0.0  # drop accumulated rounding error
+
+    def checkpoint_state(self):
+        return {"points": list(self._points), "min": list(self._min), "max": list(self._max), "sum": self.sum}
+
+    def restore_state(self, state):
+        self._points = deque(state["points"])
+        self._min = deque(state["min"])
+        self._max = deque(state["max"])
+        self.sum = state["sum"]
+
+    def value(self, aggregate):
+        if not self._points:
+            return None
+        if aggregate == "avg":
+            return self.sum / len(self._points)
+        if aggregate == "sum":
+            return self.sum
+        if aggregate == "min":
+            return self._min[0][1]
+        if aggregate == "max":
+            return self._max[0][1]
+        if aggregate == "last":
+            return self._points[-1][1]
+        return float(len(self._points))
+
+
+class AlertRule:
+    """Fire when ``aggregate(metric)`` over ``window`` seconds ``op`` ``threshold``.
+
+    The condition must hold for ``for_duration`` seconds before the rule
+    fires. Once firing it resolves only when the aggregate no longer
+    satisfies ``op`` against ``clear_threshold`` (hysteresis), which
+    defaults to ``threshold``.
+    """
+
+    def __init__(self, name, metric, threshold, op=">", aggregate="avg", window=60.0, for_duration=0.0,
+                 clear_threshold=None, severity="medium", source="Alert Manager", message=None):
+        if op not in OPERATORS:
+            raise ValueError(f"unknown operator {op!r}")
+        if aggregate not in AGGREGATES:
+            raise ValueError(f"unknown aggregate {aggregate!r}")
+        self.name = name
+        self.metric = metric
+        self.threshold = threshold
+        self.op = op
+        self.aggregate = aggregate
+        self.window = window
+        self.for_duration = for_duration
+        self.clear_threshold = threshold if clear_threshold is None else clear_threshold
+        self.severity = severity
+        self.source = source
+        self.message = message
+
+        self.state = "ok"
+        self.since = None
+        self.value = None
+        self.fired = 0
+
+    def condition(self):
+        return f"{self.aggregate}({self.metric}) over {self.window:g}s {self.op} {self.threshold:g}"
+
+    def describe(self, value):
+        if self.message:
+            return self.message.format(value=value, threshold=self.threshold)
+        return f"{self.name}: {self.aggregate}({self.metric}) over {self.window:g}s is {value:.2f} " \
+               f"(threshold {self.op} {self.threshold:g})"
+
+    def evaluate(self, now, value):
+        """Advance the rule's state; returns "firing" or "resolved" on a transition, else None"""
+        self.value = value
+        compare = OPERATORS[self.op]
+        if self.state == "firing":
+            if not compare(value, self.clear_threshold):
+                self.state, self.since = "ok", None
+                return "resolved"
+            return None
+        if not compare(value, self.threshold):
+            self.state, self.since = "ok", None
+            return None
+        if self.state == "ok":
+            self.state, self.since = "pending", now
+        if now - self.since >= self.for_duration:
+            self.state, self.since = "firing", now
+            self.fired += 1
+            return "firing"
+        return None
+
+
+def default_alert_rules():
+    """Thresholds the dashboard draws, evaluated on measured per-tick metrics"""
+    return [
+        AlertRule("Error rate warning", "error_rate", 1.0, window=60, for_duration=30, clear_threshold=0.8,
+                  severity="medium"),
+        AlertRule("Error rate critical", "error_rate", 2.0, window=60, for_duration=15, clear_threshold=1.5,
+                  severity="high"),
+        AlertRule("Data quality degraded", "data_quality_score", 97.0, op="<", aggregate="last", window=1,
+                  clear_threshold=97.5, severity="medium", source="Data Quality Monitor",
+                  message="Data quality score decreased to {value:.2f}%"),
+        AlertRule("Processing latency high", "overall_latency_ms", 500.0, window=300, for_duration=60,
+                  clear_threshold=400.0, severity="medium"),
+        AlertRule("Fetch failures", "failed_fetches", 5, aggregate="sum", window=60, clear_threshold=2,
+                  severity="high"),
+        AlertRule("Pipeline stalled", "records_per_second", 0.0, op="<=", aggregate="max", window=60,
+                  for_duration=30, severity="high"),
+    ]
+
+
+class AlertEvaluator:
+    """Evaluates alert rules incrementally as metric points arrive.
+
+    Rules that share a (metric, window) pair share one
+    WindowAggregate, and each observation touches only the rules on the
+    metrics it carries, so a tick costs O(1) per affected rule.
+    """
+
+    def __init__(self, rules=None):
+        self.rules = list(rules if rules is not None else default_alert_rules())
+        self._windows = {}
+        self._by_metric = {}
+        for rule in self.rules:
+            key = (rule.metric, rule.window)
+            if key not in self._windows:
+                self._windows[key] = WindowAggregate(rule.window)
+            self._by_metric.setdefault(rule.metric, []).append((rule, self._windows[key]))
+        self._windows_by_metric = {}
+        for (metric, _), window in self._windows.items():
+            self._windows_by_metric.setdefault(metric, []).append(window)
+
+    def observe(self, now, metrics):
+        """Feed one point per metric at ``now`` (seconds); returns [(rule, transition, value)]"""
+        transitions = []
+        for metric, value in metrics.items():
+            if metric not in self._by_metric or value is None:
+                continue
+            for window in self._windows_by_metric[metric]:
+                window.add(now, value)
+            for rule, window in self._by_metric[metric]:
+                aggregate = window.value(rule.aggregate)
+                transition = rule.evaluate(now, aggregate)
+                if transition:
+                    transitions.append((rule, transition, aggregate))
+        return transitions
+
+    def firing(self):
+        return [rule for rule in self.rules if rule.state == "firing"]
+
+    def checkpoint_state(self):
+        """Rule states and window contents, keyed so a restart with the same rules can resume them"""
+        return {
+            "rules": {rule.name: (rule.state, rule.since, rule.value, rule.fired) for rule in self.rules},
+            "windows": {key: window.checkpoint_state() for key, window in self._windows.items()},
+        }
+
+    def restore_state(self, state):
+        """Resume rules and windows that still exist; new or changed ones start empty"""
+        for rule in self.rules:
+            if rule.name in state["rules"]:
+                rule.state, rule.since, rule.value, rule.fired = state["rules"][rule.name]
+        for key, window in self._windows.items():
+            if key in state["windows"]:
+                window.restore_state(state["windows"][key])
+
+    def rules_snapshot(self):
+        return [
+            {
+                "name": rule.name,
+                "condition": rule.condition(),
+                "for_s": rule.for_duration,
+                "clear_threshold": rule.clear_threshold,
+                "severity": rule.severity,
+                "state": rule.state,
+                "value": rule.value,
+                "fired": rule.fired,
+            }
+            for rule in self.rules
+        ]
@@ -0,0 +1,176 @@
+"""Streaming anomaly detection over a sources x metrics matrix"""
+import time
+
+import numpy as np
+
+# Detectors that must agree before a value is anomalous
+DETECTORS = ("ewma", "robust", "seasonal")
+
+# Spread floor, as a share of the baseline, so flat series do not score every wobble as infinite
+MIN_RELATIVE_SCALE = 0.1
+
+# 0.6745 scales MAD to a standard deviation for normal data
+MAD_SCALE = 0.6745
+
+# What a checkpoint carries over; the configuration always comes from the constructor
+_STATE_ARRAYS = ("count", "mean", "var", "recent", "hour_count", "hour_mean", "hour_var", "active")
+_STATE_COUNTERS = ("ticks", "series_scored", "anomalies", "score_time", "last_score_ms")
+
+
+def _full_median(windows):
+    # Sorting the short last axis beats np.median, which partitions twice for
+    # an even window; windows that still hold NaN are not used
+    ordered = np.sort(windows, axis=-1)
+    middle = windows.shape[-1] // 2
+    if windows.shape[-1] % 2:
+        return ordered[..., middle]
+    return (ordered[..., middle - 1] + ordered[..., middle]) / 2
+
+
+class AnomalyDetector:
+    """Scores every (source, metric) series on each tick with three baselines.
+
+    State is held as arrays shaped ``(sources, metrics)``, so a tick costs a
+    handful of NumPy operations however many series there are:
+
+    * EWMA: exponentially weighted mean and variance with weight ``alpha``.
+    * Robust: median and MAD of each series' last ``window`` values, kept in
+      a ``(sources, metrics, window)`` ring so each series' window is contiguous.
+    * Seasonal: EWMA mean and variance per hour of day, weight
+      ``seasonal_alpha``, so a value is also compared with the same hour on
+      earlier days.
+
+    Each detector gives an absolute z-score; a series scores the second
+    highest of the three, so at least two baselines must agree. A baseline
+    with fewer than ``min_samples`` values does not vote. Values are scored
+    against the baselines as they were before the value arrived.
+    """
+
+    def __init__(self, sources, metrics, alpha=0.1, window=32, seasonal_alpha=0.2, threshold=5.0, min_samples=10):
+        self.metrics = tuple(metrics)
+        self.alpha = alpha
+        self.window = window
+        self.seasonal_alpha = seasonal_alpha
+        self.threshold = threshold
+        self.min_samples = min_samples
+        shape = (sources, len(self.metrics))
+        self.count = np.zeros(shape, dtype=np.int64)
+        self.mean = np.zeros(shape)
+        self.var = np.zeros(shape)
+        self.recent = np.full(shape + (window,), np.nan, dtype=np.float32)
+        self.hour_count = np.zeros((24,) + shape, dtype=np.int32)
+        self.hour_mean = np.zeros((24,) + shape, dtype=np.float32)
+        self.hour_var = np.zeros((24,) + shape, dtype=np.float32)
+        # Series whose last value was anomalous; alerts fire on the transition only
+        self.active = np.zeros(shape, dtype=bool)
+        self.ticks = 0
+        self.series_scored = 0
+        self.anomalies = 0
+        self.score_time = 0.0
+        self.last_score_ms = 0.0
+
+    @property
+    def series(self):
+        return self.count.size
+
+    @staticmethod
+    def _z(values, center, spread):
+        scale = np.maximum(spread, MIN_RELATIVE_SCALE * np.abs(center) + 1e-9)
+        return np.abs(values - center) / scale
+
+    def observe(self, values, hour, rows=None):
+        """Score and fold in one tick of observations.
+
+        ``values`` is ``(len(rows), metrics)``, NaN where a series has no
+        value this tick; ``rows`` are the source indices it covers (default:
+        all). Returns ``(rows, metrics, values, expected, scores)`` arrays for
+        the series that became anomalous on this tick.
+        """
+        started = time.perf_counter()
+        rows = np.arange(self.count.shape[0]) if rows is None else np.asarray(rows)
+        values = np.asarray(values, dtype=np.float64)
+        observed = ~np.isnan(values)
+        count = self.count[rows]
+        mean = self.mean[rows]
+        var = self.var[rows]
+        recent = self.recent[rows]
+        hour_count = self.hour_count[hour, rows]
+        hour_mean = self.hour_mean[hour, rows].astype(np.float64)
+        hour_var = self.hour_var[hour, rows].astype(np.float64)
+
+        # Score against the baselines as they were before this tick
+        with np.errstate(invalid="ignore"):
+            median = _full_median(recent)
+            mad = _full_median(np.abs(recent - median[..., None])) / MAD_SCALE
+            votes = np.stack([
+                np.where(count >= self.min_samples, self._z(values, mean, np.sqrt(var)), 0.0),
+                np.where(count >= self.window, self._z(values, median, mad), 0.0),
+                np.where(hour_count >= self.min_samples, self._z(values, hour_mean, np.sqrt(hour_var)), 0.0),
+            ])
+        votes[:, ~observed] = 0.0
+        np.nan_to_num(votes, copy=False)
+        scores = np.sort(votes, axis=0)[-2]
+        anomalous = scores >= self.threshold
+        raised = anomalous & ~self.active[rows]
+        self.active[rows] = np.where(observed, anomalous, self.active[rows])
+
+        # Fold the observations into each baseline
+        first = observed & (count == 0)
+        delta = np.where(observed, values - mean, 0.0)
+        step = self.alpha * delta
+        self.mean[rows] = np.where(first, values, mean + step)
+        self.var[rows] = np.where(first, 0.0, np.where(observed, (1 - self.alpha) * (var + delta * step), var))
+        row_index, metric_index = np.nonzero(observed)
+        self.recent[rows[row_index], metric_index, count[row_index, metric_index] % self.window] = \
+            values[row_index, metric_index]
+        self.count[rows] = count + observed
+
+        hour_first = observed & (hour_count == 0)
+        hour_delta = np.where(observed, values - hour_mean, 0.0)
+        hour_step = self.seasonal_alpha * hour_delta
+        self.hour_mean[hour, rows] = np.where(hour_first, values, hour_mean + hour_step)
+        self.hour_var[hour, rows] = np.where(
+            hour_first, 0.0, np.where(observed, (1 - self.seasonal_alpha) * (hour_var + hour_delta * hour_step), hour_var))
+        self.hour_count[hour, rows] = hour_count + observed
+
+        raised_rows, raised_metrics = np.nonzero(raised)
+        elapsed = time.perf_counter() - started
+        self.ticks += 1
+        self.series_scored += int(np.count_nonzero(observed))
+        self.anomalies += len(raised_rows)
+        self.score_time += elapsed
+        self.last_score_ms = elapsed * 1000
+        return (rows[raised_rows], raised_metrics, values[raised_rows, raised_metrics],
+                mean[raised_rows, raised_metrics], scores[raised_rows, raised_metrics])
+
+    def checkpoint_state(self):
+        """Baselines and counters; the caller copies them if it keeps them"""
+        state = {name: getattr(self, name) for name in _STATE_ARRAYS + _STATE_COUNTERS}
+        state["metrics"] = self.metrics
+        return state
+
+    def restore_state(self, state):
+        """Replace the baselines and counters with checkpointed ones.
+
+        Thresholds and weights stay as configured. State for other metrics,
+        or shaped for another number of series or window length, is
+        discarded.
+        """
+        if state.get("metrics") != self.metrics or any(
+                name not in state or np.shape(state[name]) != getattr(self, name).shape for name in _STATE_ARRAYS):
+            return
+        for name in _STATE_ARRAYS + _STATE_COUNTERS:
+            setattr(self, name, state[name])
+
+    def stats(self):
+        return {
+            "series": self.series,
+            "ticks": self.ticks,
+            "series_scored": self.series_scored,
+            "anomalies": self.anomalies,
+            "active": int(np.count_nonzero(self.active)),
+            "last_score_ms": self.last_score_ms,
+            "avg_score_ms": 1000 * self.score_time / self.ticks if self.ticks else 0.0,
+            "state_bytes": sum(array.nbytes for array in (
+                self.count, self.mean, self.var, self.recent, self.hour_count, self.hour_mean, self.hour_var, self.active)),
+        }
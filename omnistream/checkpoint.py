@@ -0,0 +1,206 @@
+"""Periodic, atomic checkpoints of consumer offsets and operator state"""
+import os
+import pickle
+import struct
+import threading
+import time
+import zlib
+
+# File header: magic, format version, payload length, crc32 of the payload
+HEADER = struct.Struct("<4sIQI")
+MAGIC = b"OSCK"
+FORMAT_VERSION = 1
+
+
+class Checkpointer:
+    """Writes the state returned by a capture callable every ``interval`` seconds.
+
+    Capturing runs on the checkpoint thread and is the only part that
+    holds the engine's lock; pickling, writing and fsyncing happen after
+    the lock is released. Each checkpoint goes to a temporary file that is
+    fsynced and renamed over its final name, so a crash mid-write leaves
+    the previous checkpoint intact. The newest ``keep`` checkpoints are
+    kept and ``load`` falls back to an older one if the newest is corrupt.
+
+    Checkpoints are pickles and must only be loaded from a directory this
+    process's user controls.
+    """
+
+    def __init__(self, directory, interval=10.0, keep=2):
+        self.directory = directory
+        self.interval = interval
+        self.keep = max(1, keep)
+        self._capture = None
+        self._after = None
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._write_lock = threading.Lock()
+        self._sequence = 0
+        self.checkpoints = 0
+        self.failures = 0
+        self.last_error = None
+        self.load_failures = 0
+        self.last_load_error = None
+        self.last_path = None
+        self.last_bytes = 0
+        self.last_capture_ms = 0.0
+        self.last_write_ms = 0.0
+        self.last_written_at = None
+        os.makedirs(directory, exist_ok=True)
+        existing = self._paths()
+        if existing:
+            self._sequence = self._sequence_of(existing[-1])
+
+    def bind(self, capture, after=None):
+        """Set the callable that returns the state to checkpoint.
+
+        ``after``, if given, is called with no arguments once each
+        checkpoint has been written, e.g. to save state kept outside it.
+        """
+        self._capture = capture
+        self._after = after
+        return self
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="omnistream-checkpoint", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None, final=True):
+        """Stop the background thread; by default write one last checkpoint"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if final and self._capture is not None:
+            self.checkpoint()
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self.checkpoint()
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+    def checkpoint(self):
+        """Capture and write one checkpoint now; returns its path, or None if it failed"""
+        with self._write_lock:
+            started = time.perf_counter()
+            try:
+                state = self._capture()
+                captured = time.perf_counter()
+                path = self._write(state)
+            except Exception as exc:
+                # A full disk or a value that cannot be pickled costs this checkpoint, not the thread
+                self.failures += 1
+                self.last_error = repr(exc)
+                return None
+            self.last_capture_ms = (captured - started) * 1000
+            self.last_write_ms = (time.perf_counter() - captured) * 1000
+            self.last_written_at = time.time()
+            self.checkpoints += 1
+            self.last_error = None
+            if self._after is not None:
+                try:
+                    self._after()
+                except Exception as exc:
+                    self.last_error = repr(exc)
+            return path
+
+    def _write(self, state):
+        payload = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+        self._sequence += 1
+        path = os.path.join(self.directory, f"checkpoint-{self._sequence:012d}.ckpt")
+        temporary = path + ".tmp"
+        try:
+            with open(temporary, "wb") as f:
+                f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(payload), zlib.crc32(payload)))
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporary, path)
+        except OSError:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        self._fsync_directory()
+        self.last_path = path
+        self.last_bytes = HEADER.size + len(payload)
+        for stale in self._paths()[:-self.keep]:
+            os.remove(stale)
+        return path
+
+    def _fsync_directory(self):
+        # Makes the rename itself durable; not every platform can open a directory
+        try:
+            fd = os.open(self.directory, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+    def _paths(self):
+        names = [name for name in os.listdir(self.directory) if name.startswith("checkpoint-") and name.endswith(".ckpt")]
+        return [os.path.join(self.directory, name) for name in sorted(names)]
+
+    @staticmethod
+    def _sequence_of(path):
+        return int(os.path.basename(path)[len("checkpoint-"):-len(".ckpt")])
+
+    @staticmethod
+    def read(path):
+        """State stored at ``path``; raises ValueError if the file is truncated, corrupt or of another format"""
+        with open(path, "rb") as f:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                raise ValueError("truncated header")
+            magic, version, length, crc = HEADER.unpack(header)
+            if magic != MAGIC or version != FORMAT_VERSION:
+                raise ValueError("not a checkpoint of this format")
+            payload = f.read(length)
+        if len(payload) != length or zlib.crc32(payload) != crc:
+            raise ValueError("truncated or corrupt payload")
+        return pickle.loads(payload)
+
+    def load(self):
+        """(path, state) of the newest readable checkpoint, or (None, None).
+
+        A checkpoint that cannot be read is skipped: besides corrupt files,
+        that covers ones pickled from classes that have since been renamed,
+        moved or changed (AttributeError, ModuleNotFoundError, TypeError...).
+        """
+        for path in reversed(self._paths()):
+            try:
+                return path, self.read(path)
+            except Exception as exc:
+                self.load_failures += 1
+                self.last_load_error = f"{os.path.basename(path)}: {exc!r}"
+                continue
+        return None, None
+
+    def stats(self):
+        return {
+            "directory": self.directory,
+            "interval_s": self.interval,
+            "checkpoints": self.checkpoints,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "load_failures": self.load_failures,
+            "last_load_error": self.last_load_error,
+            "last_path": self.last_path,
+            "last_bytes": self.last_bytes,
+            "last_capture_ms": self.last_capture_ms,
+            "last_write_ms": self.last_write_ms,
+            "last_written_at": self.last_written_at,
+        }
@@ -0,0 +1,405 @@
+"""Asyncio connectors that poll every data source concurrently"""
+import asyncio
+import json
+import queue
+import random
+import ssl
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+
+import pandas as pd
+
+from omnistream.sources import BatchGenerator
+from omnistream.temporal import host_zone
+
+FAILURE_TYPES = [
+    "API Timeout",
+    "Connection Error",
+    "Authentication Failure",
+    "Rate Limit Exceeded",
+    "Malformed Response"
+]
+# A connector raised something other than ConnectorError: a bug rather than a bad response
+CONNECTOR_FAILURE = "Connector Failure"
+
+MAX_RESPONSE_BYTES = 16 * 1024 * 1024
+READ_CHUNK_BYTES = 64 * 1024
+
+
+class ConnectorError(Exception):
+    """A fetch failed; ``failure_type`` is one of FAILURE_TYPES"""
+
+    def __init__(self, failure_type, message=None, retry_after=None):
+        super().__init__(message or failure_type)
+        self.failure_type = failure_type
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Token-bucket rate limiter for one event loop"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        self._refill()
+        while self._tokens < 1:
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+            self._refill()
+        self._tokens -= 1
+
+
+def backoff_delay(attempt, base=0.5, cap=30.0):
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class FetchResult:
+    """Outcome of one fetch, handed from the event loop to the tick loop.
+
+    A batch read back from the ingest log also carries where it sits there,
+    as ``log_position`` (topic, partition, offset).
+    """
+
+    __slots__ = ("source_id", "fetched_at", "batch", "failure_type", "message", "fetch_ms", "consecutive_failures",
+                 "log_position")
+
+    def __init__(self, source_id, fetched_at, batch=None, failure_type=None, message=None, fetch_ms=0.0,
+                 consecutive_failures=0, log_position=None):
+        self.source_id = source_id
+        self.fetched_at = fetched_at
+        self.batch = batch
+        self.failure_type = failure_type
+        self.message = message
+        self.fetch_ms = fetch_ms
+        self.consecutive_failures = consecutive_failures
+        self.log_position = log_position
+
+
+class Connector:
+    """Base connector: subclasses implement ``fetch`` returning a DataFrame.
+
+    ``concurrency`` fetches may be in flight at once, the token bucket
+    caps the request rate, each fetch is bounded by ``timeout`` and
+    failures back off exponentially with jitter.
+    """
+
+    def __init__(self, source_id, poll_interval=1.0, rate_limit=5.0, burst=None, concurrency=1, timeout=2.0,
+                 backoff_base=0.5, backoff_cap=30.0):
+        self.source_id = source_id
+        self.poll_interval = poll_interval
+        self.rate_limit = rate_limit
+        self.burst = burst
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+
+    async def fetch(self):
+        raise NotImplementedError
+
+
+class SimulatedConnector(Connector):
+    """Stands in for a remote API: random latency, occasional failures, synthetic batches"""
+
+    def __init__(self, source_id, latency_range=(20, 300), source_rate=(10, 50), failure_chance=0.05, seed=None,
+                 **kwargs):
+        super().__init__(source_id, **kwargs)
+        self.latency_range = latency_range
+        self.source_rate = source_rate
+        self.failure_chance = failure_chance
+        self.generator = BatchGenerator(source_id, seed=seed)
+        self._random = random.Random(seed)
+        self._latency_ms = self._random.uniform(*latency_range)
+        self._last_fetch = time.monotonic()
+
+    async def fetch(self):
+        # Latency follows a bounded random walk like a real upstream API
+        low, high = self.latency_range
+        self._latency_ms = min(high * 2, max(low / 2, self._latency_ms + self._random.uniform(-20, 20)))
+
+        if self._random.random() < self.failure_chance:
+            failure_type = self._random.choice(FAILURE_TYPES)
+            if failure_type == "API Timeout":
+                # Hang past the deadline so the real timeout path fires
+                await asyncio.sleep(self.timeout * 2)
+            await asyncio.sleep(self._latency_ms / 1000)
+            raise ConnectorError(failure_type, retry_after=1.0 if failure_type == "Rate Limit Exceeded" else None)
+
+        await asyncio.sleep(self._latency_ms / 1000)
+
+        # Records that accumulated at the source since the last successful fetch
+        now = time.monotonic()
+        elapsed, self._last_fetch = now - self._last_fetch, now
+        size = int(elapsed * self._random.randint(*self.source_rate))
+        return self.generator.generate(size, datetime.now())
+
+
+class HttpJsonConnector(Connector):
+    """Polls an HTTP(S) endpoint that returns a JSON array of records.
+
+    Uses plain asyncio streams so hundreds of sources share one event loop
+    without a thread per request. Status codes map onto the pipeline's
+    failure types (401/403 authentication, 429 rate limit).
+
+    ``fields`` renames the endpoint's fields to the columns the stages
+    read: ``record_id``, ``event_time`` and the source's value column
+    (``VALUE_COLUMNS``), e.g. ``{"id": "record_id", "ts": "event_time",
+    "last": "price"}``. Event times may be ISO 8601 text or epoch seconds;
+    text without an offset is read as UTC. They are converted to this
+    machine's local wall-clock time, as the simulated sources stamp them,
+    and unparseable ones become NaT.
+    """
+
+    def __init__(self, source_id, url, headers=None, fields=None, max_bytes=MAX_RESPONSE_BYTES, **kwargs):
+        super().__init__(source_id, **kwargs)
+        self.url = url
+        self.headers = headers or {}
+        self.fields = dict(fields or {})
+        # Responses longer than this are dropped as malformed rather than buffered
+        self.max_bytes = max_bytes
+        parts = urlsplit(url)
+        self._scheme = parts.scheme
+        self._host = parts.hostname
+        self._port = parts.port or (443 if parts.scheme == "https" else 80)
+        self._path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+
+    async def fetch(self):
+        try:
+            reader, writer = await asyncio.open_connection(
+                self._host, self._port, ssl=ssl.create_default_context() if self._scheme == "https" else None
+            )
+        except OSError as exc:
+            raise ConnectorError("Connection Error", str(exc))
+
+        try:
+            headers = {"Host": self._host, "Accept": "application/json", "Connection": "close", **self.headers}
+            request = f"GET {self._path} HTTP/1.1\r\n" + "".join(f"{k}: {v}\r\n" for k, v in headers.items()) + "\r\n"
+            writer.write(request.encode("latin-1"))
+            await writer.drain()
+            raw = bytearray()
+            while True:
+                chunk = await reader.read(READ_CHUNK_BYTES)
+                if not chunk:
+                    break
+                raw += chunk
+                if len(raw) > self.max_bytes:
+                    raise ConnectorError("Malformed Response", f"response larger than {self.max_bytes:,} bytes")
+        except OSError as exc:
+            raise ConnectorError("Connection Error", str(exc))
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass  # The peer reset the connection; it is closed either way
+        raw = bytes(raw)
+
+        head, _, body = raw.partition(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            status = int(lines[0].split()[1])
+        except (IndexError, ValueError):
+            raise ConnectorError("Malformed Response", "invalid status line")
+        response_headers = dict(line.split(": ", 1) for line in lines[1:] if ": " in line)
+
+        if status in (401, 403):
+            raise ConnectorError("Authentication Failure", f"HTTP {status}")
+        if status == 429:
+            retry_after = response_headers.get("Retry-After")
+            raise ConnectorError("Rate Limit Exceeded", "HTTP 429",
+                                 retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None)
+        if status >= 400:
+            raise ConnectorError("Connection Error", f"HTTP {status}")
+        if response_headers.get("Transfer-Encoding", "").lower() == "chunked":
+            try:
+                body = _dechunk(body)
+            except ValueError:
+                raise ConnectorError("Malformed Response", "invalid chunked encoding")
+
+        try:
+            records = json.loads(body)
+        except ValueError as exc:
+            raise ConnectorError("Malformed Response", str(exc))
+        if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+            raise ConnectorError("Malformed Response", "expected a JSON array of records")
+        batch = pd.DataFrame.from_records(records).rename(columns=self.fields)
+        if "event_time" in batch:
+            batch["event_time"] = _local_times(batch["event_time"])
+        return batch
+
+
+def _local_times(values):
+    """Naive local wall-clock times from ISO 8601 text or epoch seconds"""
+    numeric = pd.api.types.is_numeric_dtype(values)
+    times = pd.to_datetime(values, errors="coerce", utc=True, unit="s" if numeric else None)
+    return times.dt.tz_convert(host_zone()).dt.tz_localize(None)
+
+
+def _dechunk(body):
+    chunks = []
+    while body:
+        size_line, _, body = body.partition(b"\r\n")
+        size = int(size_line.split(b";")[0], 16)
+        if size == 0:
+            break
+        chunks.append(body[:size])
+        body = body[size + 2:]
+    return b"".join(chunks)
+
+
+class ConnectorPool:
+    """Runs every connector's poll loop on a single event loop in a background thread.
+
+    Results are handed to the tick loop through a bounded queue; when it
+    is full the poll loops wait, which pushes backpressure onto sources
+    instead of dropping batches. ``max_in_flight`` caps concurrent fetches
+    across all sources.
+
+    With an IngestLog attached, each fetched batch is appended to the
+    source's topic and the queued result carries no batch; the tick loop
+    consumes the log at its own pace. A batch the log cannot take (e.g.
+    the disk is full) travels in the result as before.
+    """
+
+    def __init__(self, connectors, max_pending=1000, max_in_flight=256, log=None):
+        self.connectors = {connector.source_id: connector for connector in connectors}
+        self.max_in_flight = max_in_flight
+        self.log = log
+        self.log_errors = 0
+        self._results = queue.Queue(maxsize=max_pending)
+        self._loop = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._tasks = []
+        self.stats = {source_id: {"fetches": 0, "failures": 0, "in_flight": 0} for source_id in self.connectors}
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        self._ready.clear()
+        self._thread = threading.Thread(target=self._run, name="omnistream-connectors", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def stop(self, timeout=None):
+        if self._loop is None:
+            return
+        # Nothing to cancel once the poll loops have all ended and the loop is closed
+        if self._thread.is_alive() and not self._loop.is_closed():
+            try:
+                for task in self._tasks:
+                    self._loop.call_soon_threadsafe(task.cancel)
+            except RuntimeError:
+                pass  # The loop closed in the meantime
+            self._thread.join(timeout)
+        self._thread = None
+        self._loop = None
+
+    def drain(self, limit=None):
+        """Collect finished fetches without blocking"""
+        results = []
+        while limit is None or len(results) < limit:
+            try:
+                results.append(self._results.get_nowait())
+            except queue.Empty:
+                break
+        return results
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._main())
+        finally:
+            self._loop.close()
+
+    async def _main(self):
+        in_flight = asyncio.Semaphore(self.max_in_flight)
+        self._tasks = []
+        for connector in self.connectors.values():
+            bucket = TokenBucket(connector.rate_limit, connector.burst)
+            for _ in range(connector.concurrency):
+                self._tasks.append(asyncio.ensure_future(self._poll(connector, bucket, in_flight)))
+        self._ready.set()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _poll(self, connector, bucket, in_flight):
+        stats = self.stats[connector.source_id]
+        consecutive_failures = 0
+        while True:
+            await bucket.acquire()
+            started = time.perf_counter()
+            batch, failure_type, message, retry_after = None, None, None, None
+            async with in_flight:
+                stats["in_flight"] += 1
+                try:
+                    batch = await asyncio.wait_for(connector.fetch(), connector.timeout)
+                except asyncio.TimeoutError:
+                    failure_type, message = "API Timeout", f"no response within {connector.timeout:.1f}s"
+                except ConnectorError as exc:
+                    failure_type, message, retry_after = exc.failure_type, str(exc), exc.retry_after
+                except ValueError as exc:
+                    # Decoding errors from connectors that parse their own payloads
+                    failure_type, message = "Malformed Response", repr(exc)
+                except Exception as exc:
+                    # A bug in the connector; reported as such, and it must not end this source's poll loop
+                    failure_type, message = CONNECTOR_FAILURE, repr(exc)
+                finally:
+                    stats["in_flight"] -= 1
+            fetch_ms = (time.perf_counter() - started) * 1000
+
+            stats["fetches"] += 1
+            if failure_type:
+                stats["failures"] += 1
+                consecutive_failures += 1
+            else:
+                consecutive_failures = 0
+
+            fetched_at = datetime.now()
+            if self.log is not None and batch is not None:
+                batch = await self._append(connector.source_id, batch, fetched_at, fetch_ms)
+            await self._publish(FetchResult(
+                connector.source_id, fetched_at, batch, failure_type, message, fetch_ms, consecutive_failures
+            ))
+
+            if failure_type:
+                delay = backoff_delay(consecutive_failures, connector.backoff_base, connector.backoff_cap)
+                if retry_after is not None:
+                    delay = max(delay, retry_after)
+            else:
+                delay = connector.poll_interval - fetch_ms / 1000
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+    async def _append(self, source_id, batch, fetched_at, fetch_ms):
+        """Append a batch to the ingest log off the event loop; returns the batch only if that failed"""
+        if not len(batch):
+            return None
+        try:
+            await self._loop.run_in_executor(
+                None, self.log.append, source_id, batch, fetched_at.timestamp(), {"fetch_ms": fetch_ms}
+            )
+        except OSError:
+            self.log_errors += 1
+            return batch
+        return None
+
+    async def _publish(self, result):
+        while True:
+            try:
+                self._results.put_nowait(result)
+                return
+            except queue.Full:
+                await asyncio.sleep(0.05)
@@ -0,0 +1,365 @@
+"""Streaming data-drift detection with bounded-memory sketches"""
+import math
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+# Columns tracked per source, by kind
+DEFAULT_COLUMNS = {
+    "stock_market": {"numeric": ("price", "volume"), "categorical": ("symbol",)},
+    "weather_data": {"numeric": ("temperature_f", "humidity"), "categorical": ("station_id",)},
+    "social_media": {"numeric": ("likes", "shares"), "categorical": ("user_handle",)},
+    "retail_transactions": {"numeric": ("amount",), "categorical": ("store_id", "customer_name")},
+    "iot_sensors": {"numeric": ("reading", "battery_pct"), "categorical": ()},
+}
+
+# Reference quantiles whose bins the numeric PSI compares
+PSI_QUANTILES = np.linspace(0.1, 0.9, 9)
+
+# Points (as quantiles of either window) the KS distance is evaluated at
+KS_QUANTILES = np.linspace(0.01, 0.99, 50)
+
+# Floor for bin shares, so an empty bin does not make PSI infinite
+PSI_EPSILON = 1e-4
+
+
+class KLLSketch:
+    """Streaming quantile sketch (Karnin, Lang and Liberty).
+
+    Items live in compactors; an item at level ``h`` stands for ``2**h``
+    inputs. A compactor over its capacity is sorted and every other item,
+    from a random offset, moves up a level. Capacities shrink by 2/3 per
+    level below the top, so memory is O(k log(n/k)) and the rank error is
+    about 1.7/k whatever the input order.
+    """
+
+    def __init__(self, k=200, seed=None):
+        self.k = k
+        self.count = 0
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+        self._sorted = None
+
+    def __len__(self):
+        """Items retained, not inputs seen"""
+        return sum(len(items) for items in self.levels)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, math.ceil(self.k * (2 / 3) ** depth))
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        self.count += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._sorted = None
+        while True:
+            level = next((h for h, items in enumerate(self.levels) if len(items) > self._capacity(h)), None)
+            if level is None:
+                return
+            self._compact(level)
+
+    def _compact(self, level):
+        items = np.sort(self.levels[level])
+        # An odd item out stays behind so the weights still add up
+        held = items[-1:] if len(items) % 2 else items[:0]
+        promoted = items[int(self._rng.integers(2)):len(items) - len(held):2]
+        self.levels[level] = held
+        if level + 1 == len(self.levels):
+            self.levels.append(np.empty(0))
+        self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+
+    def _weighted(self):
+        if self._sorted is None:
+            items = np.concatenate(self.levels)
+            weights = np.concatenate([np.full(len(items), 2.0 ** level) for level, items in enumerate(self.levels)])
+            order = np.argsort(items, kind="stable")
+            self._sorted = items[order], np.cumsum(weights[order])
+        return self._sorted
+
+    def cdf(self, points):
+        """Estimated share of inputs <= each point"""
+        items, cumulative = self._weighted()
+        if not len(items):
+            return np.zeros(len(points))
+        ranks = np.searchsorted(items, points, side="right")
+        return np.where(ranks > 0, cumulative[np.maximum(ranks - 1, 0)], 0.0) / cumulative[-1]
+
+    def quantiles(self, fractions):
+        """Estimated input values at each fraction of the rank"""
+        items, cumulative = self._weighted()
+        if not len(items):
+            return np.full(len(fractions), np.nan)
+        ranks = np.searchsorted(cumulative, np.asarray(fractions) * cumulative[-1], side="left")
+        return items[np.minimum(ranks, len(items) - 1)]
+
+    def nbytes(self):
+        return sum(items.nbytes for items in self.levels)
+
+
+class FrequencySketch:
+    """Count-min sketch plus a table of the ``top`` most frequent keys.
+
+    Each batch is reduced to its distinct keys first, so hashing and table
+    updates scale with cardinality rather than rows. Keys are hashed with
+    CRC-32 of their text, which unlike ``hash()`` is the same in every
+    process, so a checkpointed table stays valid. Estimates never
+    undercount; they overcount by at most ``e / width`` of the total with
+    probability ``1 - exp(-depth)``.
+    """
+
+    def __init__(self, width=1024, depth=4, top=32, seed=0):
+        self.width = width
+        self.top = top
+        self.count = 0
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        self.heavy = {}
+        rng = np.random.default_rng(seed)
+        self._multipliers = rng.integers(1, 2 ** 63, depth, dtype=np.uint64) | np.uint64(1)
+        self._offsets = rng.integers(0, 2 ** 63, depth, dtype=np.uint64)
+
+    def _cells(self, keys):
+        hashes = np.fromiter((zlib.crc32(str(key).encode()) for key in keys), dtype=np.uint64, count=len(keys))
+        # Multiply-shift hashing, one row per (multiplier, offset) pair; overflow wraps
+        mixed = hashes[None, :] * self._multipliers[:, None] + self._offsets[:, None]
+        return (mixed >> np.uint64(32)) % np.uint64(self.width)
+
+    def update(self, values):
+        codes, keys = pd.factorize(np.asarray(values), use_na_sentinel=True)
+        codes = codes[codes >= 0]
+        if not len(codes):
+            return
+        counts = np.bincount(codes, minlength=len(keys))
+        self.count += len(codes)
+        cells = self._cells(keys)
+        for row, columns in enumerate(cells):
+            np.add.at(self.table[row], columns, counts)
+        estimates = self.table[np.arange(len(cells))[:, None], cells].min(axis=0)
+        self.heavy.update(zip(keys.tolist(), estimates.tolist()))
+        if len(self.heavy) > self.top:
+            self.heavy = dict(sorted(self.heavy.items(), key=lambda item: item[1], reverse=True)[:self.top])
+
+    def estimate(self, keys):
+        """Estimated occurrences of each key"""
+        if not len(keys):
+            return np.zeros(0, dtype=np.int64)
+        cells = self._cells(keys)
+        return self.table[np.arange(len(cells))[:, None], cells].min(axis=0)
+
+    def nbytes(self):
+        return self.table.nbytes
+
+
+def population_stability(expected, actual):
+    """PSI between two arrays of bin shares"""
+    expected = np.maximum(expected, PSI_EPSILON)
+    actual = np.maximum(actual, PSI_EPSILON)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+class ColumnDrift:
+    """Reference and live window of one column, and the live window's drift scores.
+
+    The first ``reference_rows`` rows build the reference sketch, which is
+    then frozen. Later rows go to the live sketch, which is scored against
+    the reference after every batch once it holds ``min_rows`` rows, and is
+    replaced by an empty one after ``window_rows`` rows. A window raises at
+    most one incident.
+    """
+
+    def __init__(self, kind, reference_rows, window_rows, min_rows, k):
+        self.kind = kind
+        self.reference_rows = reference_rows
+        self.window_rows = window_rows
+        self.min_rows = min_rows
+        self.k = k
+        self.reference = self._sketch()
+        self.live = self._sketch()
+        self.reference_seen = 0
+        self.live_seen = 0
+        self.windows = 0
+        self.psi = None
+        self.ks = None
+        self.drifting = False
+        self.incidents = 0
+        # Bin edges or keys, and their shares, of the frozen reference
+        self._baseline = None
+
+    def _sketch(self):
+        return KLLSketch(self.k) if self.kind == "numeric" else FrequencySketch()
+
+    def observe(self, values, psi_threshold, ks_threshold):
+        """Fold one batch's values in; True if this batch raised an incident"""
+        if self.reference_seen < self.reference_rows:
+            taken = values[:self.reference_rows - self.reference_seen]
+            self.reference.update(taken)
+            self.reference_seen += len(taken)
+            values = values[len(taken):]
+            if not len(values):
+                return False
+        self.live.update(values)
+        self.live_seen += len(values)
+        if self.live_seen < self.min_rows or not self.reference.count or not self.live.count:
+            return False
+
+        self.psi, self.ks = self._scores()
+        drifting = self.psi >= psi_threshold or (self.ks is not None and self.ks >= ks_threshold)
+        raised = drifting and not self.drifting
+        self.drifting = self.drifting or drifting
+        if raised:
+            self.incidents += 1
+        if self.live_seen >= self.window_rows:
+            self.live = self._sketch()
+            self.live_seen = 0
+            self.windows += 1
+            self.drifting = False
+        return raised
+
+    def _reference_baseline(self):
+        if self._baseline is None:
+            if self.kind == "numeric":
+                edges = np.unique(self.reference.quantiles(PSI_QUANTILES))
+                expected = np.diff(self.reference.cdf(edges), prepend=0.0, append=1.0)
+                points = self.reference.quantiles(KS_QUANTILES)
+                self._baseline = edges, expected, points, self.reference.cdf(points)
+            else:
+                # Categories are the reference's heaviest keys plus an "everything else" bin
+                keys = list(self.reference.heavy)
+                expected = self.reference.estimate(keys) / self.reference.count
+                self._baseline = keys, np.append(expected, max(0.0, 1 - expected.sum()))
+        return self._baseline
+
+    def _scores(self):
+        if self.kind == "numeric":
+            edges, expected, points, reference_cdf = self._reference_baseline()
+            live_points = self.live.quantiles(KS_QUANTILES)
+            # One pass over the live sketch for the PSI edges and both sets of KS points
+            live_cdf = self.live.cdf(np.concatenate([edges, points, live_points]))
+            actual = np.diff(live_cdf[:len(edges)], prepend=0.0, append=1.0)
+            reference_cdf = np.concatenate([reference_cdf, self.reference.cdf(live_points)])
+            ks = np.max(np.abs(reference_cdf - live_cdf[len(edges):]))
+            return population_stability(expected, actual), float(ks)
+        keys, expected = self._reference_baseline()
+        actual = np.minimum(self.live.estimate(keys) / self.live.count, 1.0)
+        actual = np.append(actual, max(0.0, 1 - actual.sum()))
+        return population_stability(expected, actual), None
+
+    def status(self):
+        if self.reference_seen < self.reference_rows:
+            return "building reference"
+        if self.psi is None:
+            return "warming up"
+        return "drift" if self.drifting else "stable"
+
+    def nbytes(self):
+        return self.reference.nbytes() + self.live.nbytes()
+
+
+class DriftDetector:
+    """Checks every batch's tracked columns against a reference window.
+
+    Numeric columns are summarised by KLL quantile sketches and scored
+    with PSI over reference deciles and a KS distance; categorical columns
+    by count-min sketches and scored with PSI over the reference's most
+    frequent values. Windows are counted in rows, so memory per column is
+    fixed and the stream is read once. Time spent per batch is accumulated
+    so the detector's own overhead can be reported.
+    """
+
+    def __init__(self, columns=None, reference_rows=5000, window_rows=2000, min_rows=500,
+                 psi_threshold=0.25, ks_threshold=0.1, k=200):
+        self.columns = columns if columns is not None else DEFAULT_COLUMNS
+        self.reference_rows = reference_rows
+        self.window_rows = window_rows
+        self.min_rows = min_rows
+        self.psi_threshold = psi_threshold
+        self.ks_threshold = ks_threshold
+        self.k = k
+        self._plans = {}
+        self._trackers = {}
+        self.batches = 0
+        self.rows = 0
+        self.eval_time = 0.0
+        self.incidents = 0
+
+    def plan(self, source_id):
+        """(column, kind) pairs tracked for a source (compiled once)"""
+        if source_id not in self._plans:
+            kinds = self.columns.get(source_id, {})
+            self._plans[source_id] = [(column, kind) for kind in ("numeric", "categorical")
+                                      for column in kinds.get(kind, ())]
+        return self._plans[source_id]
+
+    def observe(self, batch, source_id):
+        """Fold a batch into its source's sketches; returns the incidents it raised"""
+        plan = self.plan(source_id)
+        if not plan or not len(batch):
+            return []
+        started = time.perf_counter()
+        raised = []
+        for column, kind in plan:
+            if column not in batch:
+                continue
+            tracker = self._trackers.get((source_id, column))
+            if tracker is None:
+                tracker = self._trackers[(source_id, column)] = ColumnDrift(
+                    kind, self.reference_rows, self.window_rows, self.min_rows, self.k)
+            if tracker.observe(batch[column].to_numpy(), self.psi_threshold, self.ks_threshold):
+                raised.append({"source": source_id, "column": column, "psi": tracker.psi, "ks": tracker.ks})
+        self.incidents += len(raised)
+        self.batches += 1
+        self.rows += len(batch)
+        self.eval_time += time.perf_counter() - started
+        return raised
+
+    def checkpoint_state(self):
+        """Sketches and counters; the caller copies them if it keeps them"""
+        return {
+            "trackers": self._trackers,
+            "batches": self.batches,
+            "rows": self.rows,
+            "eval_time": self.eval_time,
+            "incidents": self.incidents,
+        }
+
+    def restore_state(self, state):
+        """Replace the sketches and counters with checkpointed ones; untracked columns are dropped"""
+        self._trackers = {
+            (source_id, column): tracker for (source_id, column), tracker in state["trackers"].items()
+            if (column, tracker.kind) in self.plan(source_id)
+        }
+        self.batches = state["batches"]
+        self.rows = state["rows"]
+        self.eval_time = state["eval_time"]
+        self.incidents = state["incidents"]
+
+    def stats(self):
+        return {
+            "columns": len(self._trackers),
+            "batches": self.batches,
+            "rows": self.rows,
+            "incidents": self.incidents,
+            "sketch_bytes": sum(tracker.nbytes() for tracker in self._trackers.values()),
+            "us_per_batch": 1e6 * self.eval_time / self.batches if self.batches else 0.0,
+            "rows_per_sec": self.rows / self.eval_time if self.eval_time else 0.0,
+        }
+
+    def columns_snapshot(self):
+        """One row per tracked column, for the drift table"""
+        return [{
+            "source": source_id,
+            "column": column,
+            "kind": tracker.kind,
+            "status": tracker.status(),
+            "psi": tracker.psi,
+            "ks": tracker.ks,
+            "reference_rows": tracker.reference_seen,
+            "live_rows": tracker.live_seen,
+            "windows": tracker.windows,
+            "incidents": tracker.incidents,
+        } for (source_id, column), tracker in self._trackers.items()]
@@ -0,0 +1,803 @@
+"""Pipeline engine that advances on its own tick loop, independent of page renders"""
+import copy
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from types import MappingProxyType
+
+import numpy as np
+
+from omnistream.alerting import AlertEvaluator
+from omnistream.anomaly import AnomalyDetector
+from omnistream.connectors import CONNECTOR_FAILURE, ConnectorPool, FetchResult, SimulatedConnector
+from omnistream.drift import DriftDetector
+from omnistream.entities import EntityIndex, EntityResolver, write_generation
+from omnistream.eventlog import EventLog
+from omnistream.exporter import MetricsRegistry, MetricsServer
+from omnistream.geo import GeoEnricher
+from omnistream.ingestlog import LogConsumer
+from omnistream.latency import LatencyTracker
+from omnistream.parallel import make_executor
+from omnistream.quality import QualityEngine
+from omnistream.resources import ResourceSampler
+from omnistream.stages import PROCESSING_STEPS, StageRuntime
+from omnistream.temporal import CalendarEnricher
+from omnistream.timeseries import RollupStore
+
+# Static description of the simulated sources: display name, initial latency
+# range (ms) and how long ago (minutes) the source last reported at startup
+SOURCE_DEFINITIONS = {
+    "stock_market": {"name": "Stock Market API", "latency_range": (50, 150), "last_seen_minutes": 2},
+    "weather_data": {"name": "Weather API", "latency_range": (100, 250), "last_seen_minutes": 3},
+    "social_media": {"name": "Social Media Analytics", "latency_range": (150, 300), "last_seen_minutes": 1},
+    "retail_transactions": {"name": "Retail Transactions", "latency_range": (75, 200), "last_seen_minutes": 4},
+    "iot_sensors": {"name": "IoT Sensor Network", "latency_range": (20, 80), "last_seen_minutes": 2},
+}
+
+TIMESERIES_COLUMNS = ("throughput", "latency", "error_rate", "quality_score")
+
+# Resolutions (seconds) the metric history is rolled up at, finest first, and
+# how many buckets each keeps; the hourly and daily levels grow with history_hours
+ROLLUP_LEVELS = ((1, 3600), (60, 7 * 24 * 60), (3600, 31 * 24), (86400, 366))
+
+# Spans offered by the dashboard's time range selector, in seconds
+TIME_RANGES = {"Last Hour": 3600, "Last Day": 86400, "Last Week": 7 * 86400, "Last Month": 30 * 86400}
+
+# Plot widths (px) the history of each time range is published for
+CHART_WIDTHS = (600, 1200)
+
+# Per-source metrics scored by the anomaly detector each tick, with their alert labels
+ANOMALY_METRICS = {
+    "records": "records processed",
+    "rejected_pct": "rejected share (%)",
+    "fetch_ms": "fetch time (ms)",
+    "processing_ms": "processing time (ms)",
+}
+
+# Most anomalies raised as alerts per tick, highest scores first; the rest are only counted
+MAX_ANOMALY_ALERTS = 10
+
+# Failure types that are raised as high severity alerts
+HIGH_SEVERITY_FAILURES = ("Authentication Failure", "Connection Error", CONNECTOR_FAILURE)
+
+# Pipeline metrics written to the metrics table every tick
+PERSISTED_METRICS = (
+    "total_records_processed",
+    "total_errors",
+    "records_per_second",
+    "overall_latency_ms",
+    "data_quality_score",
+)
+
+# Newest alerts and events included in every snapshot; older ones are paged with query_log
+RECENT_LOG_ENTRIES = 20
+
+# Weight of the latest tick in the smoothed data quality score
+QUALITY_SMOOTHING = 0.2
+
+# Batches read from the ingest log per tick; the rest wait in the log
+MAX_INGEST_MESSAGES = 1000
+
+
+class PipelineEngine:
+    """Simulated multi-source pipeline that ticks on a background thread.
+
+    All mutable state is guarded by a single lock. Readers such as the
+    dashboard call ``snapshot()``, which hands every caller the same
+    read-only copy of that state until the state changes, so any number of
+    viewers can share one engine. The copy is made after the lock is
+    released, so publishing does not stall the tick.
+    """
+
+    def __init__(self, tick_interval=1.0, history_hours=48, max_log_entries=5000, source_rate=(10, 50),
+                 persistence=None, connectors=None, workers=0, alert_rules=None, metrics_port=None,
+                 resource_interval=1.0, ingest_log=None, max_ingest_messages=MAX_INGEST_MESSAGES, checkpoint=None,
+                 drift_columns=None, entity_dir=None):
+        self.tick_interval = tick_interval
+        self.history_hours = history_hours
+        self.max_log_entries = max_log_entries
+        # Optional WriteBehindWriter; started and stopped with the engine
+        self.persistence = persistence
+        # Optional IngestLog between the connectors and the stages; closed with the engine
+        self.ingest_log = ingest_log
+        self.max_ingest_messages = max_ingest_messages
+
+        self._lock = threading.Lock()
+        # Serialises snapshot builds; taken before ``_lock``, never while holding it
+        self._publish_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        now = datetime.now()
+        self.start_time = now
+        self.last_update = now
+        self.tick_count = 0
+        # Bumped whenever per-source state changes; lets the UI reuse figures built from it
+        self.sources_version = 0
+
+        # One connector per source; by default simulated APIs producing
+        # ``source_rate`` records per second
+        if connectors is None:
+            connectors = [
+                SimulatedConnector(source_id, latency_range=definition["latency_range"], source_rate=source_rate,
+                                   poll_interval=tick_interval)
+                for source_id, definition in SOURCE_DEFINITIONS.items()
+            ]
+        self.connectors = ConnectorPool(connectors, log=ingest_log)
+        self.ingest = LogConsumer(ingest_log, self.connectors.connectors) if ingest_log is not None else None
+        # Offsets of consumed batches the stages have not finished, per (topic, partition)
+        self._in_flight_offsets = {}
+        # Batches for the worker processes, handed over once the tick releases the lock
+        self._deferred = []
+
+        self.data_sources = {}
+        for source_id in self.connectors.connectors:
+            definition = SOURCE_DEFINITIONS.get(source_id, {"name": source_id, "latency_range": (0, 0), "last_seen_minutes": 0})
+            self.data_sources[source_id] = {
+                "name": definition["name"],
+                "status": "active",
+                "records_processed": 0,
+                "records_rejected": 0,
+                "failures": 0,
+                "last_update": now - timedelta(minutes=definition["last_seen_minutes"]),
+                "latency_ms": random.randint(*definition["latency_range"]),
+            }
+
+        self.processing_steps = list(PROCESSING_STEPS)
+        self.quality = QualityEngine(source_names={
+            source_id: source["name"] for source_id, source in self.data_sources.items()
+        })
+        # Known entities, memory-mapped from ``entity_dir`` if one is given and saved back
+        # there after every checkpoint and on stop
+        self.entity_dir = entity_dir
+        self.entities = EntityResolver(EntityIndex.open(entity_dir) if entity_dir else None)
+        self._entity_save_lock = threading.Lock()
+        self._entities_saved_version = self.entities.index.version
+        self.entity_saves = 0
+        self.entity_save_error = None
+        # Reverse geocoding against the bundled places, with a per-cell candidate cache
+        self.geo = GeoEnricher()
+        # Calendar and time zone tables, built once for the years around now
+        self.calendar = CalendarEnricher()
+        self.stage_runtime = StageRuntime(self.processing_steps, overrides={
+            "data_validation": self.quality.validate,
+            "geospatial_enrichment": self.geo,
+            "data_enrichment": self.calendar,
+            "entity_resolution": self.entities,
+        })
+        # Sketches of each source's columns, checked for drift as batches are submitted
+        self.drift = DriftDetector(drift_columns)
+        # Baselines for every source x ANOMALY_METRICS series, scored once per tick
+        self._source_rows = {source_id: row for row, source_id in enumerate(self.data_sources)}
+        self.anomalies = AnomalyDetector(len(self.data_sources), ANOMALY_METRICS)
+        # ``workers=0`` runs the stages on the tick thread, otherwise in a process pool
+        self.stage_executor = make_executor(self.stage_runtime, self.quality, workers=workers, return_output=False,
+                                            entity_dir=entity_dir)
+        # Latency histograms per source x stage, plus "fetch" and "end_to_end"
+        self.latency = LatencyTracker()
+        self._latency_rows = []
+        self._latency_rows_tick = None
+        # /proc samples of the engine's threads and stage workers, every ``resource_interval`` seconds
+        self.resources = ResourceSampler(resource_interval, worker_pids=self.stage_executor.worker_pids)
+
+        self.pipeline_metrics = {
+            "total_records_processed": 0,
+            "total_errors": 0,
+            "overall_latency_ms": 0,
+            "records_per_second": 0.0,
+            "data_quality_score": 98.5,
+            "pipeline_uptime": 99.98,
+            "active_sources": len(self.data_sources),
+            "active_destinations": 3,
+            "schema_violations": 0,
+            "data_drift_incidents": 0
+        }
+
+        # Metric history at every rollup level; each level is seeded with
+        # history_hours of made-up buckets so charts are not empty on startup
+        levels = [(resolution, capacity if resolution < 3600 else max(capacity, history_hours * 3600 // resolution + 1))
+                  for resolution, capacity in ROLLUP_LEVELS]
+        self.timeseries = RollupStore(TIMESERIES_COLUMNS, levels)
+        rng = np.random.default_rng()
+        for level, (resolution, capacity) in enumerate(levels):
+            count = min(capacity, history_hours * 3600 // resolution)
+            newest = self.timeseries.stores[level].bucket(now)
+            self.timeseries.extend(level, newest - np.arange(count, 0, -1) * np.timedelta64(resolution, "s"), {
+                "throughput": rng.uniform(100, 200, count),
+                "latency": rng.uniform(50, 500, count),
+                "error_rate": rng.uniform(0, 2, count),
+                "quality_score": rng.uniform(95, 100, count),
+            })
+
+        # Rule engine counters already folded into the quality score
+        self._quality_checked = 0
+        self._quality_rejected = 0
+
+        # Alert and event logs; repeats within a few minutes coalesce into one entry
+        self.alerts = EventLog(capacity=max_log_entries)
+        self.events = EventLog(capacity=max_log_entries, source_field="component", level_field="type")
+        # Threshold rules evaluated on the metrics each tick measures; defaults in omnistream.alerting
+        self.alerting = AlertEvaluator(alert_rules)
+
+        # Prometheus metrics; served over HTTP only when a port is given
+        self.metrics = MetricsRegistry()
+        self._register_metrics()
+        self.metrics_server = MetricsServer(self.metrics, metrics_port) if metrics_port is not None else None
+
+        # Bumped whenever the state changes; the published snapshot is rebuilt on
+        # the first read after that and replaced wholesale, never mutated
+        self.state_version = 0
+        self._published = None
+
+        # Optional Checkpointer; the engine resumes from its newest checkpoint right away
+        self.checkpoint = checkpoint
+        self.recovery = None
+        if checkpoint is not None:
+            checkpoint.bind(self._checkpoint_state, after=self.save_entities)
+            self.recover()
+
+    def _register_metrics(self):
+        metrics = self.metrics
+        self._records_counter = metrics.counter(
+            "omnistream_records_processed_total", "Total number of records processed", ("source", "status"))
+        self._fetch_failures_counter = metrics.counter(
+            "omnistream_fetch_failures_total", "Source fetches that failed", ("source", "failure_type"))
+        self._latency_histogram = metrics.histogram(
+            "omnistream_processing_latency_seconds", "Time taken to process records", ("source", "processing_stage"))
+        metrics.gauge("omnistream_data_quality_score", "Overall quality score of processed data", ("source",),
+                      self._quality_gauge_values)
+        metrics.gauge("omnistream_records_per_second", "Records processed per second over the last tick", (),
+                      lambda: [((), self.pipeline_metrics["records_per_second"])])
+        metrics.gauge("omnistream_alert_rules_firing", "Alert rules currently firing", ("severity",),
+                      self._firing_gauge_values)
+
+    def _quality_gauge_values(self):
+        with self._lock:
+            values = [(("all",), self.pipeline_metrics["data_quality_score"])]
+            for source_id, source in self.data_sources.items():
+                seen = source["records_processed"] + source["records_rejected"]
+                values.append(((source_id,), 100 * source["records_processed"] / seen if seen else 100.0))
+        return values
+
+    def _firing_gauge_values(self):
+        with self._lock:
+            firing = [rule.severity for rule in self.alerting.firing()]
+        return [((severity,), firing.count(severity)) for severity in ("high", "medium", "low")]
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+    def start(self):
+        """Start the background tick loop (no-op if already running)"""
+        if self.is_running():
+            return self
+        if self.persistence is not None:
+            self.persistence.start()
+        if self.metrics_server is not None:
+            self.metrics_server.start()
+        self.stage_executor.start()
+        if self.checkpoint is not None:
+            self.checkpoint.start()
+        self.resources.start()
+        self.connectors.start()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="omnistream-engine", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """Signal the tick loop to exit and wait for it"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.connectors.stop(timeout)
+        # Last checkpoint once nothing else changes the state
+        if self.checkpoint is not None:
+            self.checkpoint.stop(timeout)
+        if self.ingest_log is not None:
+            self.ingest_log.close()
+        self.resources.stop(timeout)
+        self.stage_executor.stop(timeout)
+        self.save_entities()
+        if self.metrics_server is not None:
+            self.metrics_server.stop(timeout)
+        if self.persistence is not None:
+            self.persistence.stop(timeout)
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        while not self._stop_event.wait(self.tick_interval):
+            self.tick()
+
+    # ------------------------------------------------------------------
+    # Processing
+    # ------------------------------------------------------------------
+    def tick(self, now=None):
+        """Advance the simulated pipeline by one cycle"""
+        now = now or datetime.now()
+        with self._lock:
+            self._tick(now)
+            self.state_version += 1
+            deferred, self._deferred = self._deferred, []
+        # A saturated worker pool blocks the hand-off for backpressure; readers of
+        # the engine state must not wait behind it
+        for batch, source_id, result in deferred:
+            if self.stage_executor.offloads(batch):
+                self.stage_executor.submit(batch, source_id, result)
+            else:
+                with self._lock:
+                    self.stage_executor.submit(batch, source_id, result)
+
+    def _tick(self, now):
+        # Process every fetch the connectors completed since the last tick
+        results = self.connectors.drain()
+        failed_fetches = 0
+        for result in results:
+            source_id = result.source_id
+            source = self.data_sources[source_id]
+            fetched_at = result.fetched_at.timestamp()
+            self.latency.record(source_id, "fetch", result.fetch_ms, fetched_at)
+
+            if result.failure_type:
+                source["failures"] += 1
+                source["status"] = "retrying"
+                failed_fetches += 1
+                failure_type = result.failure_type
+                self._fetch_failures_counter.inc(source_id, failure_type)
+
+                # Add an alert for the failure
+                self._raise_alert(
+                    now, source["name"],
+                    f"{failure_type} encountered when processing {source_id}",
+                    "high" if failure_type in HIGH_SEVERITY_FAILURES else "medium"
+                )
+                # The backlog is picked up by the next successful fetch
+                continue
+
+            source["status"] = "active"
+            # Batches that went into the ingest log arrive through the consumer below
+            if result.batch is None or len(result.batch) <= 0:
+                continue
+            self._check_drift(now, source_id, result.batch)
+            self._submit(result.batch, source_id, result)
+
+        # Batches waiting in the ingest log, up to this tick's share
+        consumed = self.ingest.poll(self.max_ingest_messages) if self.ingest is not None else []
+        for record in consumed:
+            batch, headers = record.decode()
+            result = FetchResult(record.topic, datetime.fromtimestamp(record.timestamp), batch,
+                                 fetch_ms=headers.get("fetch_ms", 0.0),
+                                 log_position=(record.topic, record.partition, record.offset))
+            self._in_flight_offsets.setdefault((record.topic, record.partition), set()).add(record.offset)
+            self._check_drift(now, record.topic, batch)
+            self._submit(batch, record.topic, result)
+        if self.ingest_log is not None:
+            self.ingest_log.enforce_retention(now.timestamp())
+
+        # Batches the stages have finished with; inline execution completes them at once
+        completed = self.stage_executor.completed()
+        if results or consumed or completed:
+            self.sources_version += 1
+        # Per source this tick: batches, records in, records out, rejected, fetch ms, stage ms
+        observations = {}
+        for result, _, trace in completed:
+            source_id = result.source_id
+            if result.log_position is not None:
+                topic, partition, offset = result.log_position
+                self._in_flight_offsets[(topic, partition)].discard(offset)
+            source = self.data_sources[source_id]
+            fetched_at = result.fetched_at.timestamp()
+            records_this_cycle = len(result.batch)
+            # Loaded batches stay with the stages; the trace says how many made it through
+            records_out = trace[-1]["records_out"]
+
+            # Update metrics from what the fetch and the stages actually measured
+            records_rejected = sum(step["errors"] for step in trace)
+            source["records_processed"] += records_out
+            source["records_rejected"] += records_rejected
+            processing_ms = sum(step["wall_ms"] for step in trace)
+            source["latency_ms"] = result.fetch_ms + processing_ms
+            observed = observations.setdefault(source_id, [0, 0, 0, 0, 0.0, 0.0])
+            observed[0] += 1
+            observed[1] += records_this_cycle
+            observed[2] += records_out
+            observed[3] += records_rejected
+            observed[4] += result.fetch_ms
+            observed[5] += processing_ms
+            for step in trace:
+                self.latency.record(source_id, step["stage"], step["wall_ms"], fetched_at)
+                self._latency_histogram.observe(step["wall_ms"] / 1000, source_id, step["stage"])
+            self.latency.record(source_id, "end_to_end", source["latency_ms"], fetched_at)
+            self._latency_histogram.observe(result.fetch_ms / 1000, source_id, "fetch")
+            self._latency_histogram.observe(source["latency_ms"] / 1000, source_id, "end_to_end")
+            self._records_counter.inc(source_id, "processed", amount=records_out)
+            self._records_counter.inc(source_id, "rejected", amount=records_rejected)
+            source["last_update"] = result.fetched_at
+            self._persist("batch_summaries", {
+                "processed_at": now,
+                "source_id": source_id,
+                "records_in": records_this_cycle,
+                "records_out": records_out,
+                "records_rejected": records_rejected,
+                "wall_ms": source["latency_ms"],
+            })
+
+            # Log an event for large batches
+            if records_this_cycle > 30:
+                self._log_event(now, source["name"], f"Processed large batch: {records_this_cycle} records")
+
+        self._detect_anomalies(now, observations)
+
+        # Update overall pipeline metrics
+        metrics = self.pipeline_metrics
+        total_records = sum(s["records_processed"] for s in self.data_sources.values())
+        new_records = total_records - metrics["total_records_processed"]
+        metrics["total_records_processed"] = total_records
+
+        # Calculate a weighted average latency
+        latencies = [s["latency_ms"] for s in self.data_sources.values()]
+        metrics["overall_latency_ms"] = sum(latencies) / len(latencies)
+
+        # Count total errors: failed fetches plus records rejected by the stages
+        total_errors = sum(s["failures"] + s["records_rejected"] for s in self.data_sources.values())
+        new_errors = total_errors - metrics["total_errors"]
+        metrics["total_errors"] = total_errors
+
+        elapsed = (now - self.last_update).total_seconds()
+        metrics["records_per_second"] = new_records / elapsed if elapsed > 0 else 0.0
+
+        # Data quality from the rule engine: share of this tick's records that passed
+        checked = self.quality.rows_checked - self._quality_checked
+        rejected = self.quality.rows_rejected - self._quality_rejected
+        self._quality_checked = self.quality.rows_checked
+        self._quality_rejected = self.quality.rows_rejected
+        if checked:
+            tick_score = 100 * (1 - rejected / checked)
+            metrics["data_quality_score"] = (1 - QUALITY_SMOOTHING) * metrics["data_quality_score"] + QUALITY_SMOOTHING * tick_score
+        metrics["schema_violations"] = self.quality.schema_violations
+
+        metrics["data_drift_incidents"] = self.drift.incidents
+
+        # Fold this tick into every rollup level
+        self.timeseries.add(now, {
+            "throughput": metrics["records_per_second"],
+            "latency": metrics["overall_latency_ms"],
+            "error_rate": 100 * total_errors / max(1, total_records),
+            "quality_score": metrics["data_quality_score"]
+        })
+
+        # Alert rules see this tick's measurements; metrics with nothing measured are skipped
+        self._evaluate_alerts(now, {
+            "error_rate": 100 * new_errors / (new_records + new_errors) if new_records + new_errors else None,
+            "data_quality_score": metrics["data_quality_score"] if checked else None,
+            "overall_latency_ms": metrics["overall_latency_ms"],
+            "records_per_second": metrics["records_per_second"],
+            "failed_fetches": failed_fetches,
+        })
+
+        for name in PERSISTED_METRICS:
+            self._persist("metrics", {"recorded_at": now, "metric": name, "value": float(metrics[name])})
+
+        self.last_update = now
+        self.tick_count += 1
+
+    def _submit(self, batch, source_id, result):
+        """Run a batch through the stages now, or queue it for the workers once the lock is released"""
+        # When the batch was fetched, which for a batch replayed from the ingest log is
+        # when it was appended; freshness is measured against it
+        batch["fetched_at"] = np.datetime64(result.fetched_at, "ms")
+        if self.stage_executor.offloads(batch):
+            self._deferred.append((batch, source_id, result))
+        else:
+            self.stage_executor.submit(batch, source_id, result)
+
+    def _evaluate_alerts(self, now, measurements):
+        for rule, transition, value in self.alerting.observe(now.timestamp(), measurements):
+            if transition == "firing":
+                self._raise_alert(now, rule.source, rule.describe(value), rule.severity)
+            else:
+                self._log_event(now, rule.source, f"Resolved: {rule.name} ({value:.2f})", "success")
+
+    def _persist(self, table_name, row):
+        if self.persistence is not None:
+            self.persistence.submit(table_name, row)
+
+    def _detect_anomalies(self, now, observations):
+        if not observations:
+            return
+        rows = np.fromiter((self._source_rows[source_id] for source_id in observations), dtype=np.int64,
+                           count=len(observations))
+        batches, records_in, records_out, rejected, fetch_ms, processing_ms = \
+            np.array(list(observations.values()), dtype=np.float64).T
+        values = np.column_stack([
+            records_out,
+            100 * rejected / np.maximum(records_in, 1),
+            fetch_ms / batches,
+            processing_ms / batches,
+        ])
+        found = self.anomalies.observe(values, now.hour, rows)
+        source_ids = list(self.data_sources)
+        labels = list(ANOMALY_METRICS.values())
+        for row, metric, value, expected, score in sorted(zip(*found), key=lambda anomaly: -anomaly[4])[:MAX_ANOMALY_ALERTS]:
+            self._raise_alert(
+                now, self.data_sources[source_ids[row]]["name"],
+                f"Anomalous {labels[metric]}: {value:,.1f}, expected about {expected:,.1f} (score {score:.1f})",
+                "high" if score >= 2 * self.anomalies.threshold else "medium",
+            )
+
+    def _check_drift(self, now, source_id, batch):
+        for incident in self.drift.observe(batch, source_id):
+            scores = f"PSI {incident['psi']:.2f}"
+            if incident["ks"] is not None:
+                scores += f", KS {incident['ks']:.2f}"
+            self._raise_alert(now, self.data_sources[source_id]["name"],
+                              f"Data drift in {incident['column']} ({scores})", "medium")
+
+    def _raise_alert(self, now, source, message, severity):
+        self.alerts.append(now, source, message, severity, status="active")
+        self._persist("alerts", {
+            "created_at": now, "source": source, "message": message, "severity": severity, "status": "active"
+        })
+
+    def _log_event(self, now, component, message, event_type="info"):
+        self.events.append(now, component, message, event_type)
+        self._persist("events", {"created_at": now, "component": component, "message": message, "type": event_type})
+
+    # ------------------------------------------------------------------
+    # External inputs
+    # ------------------------------------------------------------------
+    def add_event(self, component, message, event_type="info"):
+        """Record an event raised outside the tick loop (e.g. a demo run)"""
+        with self._lock:
+            self._log_event(datetime.now(), component, message, event_type)
+            self.state_version += 1
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+    def query_log(self, log="alerts", **filters):
+        """Page through the alert or event log; see ``EventLog.query`` for filters"""
+        with self._lock:
+            event_log = self.alerts if log == "alerts" else self.events
+            entries, total = event_log.query(**filters)
+            return entries, total, event_log.sources()
+
+    def _latency_percentiles(self):
+        # Windowed percentiles only change when a tick records new latencies
+        if self._latency_rows_tick != self.tick_count:
+            self._latency_rows = self.latency.percentiles_snapshot(self.last_update.timestamp())
+            self._latency_rows_tick = self.tick_count
+        return self._latency_rows
+
+    # ------------------------------------------------------------------
+    # Checkpoints
+    # ------------------------------------------------------------------
+    def committed_offsets(self):
+        """Per (topic, partition), the first offset whose batch has not finished every stage.
+
+        A batch still running in a worker holds its partition's offset back,
+        so a checkpoint never counts a batch whose results it does not hold.
+        """
+        if self.ingest is None:
+            return {}
+        committed = {}
+        for key, position in self.ingest.positions.items():
+            in_flight = self._in_flight_offsets.get(key)
+            committed[key] = min(in_flight) if in_flight else position
+        return committed
+
+    def save_entities(self):
+        """Write the entity index to ``entity_dir`` if it learnt entities since the last save.
+
+        Only merging happens under the engine lock; the arrays are written
+        after it is released. Returns the new generation's path, or None.
+        """
+        if self.entity_dir is None:
+            return None
+        with self._entity_save_lock:
+            with self._lock:
+                index = self.entities.index
+                version = index.version
+                if version == self._entities_saved_version:
+                    return None
+                arrays = index.freeze()
+            try:
+                path = write_generation(self.entity_dir, arrays)
+            except OSError as exc:
+                self.entity_save_error = str(exc)
+                return None
+            self._entities_saved_version = version
+            self.entity_saves += 1
+            self.entity_save_error = None
+            return path
+
+    def _checkpoint_state(self):
+        # Runs on the checkpoint thread; only copying happens under the lock
+        with self._lock:
+            return {
+                "created_at": time.time(),
+                "tick_count": self.tick_count,
+                "offsets": self.committed_offsets(),
+                "data_sources": copy.deepcopy(self.data_sources),
+                "pipeline_metrics": dict(self.pipeline_metrics),
+                "quality": self.quality.checkpoint_state(),
+                "stages": self.stage_runtime.checkpoint_state(),
+                "alerting": copy.deepcopy(self.alerting.checkpoint_state()),
+                "drift": copy.deepcopy(self.drift.checkpoint_state()),
+                "anomalies": (list(self._source_rows), copy.deepcopy(self.anomalies.checkpoint_state())),
+                "timeseries": copy.deepcopy(self.timeseries),
+                "latency": copy.deepcopy(self.latency),
+            }
+
+    def recover(self):
+        """Resume from the newest readable checkpoint; returns what was restored, or None"""
+        started = time.perf_counter()
+        path, state = self.checkpoint.load()
+        loaded = time.perf_counter()
+        if state is None:
+            return None
+        with self._lock:
+            self._restore(state)
+            self.state_version += 1
+        self.recovery = {
+            "path": path,
+            "bytes": os.path.getsize(path),
+            "checkpoint_age_s": time.time() - state["created_at"],
+            "load_ms": (loaded - started) * 1000,
+            "apply_ms": (time.perf_counter() - loaded) * 1000,
+            "offsets_restored": len(state["offsets"]),
+            "messages_behind": sum(
+                max(0, partition.end_offset - state["offsets"].get((topic, partition.partition), 0))
+                for topic in (self.ingest.topics if self.ingest is not None else ())
+                for partition in self.ingest_log.topic(topic)
+            ),
+        }
+        return self.recovery
+
+    def _restore(self, state):
+        # Offsets for partitions this engine still reads
+        if self.ingest is not None:
+            for key, offset in state["offsets"].items():
+                if key in self.ingest.positions:
+                    self.ingest.positions[key] = offset
+        for source_id, saved in state["data_sources"].items():
+            source = self.data_sources.get(source_id)
+            if source is None:
+                continue
+            for field in ("records_processed", "records_rejected", "failures", "last_update", "latency_ms"):
+                source[field] = saved[field]
+        for name, value in state["pipeline_metrics"].items():
+            if name in self.pipeline_metrics and name != "active_sources":
+                self.pipeline_metrics[name] = value
+        self.quality.restore_state(state["quality"])
+        self._quality_checked = self.quality.rows_checked
+        self._quality_rejected = self.quality.rows_rejected
+        self.stage_runtime.restore_state(state["stages"])
+        self.alerting.restore_state(state["alerting"])
+        if "drift" in state:
+            self.drift.restore_state(state["drift"])
+        # Baselines are indexed by source position, so they only carry over to the same sources
+        if "anomalies" in state and state["anomalies"][0] == list(self._source_rows):
+            self.anomalies.restore_state(state["anomalies"][1])
+        # Window state is only reusable if its shape has not been reconfigured
+        timeseries = state["timeseries"]
+        if (isinstance(timeseries, RollupStore) and timeseries.columns == self.timeseries.columns
+                and timeseries.levels == self.timeseries.levels):
+            self.timeseries = timeseries
+        latency = state["latency"]
+        if latency.windows == self.latency.windows and latency.slot_seconds == self.latency.slot_seconds:
+            self.latency = latency
+            self._latency_rows_tick = None
+        self.tick_count = state["tick_count"]
+        self.sources_version += 1
+
+    def _ingest_stats(self):
+        if self.ingest is None:
+            return None
+        lag = self.ingest.lag()
+        partitions = self.ingest_log.stats()
+        for row in partitions:
+            key = (row["topic"], row["partition"])
+            row["position"] = self.ingest.positions.get(key)
+            row["lag"] = lag.get(key)
+        return {
+            "directory": self.ingest_log.directory,
+            "partitions": partitions,
+            "messages_consumed": self.ingest.messages_consumed,
+            "messages_skipped": self.ingest.messages_skipped,
+            "append_ms": 1000 * self.ingest_log.append_time,
+            "log_errors": self.connectors.log_errors,
+        }
+
+    def publish(self):
+        """Rebuild the shared snapshot from the live state and return it"""
+        with self._publish_lock:
+            with self._lock:
+                state = self._capture()
+            return self._publish(state)
+
+    def _capture(self):
+        # Runs under the lock, so it only takes what is cheap to take: counters,
+        # one-level copies of the engine's own dicts (their values are scalars),
+        # and the rows and frames the components build fresh for each call
+        end = self.timeseries.latest()
+        return {
+            "start_time": self.start_time,
+            "last_update": self.last_update,
+            "tick_count": self.tick_count,
+            "data_sources": {source_id: dict(source) for source_id, source in self.data_sources.items()},
+            "processing_steps": list(self.processing_steps),
+            "stage_stats": self.stage_runtime.stats_snapshot(),
+            "executor": self.stage_executor.stats(),
+            "resources": self.resources.components_snapshot(),
+            "resource_stats": self.resources.stats(),
+            "latency_percentiles": self._latency_percentiles(),
+            "quality_rules": self.quality.rules_snapshot(),
+            "drift_columns": self.drift.columns_snapshot(),
+            "drift_stats": self.drift.stats(),
+            "anomaly_stats": self.anomalies.stats(),
+            "entity_stats": dict(self.entities.stats(), saves=self.entity_saves, save_error=self.entity_save_error),
+            "geo_stats": self.geo.stats(),
+            "calendar_stats": self.calendar.stats(),
+            "alert_rules": self.alerting.rules_snapshot(),
+            "persistence": self.persistence.stats() if self.persistence is not None else None,
+            "exporter": self.metrics_server.stats() if self.metrics_server is not None else None,
+            "ingest_log": self._ingest_stats(),
+            "checkpoint": self.checkpoint.stats() if self.checkpoint is not None else None,
+            "recovery": self.recovery,
+            "pipeline_metrics": dict(self.pipeline_metrics),
+            "alerts": self.alerts.recent(RECENT_LOG_ENTRIES),
+            "alert_counts": self.alerts.counts_by_level(),
+            "events": self.events.recent(RECENT_LOG_ENTRIES),
+            # Each time range is read from the coarsest rollup that fills the plot width
+            "timeseries": {
+                name: {width: self.timeseries.query(seconds, width, end) for width in CHART_WIDTHS}
+                for name, seconds in TIME_RANGES.items()
+            },
+            "versions": {
+                "snapshot": self.state_version,
+                "timeseries": self.timeseries.version,
+                "sources": self.sources_version,
+            },
+        }
+
+    def _publish(self, state):
+        # Copied once per state version no matter how many viewers read it, and
+        # outside the engine lock so a large copy never holds up a tick. The
+        # time range frames are already new arrays and are kept as they are.
+        timeseries = state.pop("timeseries")
+        state = copy.deepcopy(state)
+        state["timeseries"] = timeseries
+        # The sampler thread guards its ring buffer with its own lock, not the engine's
+        state["resource_history"] = self.resources.history_frame().copy()
+        state["versions"]["resources"] = state["resource_stats"]["version"]
+        # A single reference swap, so readers see either the old snapshot or the new one
+        self._published = MappingProxyType(state)
+        return self._published
+
+    def snapshot(self):
+        """Return the pipeline state for rendering as a shared, read-only mapping.
+
+        The first call after the state changed builds the copy; the engine
+        lock is held only while the live state is read, not while it is
+        copied. Every other call returns the published mapping without locking
+        or copying, so per-viewer cost does not grow with engine state.
+        Callers must not modify the nested lists, dicts or frames.
+        ``versions`` identifies the data each part of the state was built from.
+        """
+        published = self._published
+        if published is not None and published["versions"]["snapshot"] == self.state_version:
+            return published
+        # One viewer builds each version while the others wait for it
+        with self._publish_lock:
+            published = self._published
+            if published is not None and published["versions"]["snapshot"] == self.state_version:
+                return published
+            with self._lock:
+                state = self._capture()
+            return self._publish(state)
@@ -0,0 +1,479 @@
+"""Entity resolution: MinHash signatures and an LSH blocking index over known entities
+
+Every record of a source listed in ENTITY_KEYS is reduced to a key text
+(its name and the local part of its email address, normalised) and the key
+text to a MinHash signature over byte trigrams. Signatures are cut into
+BANDS bands; the entities that share a band with a record are its
+candidates, and only those are compared with it.
+
+An index directory holds generations of the index as ``.npy`` files, opened
+as read-only memory maps::
+
+    <root>/CURRENT                               name of the live generation
+    <root>/gen-000000000001/signatures.npy       (entities, NUM_HASHES) uint32
+    <root>/gen-000000000001/entity_ids.npy       (entities,) int64
+    <root>/gen-000000000001/band_keys.npy        (entities * BANDS,) uint64, sorted
+    <root>/gen-000000000001/band_rows.npy        (entities * BANDS,) uint32
+"""
+import os
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+# Columns that identify the person behind a record, per source
+ENTITY_KEYS = {
+    "retail_transactions": ("customer_name", "email"),
+    "social_media": ("user_handle", "email"),
+}
+
+NUM_HASHES = 32
+BANDS = 8
+# Estimated Jaccard similarity of key trigrams at which a record joins an entity;
+# with 8 bands of 4 hashes, pairs at 0.6 share a band 2 times in 3, at 0.8 99 times in 100
+MATCH_THRESHOLD = 0.6
+# Candidates compared per band; oversized buckets (very common keys) are cut to their oldest entities
+MAX_BUCKET = 16
+# Key texts are truncated to this many UTF-8 bytes before hashing
+KEY_BYTES = 64
+# Fewest delta entities merged into the base at a time
+MERGE_MIN = 65536
+# Below this many rows a dict finds a batch's distinct keys faster than pandas' factorize
+SMALL_BATCH = 1000
+
+_FIELDS = ("signatures", "entity_ids", "band_keys", "band_rows")
+_EMAIL_DOMAIN = re.compile(r"(@| at ).*$")
+_NON_WORD = re.compile(r"[\W_]+")
+
+# Fixed seed: every process must derive the same signatures for the same key
+_rng = np.random.default_rng(0x5EED)
+_MULTIPLIERS = _rng.integers(1, 2 ** 63, NUM_HASHES, dtype=np.uint64) | np.uint64(1)
+_OFFSETS = _rng.integers(0, 2 ** 63, NUM_HASHES, dtype=np.uint64)
+_BAND_SALT = np.arange(BANDS, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+_FNV_PRIME = np.uint64(0x100000001B3)
+_EMPTY_HASH = np.uint64(0xFFFFFFFF)
+
+
+def key_text(values, columns):
+    """Normalised key text of one record's key values; email columns keep only the local part"""
+    parts = []
+    for column, value in zip(columns, values):
+        if not isinstance(value, str):
+            continue
+        value = value.lower()
+        if column == "email":
+            value = _EMAIL_DOMAIN.sub("", value)
+        value = _NON_WORD.sub(" ", value).strip()
+        if value:
+            parts.append(value)
+    return " ".join(parts)
+
+
+def distinct_keys(batch, columns):
+    """(codes, texts): each record's position among the batch's distinct keys, and those keys' texts"""
+    if len(batch) < SMALL_BATCH:
+        distinct = {}
+        codes = np.fromiter((distinct.setdefault(values, len(distinct))
+                             for values in zip(*(batch[column].to_numpy(dtype=object) for column in columns))),
+                            dtype=np.int64, count=len(batch))
+        return codes, np.array([key_text(values, columns) for values in distinct], dtype=object)
+    codes = np.zeros(len(batch), dtype=np.int64)
+    for column in columns:
+        column_codes, uniques = pd.factorize(batch[column])
+        codes = pd.factorize(codes * (len(uniques) + 1) + column_codes + 1)[0]
+    first = np.unique(codes, return_index=True)[1]
+    values = zip(*(batch[column].to_numpy(dtype=object)[first] for column in columns))
+    return codes, np.array([key_text(row, columns) for row in values], dtype=object)
+
+
+def entity_ids(texts):
+    """Ids for new entities, hashed from their key texts so every process assigns the same one"""
+    return (pd.util.hash_array(np.asarray(texts, dtype=object)) >> np.uint64(1)).astype(np.int64)
+
+
+def minhash(texts, chunk=1024):
+    """(len(texts), NUM_HASHES) uint32 MinHash signatures over each text's byte trigrams"""
+    encoded = np.array([f" {text} ".encode("utf-8") for text in texts], dtype=f"S{KEY_BYTES}")
+    signatures = np.empty((len(encoded), NUM_HASHES), dtype=np.uint32)
+    for start in range(0, len(encoded), chunk):
+        part = encoded[start:start + chunk]
+        lengths = np.char.str_len(part)
+        width = max(int(lengths.max()), 3)
+        raw = part.view(np.uint8).reshape(len(part), KEY_BYTES)[:, :width].astype(np.uint64)
+        grams = raw[:, :-2] << np.uint64(16) | raw[:, 1:-1] << np.uint64(8) | raw[:, 2:]
+        # Multiply-shift hashing, one multiplier per signature position
+        hashed = (grams[:, :, None] * _MULTIPLIERS + _OFFSETS) >> np.uint64(32)
+        valid = np.arange(width - 2) < (lengths - 2)[:, None]
+        signatures[start:start + chunk] = np.where(valid[:, :, None], hashed, _EMPTY_HASH).min(axis=1)
+    return signatures
+
+
+def band_keys(signatures):
+    """(len(signatures), BANDS) uint64 keys, one per band of NUM_HASHES // BANDS hashes"""
+    rows = signatures.reshape(len(signatures), BANDS, -1).astype(np.uint64)
+    keys = np.zeros(rows.shape[:2], dtype=np.uint64)
+    for column in range(rows.shape[2]):
+        keys = (keys ^ rows[:, :, column]) * _FNV_PRIME
+    # Salted per band so equal hashes in different bands do not share a bucket
+    return keys ^ _BAND_SALT
+
+
+class EntityIndex:
+    """Known entities and the LSH postings that block candidates for matching.
+
+    Entities live in two parts. The base is four flat arrays (signatures,
+    entity ids, and band postings sorted by band key) that may be memory-
+    mapped from an index directory, so every process that opens the same
+    directory shares one copy through the page cache. Looking a batch up in
+    the base is a ``searchsorted`` per band key, however many entities there
+    are. Entities added since are held in a delta: growable arrays plus a
+    dict from band key to rows. The delta is merged into the base once it
+    holds an eighth of the base, and at least ``merge_min`` entities.
+
+    Rows number entities in the order they were added and never change.
+    """
+
+    def __init__(self, signatures=None, entity_ids=None, band_keys=None, band_rows=None, merge_min=MERGE_MIN,
+                 path=None):
+        self.signatures = np.empty((0, NUM_HASHES), dtype=np.uint32) if signatures is None else signatures
+        self.entity_ids = np.empty(0, dtype=np.int64) if entity_ids is None else entity_ids
+        self.band_keys = np.empty(0, dtype=np.uint64) if band_keys is None else band_keys
+        self.band_rows = np.empty(0, dtype=np.uint32) if band_rows is None else band_rows
+        self.merge_min = merge_min
+        # Generation directory the base is mapped from; None once the base lives in memory
+        self.path = path
+        self.merges = 0
+        # Bumped by every add, so a caller can tell whether there is anything new to save
+        self.version = 0
+        self._delta_signatures = np.empty((0, NUM_HASHES), dtype=np.uint32)
+        self._delta_ids = np.empty(0, dtype=np.int64)
+        self._delta_count = 0
+        self._delta_postings = {}
+        self._saved = path is not None
+
+    @classmethod
+    def open(cls, directory, merge_min=MERGE_MIN):
+        """Map the current generation under ``directory`` read-only; an empty index if there is none"""
+        try:
+            with open(os.path.join(directory, "CURRENT")) as f:
+                path = os.path.join(directory, f.read().strip())
+        except FileNotFoundError:
+            return cls(merge_min=merge_min)
+        arrays = {field: np.load(os.path.join(path, field + ".npy"), mmap_mode="r") for field in _FIELDS}
+        return cls(**arrays, merge_min=merge_min, path=path)
+
+    def __len__(self):
+        return len(self.signatures) + self._delta_count
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, field).nbytes for field in _FIELDS) + self._delta_signatures.nbytes
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+    def match(self, signatures, threshold=MATCH_THRESHOLD, max_bucket=MAX_BUCKET):
+        """Best candidate per signature: (rows, similarities, candidates compared).
+
+        Rows are -1 where no candidate reaches ``threshold``; similarities
+        are the share of equal MinHash values, an estimate of the Jaccard
+        similarity of the key trigrams.
+        """
+        count = len(signatures)
+        rows = np.full(count, -1, dtype=np.int64)
+        similarity = np.zeros(count)
+        if not count or not len(self):
+            return rows, similarity, 0
+        keys = band_keys(signatures).ravel()
+        queries = np.repeat(np.arange(count), BANDS)
+
+        # Base postings: the run of equal keys is [lo, hi), cut to max_bucket
+        lo = np.searchsorted(self.band_keys, keys, "left")
+        hi = np.searchsorted(self.band_keys, keys, "right")
+        sizes = np.minimum(hi - lo, max_bucket)
+        total = int(sizes.sum())
+        positions = np.repeat(lo, sizes) + np.arange(total) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+        candidate_rows = [self.band_rows[positions].astype(np.int64)]
+        candidate_queries = [np.repeat(queries, sizes)]
+
+        if self._delta_postings:
+            delta_rows, delta_queries = [], []
+            for position, key in enumerate(keys.tolist()):
+                bucket = self._delta_postings.get(key)
+                if bucket:
+                    delta_rows.extend(bucket[:max_bucket])
+                    delta_queries.extend([position // BANDS] * min(len(bucket), max_bucket))
+            candidate_rows.append(np.array(delta_rows, dtype=np.int64))
+            candidate_queries.append(np.array(delta_queries, dtype=np.int64))
+
+        # A candidate sharing several bands with a record is compared once
+        pairs = np.unique(np.concatenate(candidate_queries) * len(self) + np.concatenate(candidate_rows))
+        if not len(pairs):
+            return rows, similarity, 0
+        pair_queries, pair_rows = np.divmod(pairs, len(self))
+        scores = (self._signatures_of(pair_rows) == signatures[pair_queries]).mean(axis=1)
+
+        # Highest score per record
+        order = np.lexsort((-scores, pair_queries))
+        matched, first = np.unique(pair_queries[order], return_index=True)
+        best = order[first]
+        similarity[matched] = scores[best]
+        rows[matched] = np.where(scores[best] >= threshold, pair_rows[best], -1)
+        return rows, similarity, len(pairs)
+
+    def _signatures_of(self, rows):
+        base = len(self.signatures)
+        if not self._delta_count:
+            return self.signatures[rows]
+        in_base = rows < base
+        out = np.empty((len(rows), NUM_HASHES), dtype=np.uint32)
+        out[in_base] = self.signatures[rows[in_base]]
+        out[~in_base] = self._delta_signatures[rows[~in_base] - base]
+        return out
+
+    def ids_of(self, rows):
+        """Entity ids of the given rows"""
+        base = len(self.entity_ids)
+        if not self._delta_count:
+            return self.entity_ids[rows]
+        in_base = rows < base
+        out = np.empty(len(rows), dtype=np.int64)
+        out[in_base] = self.entity_ids[rows[in_base]]
+        out[~in_base] = self._delta_ids[rows[~in_base] - base]
+        return out
+
+    # ------------------------------------------------------------------
+    # Updates
+    # ------------------------------------------------------------------
+    def add(self, signatures, ids):
+        """Append entities; returns their rows"""
+        count = len(signatures)
+        start = len(self)
+        needed = self._delta_count + count
+        if needed > len(self._delta_ids):
+            capacity = max(needed, 2 * len(self._delta_ids), 1024)
+            self._delta_signatures = np.resize(self._delta_signatures, (capacity, NUM_HASHES))
+            self._delta_ids = np.resize(self._delta_ids, capacity)
+        self._delta_signatures[self._delta_count:needed] = signatures
+        self._delta_ids[self._delta_count:needed] = ids
+        self._delta_count = needed
+        rows = np.arange(start, start + count)
+        self._saved = False
+        self.version += 1
+        if self._delta_count >= max(self.merge_min, len(self.signatures) // 8):
+            self.merge()
+            return rows
+        for row, keys in zip(rows.tolist(), band_keys(signatures).tolist()):
+            for key in keys:
+                self._delta_postings.setdefault(key, []).append(row)
+        return rows
+
+    def merge(self):
+        """Fold the delta into the base postings; the base is in memory afterwards"""
+        if not self._delta_count:
+            return
+        signatures = self._delta_signatures[:self._delta_count]
+        keys = band_keys(signatures).ravel()
+        rows = np.repeat(np.arange(len(self.signatures), len(self), dtype=np.uint32), BANDS)
+        order = np.argsort(keys, kind="stable")
+        keys, rows = keys[order], rows[order]
+        # "right" keeps older entities first within a bucket
+        at = np.searchsorted(self.band_keys, keys, "right")
+        self.band_keys = np.insert(self.band_keys, at, keys)
+        self.band_rows = np.insert(self.band_rows, at, rows)
+        self.signatures = np.concatenate([self.signatures, signatures])
+        self.entity_ids = np.concatenate([self.entity_ids, self._delta_ids[:self._delta_count]])
+        self._delta_signatures = np.empty((0, NUM_HASHES), dtype=np.uint32)
+        self._delta_ids = np.empty(0, dtype=np.int64)
+        self._delta_count = 0
+        self._delta_postings = {}
+        self.path = None
+        self.merges += 1
+
+    def save(self, directory, keep=2):
+        """Write the index as a new generation under ``directory`` and make it current.
+
+        Returns the generation's path. Older generations beyond ``keep`` are
+        removed; processes that still map one keep reading it until they
+        reopen the directory.
+        """
+        if self._saved and self.path is not None and os.path.dirname(self.path) == os.path.abspath(directory):
+            return self.path
+        path = write_generation(directory, self.freeze(), keep)
+        self._saved = True
+        return path
+
+    def freeze(self):
+        """Merge the delta into the base and return the base arrays by field.
+
+        Updates replace the base arrays instead of changing them, so the
+        returned arrays can be written with ``write_generation`` after the
+        lock guarding the index is released.
+        """
+        self.merge()
+        return {field: getattr(self, field) for field in _FIELDS}
+
+    @staticmethod
+    def _generations(directory):
+        return sorted(name for name in os.listdir(directory) if name.startswith("gen-") and not name.endswith(".tmp"))
+
+
+def write_generation(directory, arrays, keep=2):
+    """Write arrays from ``EntityIndex.freeze`` as a new generation under ``directory``; returns its path.
+
+    The new generation becomes current and generations beyond ``keep`` are
+    removed.
+    """
+    directory = os.path.abspath(directory)
+    os.makedirs(directory, exist_ok=True)
+    generations = EntityIndex._generations(directory)
+    name = f"gen-{int(generations[-1][4:]) + 1 if generations else 1:012d}"
+    path = os.path.join(directory, name)
+    temporary = path + ".tmp"
+    os.makedirs(temporary, exist_ok=True)
+    for field in _FIELDS:
+        np.save(os.path.join(temporary, field + ".npy"), arrays[field])
+    os.replace(temporary, path)
+    current = os.path.join(directory, "CURRENT.tmp")
+    with open(current, "w") as f:
+        f.write(name)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(current, os.path.join(directory, "CURRENT"))
+    for stale in generations[:max(0, len(generations) + 1 - keep)]:
+        stale_path = os.path.join(directory, stale)
+        for field in _FIELDS:
+            os.remove(os.path.join(stale_path, field + ".npy"))
+        os.rmdir(stale_path)
+    return path
+
+
+class EntityResolver:
+    """Entity resolution stage: tags each record with the entity it belongs to.
+
+    Adds ``entity_id`` (-1 where a record's key columns are empty) and
+    ``entity_score``, the estimated similarity to the matched entity. Keys
+    are resolved once per distinct value in a batch. A key that matches no
+    entity starts a new one when ``learn`` is set; near-duplicate new keys
+    in the same batch join the first of them. Sources without key columns
+    pass through untouched.
+
+    With ``collect`` set, the entities it learns are also kept for
+    ``take_learned``, so a stage worker can hand them to the parent
+    process, which ``absorb``s them into the index it saves.
+    """
+
+    def __init__(self, index=None, keys=None, threshold=MATCH_THRESHOLD, learn=True, collect=False):
+        self.index = index if index is not None else EntityIndex()
+        self.keys = dict(ENTITY_KEYS if keys is None else keys)
+        self.threshold = threshold
+        self.learn = learn
+        self.collect = collect
+        self._learned = []
+        self.records = 0
+        self.lookups = 0
+        self.matched = 0
+        self.created = 0
+        self.compared = 0
+        self.elapsed = 0.0
+
+    def __call__(self, batch, source_id):
+        columns = self.keys.get(source_id)
+        if columns is None or not len(batch):
+            return batch, 0
+        started = time.perf_counter()
+        codes, texts = distinct_keys(batch, columns)
+        rows = np.full(len(texts), -1, dtype=np.int64)
+        scores = np.zeros(len(texts))
+        usable = np.flatnonzero(texts != "")
+        if len(usable):
+            signatures = minhash(texts[usable])
+            found, similarity, compared = self.index.match(signatures, self.threshold)
+            new = found < 0
+            if self.learn and new.any():
+                found[new], similarity[new] = self._learn(signatures[new], texts[usable][new])
+                self.created += int(new.sum())
+            rows[usable], scores[usable] = found, similarity
+            self.lookups += len(usable)
+            self.matched += int(np.count_nonzero(~new))
+            self.compared += compared
+
+        ids = np.full(len(rows), -1, dtype=np.int64)
+        resolved = rows >= 0
+        ids[resolved] = self.index.ids_of(rows[resolved])
+        batch["entity_id"] = ids[codes]
+        batch["entity_score"] = scores[codes].astype(np.float32)
+        self.records += len(batch)
+        self.elapsed += time.perf_counter() - started
+        return batch, 0
+
+    def _learn(self, signatures, texts):
+        """Add unmatched keys as entities; returns their rows and similarities"""
+        # Keys that collide in a band with an earlier new key and clear the threshold join it
+        leaders = {}
+        owner = np.arange(len(signatures))
+        for position, keys in enumerate(band_keys(signatures).tolist()):
+            for key in keys:
+                leader = leaders.get(key)
+                if leader is not None and (signatures[position] == signatures[leader]).mean() >= self.threshold:
+                    owner[position] = leader
+                    break
+            else:
+                for key in keys:
+                    leaders.setdefault(key, position)
+        first = owner == np.arange(len(owner))
+        rows = np.empty(len(owner), dtype=np.int64)
+        ids = entity_ids(texts[first])
+        rows[first] = self.index.add(signatures[first], ids)
+        if self.collect:
+            self._learned.append((signatures[first], ids))
+        rows = rows[owner]
+        similarity = (signatures == signatures[owner]).mean(axis=1)
+        return rows, similarity
+
+    def take_stats(self):
+        """Return the counters accumulated since the last call and reset them"""
+        names = ("records", "lookups", "matched", "created", "compared", "elapsed")
+        taken = {name: getattr(self, name) for name in names}
+        for name in names:
+            setattr(self, name, 0)
+        return taken
+
+    def add_stats(self, taken):
+        """Merge counters returned by ``take_stats`` on another resolver, e.g. in a stage worker"""
+        for name, value in taken.items():
+            setattr(self, name, getattr(self, name) + value)
+
+    def take_learned(self):
+        """(signatures, ids) of the entities learnt since the last call, or None if there are none"""
+        if not self._learned:
+            return None
+        learned, self._learned = self._learned, []
+        return np.concatenate([signatures for signatures, _ in learned]), np.concatenate([ids for _, ids in learned])
+
+    def absorb(self, signatures, ids):
+        """Add entities learnt by another resolver unless they match a known one; returns those added.
+
+        An entity that matches keeps the id it already has here, so every
+        process that absorbs the same entities converges on the same ids.
+        """
+        found = self.index.match(signatures, self.threshold)[0]
+        new = found < 0
+        if new.any():
+            self.index.add(signatures[new], ids[new])
+        return signatures[new], ids[new]
+
+    def stats(self):
+        return {
+            "entities": len(self.index),
+            "mapped": self.index.path is not None,
+            "index_bytes": self.index.nbytes,
+            "merges": self.index.merges,
+            "records": self.records,
+            "keys_resolved": self.lookups,
+            "keys_matched": self.matched,
+            "entities_created": self.created,
+            "candidates_per_key": self.compared / self.lookups if self.lookups else 0.0,
+            "us_per_record": 1e6 * self.elapsed / self.records if self.records else 0.0,
+        }
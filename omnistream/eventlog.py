@@ -0,0 +1,204 @@
+"""Bounded alert and event log with coalescing and indexes by level, source and time"""
+from bisect import bisect_left
+from datetime import timedelta
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class _SeqIndex:
+    """Ascending keys with O(1) append and amortised O(1) removal of the oldest key.
+
+    Keys live in a plain list so ranges can be found by bisection; removed
+    keys are skipped by a head offset and compacted away once they make up
+    half of the list.
+    """
+
+    def __init__(self):
+        self._keys = []
+        self._head = 0
+
+    def __len__(self):
+        return len(self._keys) - self._head
+
+    def append(self, key):
+        self._keys.append(key)
+
+    def oldest(self):
+        return self._keys[self._head] if len(self) else None
+
+    def latest(self):
+        return self._keys[-1] if len(self) else None
+
+    def key_at(self, position):
+        return self._keys[position]
+
+    def discard_oldest(self, key):
+        if len(self) and self._keys[self._head] == key:
+            self._head += 1
+            if self._head >= 64 and 2 * self._head >= len(self._keys):
+                del self._keys[:self._head]
+                self._head = 0
+
+    def bounds(self, low=None, high=None):
+        """Positions of the keys in ``[low, high)``; ``None`` leaves a side open"""
+        start = self._head if low is None else bisect_left(self._keys, low, self._head)
+        stop = len(self._keys) if high is None else bisect_left(self._keys, high, self._head)
+        return start, max(start, stop)
+
+    def page(self, start, stop, offset, limit):
+        """Keys in ``[start, stop)`` newest first, skipping ``offset`` and returning at most ``limit``"""
+        stop -= offset
+        return self._keys[max(start, stop - limit):max(start, stop)][::-1]
+
+
+class EventLog:
+    """Keeps the last ``capacity`` alerts or events with O(1) append.
+
+    Repeats of the same (source, message, level) within ``coalesce_window``
+    of the first occurrence are folded into one entry with a ``count`` and
+    ``last_seen``, so a failure that recurs every tick takes one slot per
+    window instead of flooding the log. Entries are indexed by level,
+    source and time; ``query`` returns pages newest first in
+    O(log n + page size).
+
+    ``source_field`` and ``level_field`` name the entry keys that hold the
+    source and the level (e.g. ``component``/``type`` for events).
+    """
+
+    def __init__(self, capacity=5000, coalesce_window=timedelta(minutes=5), source_field="source",
+                 level_field="severity"):
+        self.capacity = capacity
+        self.coalesce_window = coalesce_window
+        self.source_field = source_field
+        self.level_field = level_field
+        self._entries = {}  # seq -> entry
+        self._order = _SeqIndex()  # (first_seen, seq)
+        self._by_level = {}
+        self._by_source = {}
+        self._open = {}  # (source, message, level) -> seq of the group still accepting repeats
+        self._next_seq = 0
+        self.version = 0
+        self.appended = 0
+        self.coalesced = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def append(self, now, source, message, level, **fields):
+        """Record an occurrence; returns the (possibly coalesced) entry"""
+        self.appended += 1
+        self.version += 1
+        key = (source, message, level)
+        seq = self._open.get(key)
+        entry = self._entries.get(seq) if seq is not None else None
+        if entry is not None and now - entry["first_seen"] < self.coalesce_window:
+            entry["count"] += 1
+            entry["last_seen"] = now
+            entry.update(fields)
+            self.coalesced += 1
+            return entry
+
+        # Keep the time index sorted even if a caller's clock steps backwards
+        latest = self._order.latest()
+        first_seen = max(now, latest[0]) if latest else now
+        seq = self._next_seq
+        self._next_seq += 1
+        entry = {
+            "seq": seq,
+            "timestamp": now.strftime(TIMESTAMP_FORMAT),
+            "first_seen": first_seen,
+            "last_seen": now,
+            self.source_field: source,
+            "message": message,
+            self.level_field: level,
+            "count": 1,
+            **fields,
+        }
+        self._entries[seq] = entry
+        self._order.append((first_seen, seq))
+        self._by_level.setdefault(level, _SeqIndex()).append(seq)
+        self._by_source.setdefault(source, _SeqIndex()).append(seq)
+        self._open[key] = seq
+
+        while len(self._entries) > self.capacity:
+            self._evict_oldest()
+        return entry
+
+    def _evict_oldest(self):
+        oldest = self._order.oldest()
+        self._order.discard_oldest(oldest)
+        seq = oldest[1]
+        entry = self._entries.pop(seq)
+        level, source = entry[self.level_field], entry[self.source_field]
+        self._by_level[level].discard_oldest(seq)
+        self._by_source[source].discard_oldest(seq)
+        if not len(self._by_level[level]):
+            del self._by_level[level]
+        if not len(self._by_source[source]):
+            del self._by_source[source]
+        key = (source, entry["message"], level)
+        if self._open.get(key) == seq:
+            del self._open[key]
+        self.evicted += 1
+
+    def query(self, level=None, source=None, since=None, until=None, page=0, page_size=20):
+        """Return (entries, total) for one page of matches, newest first.
+
+        ``since``/``until`` bound the first occurrence of each entry. At most
+        one of ``level`` and ``source`` is answered from its index; the other
+        is applied as a filter on the narrower index.
+        """
+        # Time bounds translate to a range of sequence numbers on the main index
+        start, stop = self._order.bounds(
+            None if since is None else (since, -1),
+            None if until is None else (until, -1),
+        )
+        if start >= stop:
+            return [], 0
+        low_seq, high_seq = self._order.key_at(start)[1], self._order.key_at(stop - 1)[1] + 1
+
+        indexes = []
+        if level is not None:
+            indexes.append(self._by_level.get(level))
+        if source is not None:
+            indexes.append(self._by_source.get(source))
+        if any(index is None for index in indexes):
+            return [], 0
+        if not indexes:
+            keys = self._order.page(start, stop, page * page_size, page_size)
+            return [dict(self._entries[seq]) for _, seq in keys], stop - start
+
+        index = min(indexes, key=len)
+        start, stop = index.bounds(low_seq, high_seq)
+        if len(indexes) == 1:
+            seqs = index.page(start, stop, page * page_size, page_size)
+            return [dict(self._entries[seq]) for seq in seqs], stop - start
+
+        # Both filters: walk the narrower index newest first
+        matches = [
+            seq for seq in index.page(start, stop, 0, stop - start)
+            if self._entries[seq][self.level_field] == level and self._entries[seq][self.source_field] == source
+        ]
+        offset = page * page_size
+        return [dict(self._entries[seq]) for seq in matches[offset:offset + page_size]], len(matches)
+
+    def recent(self, limit=5):
+        """The newest entries, newest first"""
+        return self.query(page_size=limit)[0]
+
+    def counts_by_level(self):
+        return {level: len(index) for level, index in self._by_level.items()}
+
+    def sources(self):
+        return sorted(self._by_source)
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "capacity": self.capacity,
+            "appended": self.appended,
+            "coalesced": self.coalesced,
+            "evicted": self.evicted,
+            "by_level": self.counts_by_level(),
+        }
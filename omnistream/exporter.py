@@ -0,0 +1,253 @@
+"""Prometheus text exposition of pipeline metrics, served from a background HTTP thread"""
+import math
+import threading
+from bisect import bisect_left
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Stage latencies are milliseconds to seconds; Prometheus convention is seconds
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+class _ThreadShards:
+    """One dict per writing thread, so increments never contend on a lock.
+
+    Only the owning thread writes to its shard; a scrape copies every shard
+    (``dict.copy`` is atomic under the GIL) and merges the copies. Shards of
+    threads that exit are kept, so counters stay monotonic.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        self._register_lock = threading.Lock()
+
+    def local(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._register_lock:
+                self._shards.append(shard)
+            return shard
+
+    def copies(self):
+        with self._register_lock:
+            shards = list(self._shards)
+        return [shard.copy() for shard in shards]
+
+
+class _Metric:
+    """Name, help text and label names, with label strings rendered once per series"""
+
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._label_text = {}
+
+    def _labels(self, values, extra=""):
+        text = self._label_text.get(values)
+        if text is None:
+            text = self._label_text[values] = ",".join(
+                f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, values)
+            )
+        if extra:
+            text = f"{text},{extra}" if text else extra
+        return f"{{{text}}}" if text else ""
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Monotonic counter sharded per thread; ``inc`` takes label values positionally"""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._shards = _ThreadShards()
+
+    def inc(self, *labelvalues, amount=1):
+        shard = self._shards.local()
+        shard[labelvalues] = shard.get(labelvalues, 0) + amount
+
+    def totals(self):
+        merged = {}
+        for shard in self._shards.copies():
+            for key, value in shard.items():
+                merged[key] = merged.get(key, 0) + value
+        return merged
+
+    def collect(self):
+        lines = self.header()
+        for key, value in sorted(self.totals().items()):
+            lines.append(f"{self.name}{self._labels(key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    """Fixed-bucket histogram sharded per thread; buckets are made cumulative on scrape"""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._le = [f'le="{_format_value(bound)}"' for bound in self.buckets]
+        self._shards = _ThreadShards()
+
+    def observe(self, value, *labelvalues):
+        shard = self._shards.local()
+        row = shard.get(labelvalues)
+        if row is None:
+            # One count per bucket, then the sum of observations
+            row = shard[labelvalues] = [0] * len(self.buckets) + [0.0]
+        row[bisect_left(self.buckets, value)] += 1
+        row[-1] += value
+
+    def collect(self):
+        merged = {}
+        for shard in self._shards.copies():
+            for key, row in shard.items():
+                row = list(row)
+                total = merged.get(key)
+                merged[key] = row if total is None else [a + b for a, b in zip(total, row)]
+        lines = self.header()
+        for key, row in sorted(merged.items()):
+            cumulative = 0
+            for le, count in zip(self._le, row):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{self._labels(key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(key)} {_format_value(row[-1])}")
+            lines.append(f"{self.name}_count{self._labels(key)} {cumulative}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Gauge read at scrape time from ``collect_values()``, an iterable of (labelvalues, value)"""
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), collect_values=None):
+        super().__init__(name, documentation, labelnames)
+        self.collect_values = collect_values
+
+    def collect(self):
+        lines = self.header()
+        for key, value in self.collect_values() if self.collect_values else ():
+            lines.append(f"{self.name}{self._labels(tuple(key))} {_format_value(value)}")
+        return lines
+
+
+class MetricsRegistry:
+    """Ordered set of metrics rendered together in the text exposition format"""
+
+    def __init__(self):
+        self._metrics = {}
+        self.scrapes = 0
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"metric {metric.name!r} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, labelnames=(), collect_values=None):
+        return self.register(Gauge(name, documentation, labelnames, collect_values))
+
+    def render(self):
+        self.scrapes += 1
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """Serves ``registry.render()`` at ``/metrics`` from a daemon thread.
+
+    A port that cannot be bound (e.g. already served by another engine in
+    the same host) is recorded in ``error`` rather than raised, so the
+    pipeline keeps running without an exporter.
+    """
+
+    def __init__(self, registry, port=9108, host="0.0.0.0"):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.error = None
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        if self._server is not None:
+            return self
+        # Only engines that serve metrics pay for importing the HTTP server
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        except OSError as exc:
+            self.error = str(exc)
+            return self
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="omnistream-metrics", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join(timeout)
+        self._server = None
+        self._thread = None
+
+    def stats(self):
+        return {
+            "serving": self._server is not None,
+            "address": f"http://{self.host}:{self.port}/metrics",
+            "scrapes": self.registry.scrapes,
+            "error": self.error,
+        }
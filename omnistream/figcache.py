@@ -0,0 +1,88 @@
+"""Versioned cache for dashboard figures with per-figure instrumentation"""
+import time
+from collections import OrderedDict
+
+
+class FigureStats:
+    """Hit/miss counters and timings for one cached figure"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.build_time = 0.0
+        self.last_build_ms = 0.0
+        self.render_time = 0.0
+        self.renders = 0
+        self.last_render_ms = 0.0
+
+
+class FigureCache:
+    """LRU cache of built figures keyed by name and the version of their inputs.
+
+    ``get(name, version, build)`` returns the cached object while its input
+    version is unchanged and calls ``build()`` otherwise. Only the latest
+    version of each figure is kept; once ``max_entries`` figures are
+    cached the least recently used one is evicted.
+    """
+
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # name -> (version, figure)
+        self.stats = {}
+        self.evictions = 0
+
+    def _stats(self, name):
+        if name not in self.stats:
+            self.stats[name] = FigureStats()
+        return self.stats[name]
+
+    def get(self, name, version, build):
+        stats = self._stats(name)
+        entry = self._entries.get(name)
+        if entry is not None and entry[0] == version:
+            self._entries.move_to_end(name)
+            stats.hits += 1
+            return entry[1]
+
+        started = time.perf_counter()
+        figure = build()
+        elapsed = time.perf_counter() - started
+        stats.misses += 1
+        stats.build_time += elapsed
+        stats.last_build_ms = elapsed * 1000
+
+        self._entries[name] = (version, figure)
+        self._entries.move_to_end(name)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return figure
+
+    def record_render(self, name, elapsed):
+        """Time spent handing a figure to the frontend"""
+        stats = self._stats(name)
+        stats.renders += 1
+        stats.render_time += elapsed
+        stats.last_render_ms = elapsed * 1000
+
+    def invalidate(self, name=None):
+        if name is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(name, None)
+
+    def stats_snapshot(self):
+        rows = []
+        for name, stats in self.stats.items():
+            lookups = stats.hits + stats.misses
+            rows.append({
+                "figure": name,
+                "hits": stats.hits,
+                "misses": stats.misses,
+                "hit_rate": 100 * stats.hits / lookups if lookups else 0.0,
+                "avg_build_ms": 1000 * stats.build_time / stats.misses if stats.misses else 0.0,
+                "last_build_ms": stats.last_build_ms,
+                "avg_render_ms": 1000 * stats.render_time / stats.renders if stats.renders else 0.0,
+                "cached": name in self._entries,
+            })
+        return rows
@@ -0,0 +1,280 @@
+"""Geospatial enrichment: reverse geocoding against a geohash grid of known places
+
+Coordinates are bucketed into geohash cells. For every cell a point falls
+in, the index keeps the few places that can be the nearest one to any point
+of that cell (every place within the nearest place's distance from the cell
+centre plus the cell's diagonal), so a lookup computes distances to those
+candidates only, never to every place. Cells are filled on first use and
+kept, which makes repeated positions such as fixed sensors and stations
+cache hits.
+"""
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# Places bundled with the package: name, region (state), latitude, longitude
+PLACES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "places.csv")
+
+# Geohash length of the candidate cells (about 39 x 20 km) and of the geohash column added to records (about 150 m)
+CELL_PRECISION = 4
+GEOHASH_PRECISION = 7
+
+# Points farther than this from every place are left unresolved
+MAX_DISTANCE_KM = 250.0
+
+EARTH_RADIUS_KM = 6371.0088
+BASE32 = np.frombuffer(b"0123456789bcdefghjkmnpqrstuvwxyz", dtype=np.uint8)
+
+# Cells whose candidates are computed in one pass; bounds the (cells, places) distance matrix
+_FILL_CHUNK = 4096
+
+
+def _spread(values):
+    """Move the low 32 bits of each value to the even bit positions"""
+    values = values & np.uint64(0xFFFFFFFF)
+    for shift, mask in ((16, 0x0000FFFF0000FFFF), (8, 0x00FF00FF00FF00FF), (4, 0x0F0F0F0F0F0F0F0F),
+                        (2, 0x3333333333333333), (1, 0x5555555555555555)):
+        values = (values | values << np.uint64(shift)) & np.uint64(mask)
+    return values
+
+
+def _compact(values):
+    """Inverse of ``_spread``: gather the even bit positions into the low 32 bits"""
+    values = values & np.uint64(0x5555555555555555)
+    for shift, mask in ((1, 0x3333333333333333), (2, 0x0F0F0F0F0F0F0F0F), (4, 0x00FF00FF00FF00FF),
+                        (8, 0x0000FFFF0000FFFF), (16, 0x00000000FFFFFFFF)):
+        values = (values | values >> np.uint64(shift)) & np.uint64(mask)
+    return values
+
+
+def _bits(precision):
+    total = 5 * precision
+    return (total + 1) // 2, total // 2
+
+
+def geohash(latitude, longitude, precision):
+    """Geohashes of the points as integers (5 bits per character); coordinates must be finite"""
+    lon_bits, lat_bits = _bits(precision)
+    lon = np.clip(((np.asarray(longitude) + 180.0) / 360.0 * (1 << lon_bits)).astype(np.int64), 0, (1 << lon_bits) - 1)
+    lat = np.clip(((np.asarray(latitude) + 90.0) / 180.0 * (1 << lat_bits)).astype(np.int64), 0, (1 << lat_bits) - 1)
+    lon, lat = _spread(lon.astype(np.uint64)), _spread(lat.astype(np.uint64))
+    # Geohash bits alternate longitude, latitude from the most significant end
+    if lon_bits == lat_bits:
+        return lon << np.uint64(1) | lat
+    return lat << np.uint64(1) | lon
+
+
+def cell_bounds(cells, precision):
+    """(south, west, height, width) in degrees of each geohash cell"""
+    lon_bits, lat_bits = _bits(precision)
+    if lon_bits == lat_bits:
+        lon, lat = _compact(cells >> np.uint64(1)), _compact(cells)
+    else:
+        lon, lat = _compact(cells), _compact(cells >> np.uint64(1))
+    height, width = 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+    return lat * height - 90.0, lon * width - 180.0, height, width
+
+
+def geohash_strings(cells, precision):
+    """Base32 text of integer geohashes"""
+    shifts = np.arange(precision - 1, -1, -1, dtype=np.uint64) * np.uint64(5)
+    digits = ((np.asarray(cells, dtype=np.uint64)[:, None] >> shifts) & np.uint64(31)).astype(np.intp)
+    return np.ascontiguousarray(BASE32[digits]).view(f"S{precision}").ravel().astype(str)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance between points given in radians"""
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class PlaceIndex:
+    """Nearest-place lookups over a geohash grid of candidate lists.
+
+    ``_cells`` holds the geohashes of the cells filled so far, sorted, and
+    row ``i`` of ``_candidates`` the place rows that can be nearest within
+    ``_cells[i]``, padded with -1. A batch is looked up with one
+    ``searchsorted``; cells it misses are filled together, then every point
+    is compared with its cell's candidates. There are at most 32 ** 4 cells
+    at the default precision, so the table needs no eviction.
+    """
+
+    def __init__(self, places, cell_precision=CELL_PRECISION, max_distance_km=MAX_DISTANCE_KM):
+        self.names = places["name"].to_numpy(dtype=object)
+        self.regions = places["region"].to_numpy(dtype=object)
+        self.latitude = np.radians(places["latitude"].to_numpy(dtype=np.float64))
+        self.longitude = np.radians(places["longitude"].to_numpy(dtype=np.float64))
+        self._cos_latitude = np.cos(self.latitude)
+        self.cell_precision = cell_precision
+        self.max_distance_km = max_distance_km
+        self._cells = np.empty(0, dtype=np.uint64)
+        self._candidates = np.empty((0, 1), dtype=np.int32)
+        self.points = 0
+        self.cell_misses = 0
+
+    @classmethod
+    def load(cls, path=PLACES_PATH, **kwargs):
+        """Index the places in a CSV file with name, region, latitude and longitude columns"""
+        return cls(pd.read_csv(path), **kwargs)
+
+    def __len__(self):
+        return len(self.names)
+
+    def lookup(self, latitude, longitude):
+        """Nearest place to each point: (rows, distances in km).
+
+        Rows are -1 where the nearest place is farther than
+        ``max_distance_km`` or a coordinate is missing or out of range.
+        """
+        latitude = np.asarray(latitude, dtype=np.float64)
+        longitude = np.asarray(longitude, dtype=np.float64)
+        valid = (np.abs(latitude) <= 90) & (np.abs(longitude) <= 180)
+        latitude, longitude = np.where(valid, latitude, 0.0), np.where(valid, longitude, 0.0)
+        cells = geohash(latitude, longitude, self.cell_precision)
+
+        position = np.searchsorted(self._cells, cells)
+        known = self._cells[np.minimum(position, len(self._cells) - 1)] == cells if len(self._cells) else \
+            np.zeros(len(cells), dtype=bool)
+        if not known.all():
+            missing = np.unique(cells[~known])
+            self.cell_misses += len(missing)
+            self._fill(missing)
+            position = np.searchsorted(self._cells, cells)
+        self.points += len(cells)
+
+        # The haversine term grows with distance, so candidates are ranked on it
+        # and only each point's nearest goes through arcsin and sqrt
+        candidates = self._candidates[position]
+        latitude, longitude = np.radians(latitude)[:, None], np.radians(longitude)[:, None]
+        terms = (np.square(np.sin((self.latitude[candidates] - latitude) / 2))
+                 + np.cos(latitude) * self._cos_latitude[candidates]
+                 * np.square(np.sin((self.longitude[candidates] - longitude) / 2)))
+        terms[candidates < 0] = np.inf
+        best = np.argmin(terms, axis=1)
+        points = np.arange(len(cells))
+        rows = candidates[points, best].astype(np.int64)
+        term = terms[points, best]
+        with np.errstate(invalid="ignore"):
+            distance = np.where(np.isinf(term), np.inf, 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(term, 1.0))))
+        rows[~valid | (distance > self.max_distance_km)] = -1
+        return rows, distance
+
+    def _fill(self, cells):
+        """Compute the candidate lists of new cells and merge them into the table"""
+        lists = []
+        for start in range(0, len(cells), _FILL_CHUNK):
+            part = cells[start:start + _FILL_CHUNK]
+            south, west, height, width = cell_bounds(part, self.cell_precision)
+            center_lat, center_lon = np.radians(south + height / 2), np.radians(west + width / 2)
+            # The corners on the equator side are the farthest from the centre
+            corner_lat = np.radians(np.where(south >= 0, south, south + height))
+            radius = haversine_km(center_lat, center_lon, corner_lat, center_lon + np.radians(width / 2))
+            distances = haversine_km(center_lat[:, None], center_lon[:, None], self.latitude, self.longitude)
+            nearest = distances.min(axis=1)
+            # No point of the cell is nearer to a place outside this bound than to the nearest one
+            keep = distances <= np.minimum(nearest + 2 * radius, self.max_distance_km + radius)[:, None]
+            order = np.argsort(np.where(keep, distances, np.inf), axis=1)[:, :max(int(keep.sum(axis=1).max()), 1)]
+            lists.append(np.where(np.take_along_axis(keep, order, axis=1), order, -1).astype(np.int32))
+
+        width = max([self._candidates.shape[1]] + [part.shape[1] for part in lists])
+        new = np.concatenate([np.pad(part, ((0, 0), (0, width - part.shape[1])), constant_values=-1)
+                              for part in lists])
+        table = np.pad(self._candidates, ((0, 0), (0, width - self._candidates.shape[1])), constant_values=-1)
+        at = np.searchsorted(self._cells, cells)
+        self._cells = np.insert(self._cells, at, cells)
+        self._candidates = np.insert(table, at, new, axis=0)
+
+    def stats(self):
+        return {
+            "places": len(self),
+            "cells": len(self._cells),
+            "max_candidates": self._candidates.shape[1] if len(self._cells) else 0,
+            "points": self.points,
+            "cell_hit_rate": 1 - self.cell_misses / self.points if self.points else 0.0,
+        }
+
+
+class GeoEnricher:
+    """Geospatial enrichment stage: reverse-geocodes records with coordinates.
+
+    Adds ``geohash`` (GEOHASH_PRECISION characters), the nearest ``place``
+    and its ``region``, and ``place_distance_km``; place and region are
+    None where no place is within ``max_distance_km``. Batches without
+    ``latitude`` and ``longitude`` columns pass through untouched.
+    """
+
+    def __init__(self, index=None, geohash_precision=GEOHASH_PRECISION):
+        self.index = index if index is not None else PlaceIndex.load()
+        self.geohash_precision = geohash_precision
+        self.records = 0
+        self.resolved = 0
+        self.elapsed = 0.0
+        # Largest cell table reported by ``add_stats``
+        self.remote_cells = 0
+        self.remote_max_candidates = 0
+
+    def __call__(self, batch, source_id):
+        if "latitude" not in batch or "longitude" not in batch or not len(batch):
+            return batch, 0
+        started = time.perf_counter()
+        latitude = batch["latitude"].to_numpy(dtype=np.float64)
+        longitude = batch["longitude"].to_numpy(dtype=np.float64)
+        rows, distance = self.index.lookup(latitude, longitude)
+        found = rows >= 0
+        valid = np.isfinite(latitude) & np.isfinite(longitude)
+        geohashes = geohash_strings(geohash(np.where(valid, latitude, 0.0), np.where(valid, longitude, 0.0),
+                                            self.geohash_precision), self.geohash_precision)
+        enriched = pd.DataFrame({
+            "geohash": np.where(valid, geohashes, ""),
+            "place": np.where(found, self.index.names[rows], None),
+            "region": np.where(found, self.index.regions[rows], None),
+            "place_distance_km": np.where(found, distance, np.nan).astype(np.float32),
+        }, index=batch.index)
+        replaced = [name for name in enriched.columns if name in batch]
+        if replaced:
+            batch = batch.drop(columns=replaced)
+        # One concat instead of a column insert per attribute, which costs far more on small batches
+        batch = pd.concat([batch, enriched], axis=1)
+        self.records += len(batch)
+        self.resolved += int(np.count_nonzero(found))
+        self.elapsed += time.perf_counter() - started
+        return batch, 0
+
+    def take_stats(self):
+        """Return the counters accumulated since the last call, reset them, and the cell table's size"""
+        index = self.index
+        taken = {
+            "records": self.records,
+            "resolved": self.resolved,
+            "elapsed": self.elapsed,
+            "points": index.points,
+            "cell_misses": index.cell_misses,
+            "cells": len(index._cells),
+            "max_candidates": index._candidates.shape[1] if len(index._cells) else 0,
+        }
+        self.records = self.resolved = index.points = index.cell_misses = 0
+        self.elapsed = 0.0
+        return taken
+
+    def add_stats(self, taken):
+        """Merge counters returned by ``take_stats`` on another enricher, e.g. in a stage worker"""
+        self.records += taken["records"]
+        self.resolved += taken["resolved"]
+        self.elapsed += taken["elapsed"]
+        self.index.points += taken["points"]
+        self.index.cell_misses += taken["cell_misses"]
+        self.remote_cells = max(self.remote_cells, taken["cells"])
+        self.remote_max_candidates = max(self.remote_max_candidates, taken["max_candidates"])
+
+    def stats(self):
+        stats = self.index.stats()
+        return dict(
+            stats,
+            cells=max(stats["cells"], self.remote_cells),
+            max_candidates=max(stats["max_candidates"], self.remote_max_candidates),
+            records=self.records,
+            resolved=self.resolved,
+            us_per_record=1e6 * self.elapsed / self.records if self.records else 0.0,
+        )
@@ -0,0 +1,476 @@
+"""Local, Kafka-like partitioned log that buffers batches between connectors and stages
+
+Each topic (one per source) has one or more partitions. A partition is a
+directory of segment files named after the first offset they hold::
+
+    <root>/<topic>-<partition>/00000000000000000000.log
+    <root>/<topic>-<partition>/00000000000000000000.index
+
+A ``.log`` file is a sequence of framed messages, one record batch each::
+
+    offset int64 | timestamp float64 | payload length uint32 | crc32 uint32 | payload
+
+and its ``.index`` file is sparse: one (relative offset, file position) pair
+of uint32 every ``index_interval_bytes`` of log data. Seeking to an offset is
+a bisect over the segments, a bisect over that segment's index and a short
+forward scan, all through a read-only memory map.
+
+Appends go straight to the file with ``os.write``, so a message survives a
+crash of this process as soon as ``append`` returns; ``fsync=True`` also
+makes it survive a crash of the machine. On open, the newest segment is
+scanned from its last index entry and a torn or corrupt tail is truncated.
+"""
+import bisect
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+from omnistream.parallel import encode_batch, from_buffer, write_batch
+
+HEADER = struct.Struct("<qdII")
+INDEX_ENTRY = struct.Struct("<II")
+# Length prefix of the JSON metadata (column layout and headers) at the start of a payload
+META_LENGTH = struct.Struct("<I")
+
+DEFAULT_SEGMENT_BYTES = 16 * 1024 * 1024
+DEFAULT_INDEX_INTERVAL_BYTES = 4096
+# Per-partition limits the dashboard and the CLI apply unless told otherwise
+DEFAULT_RETENTION_BYTES = 256 * 1024 * 1024
+DEFAULT_RETENTION_SECONDS = 24 * 3600
+
+
+def encode_message(batch, headers=None):
+    """Serialize a batch and its headers into one message payload"""
+    size, encoded = encode_batch(batch)
+    data = bytearray(size)
+    layout = write_batch(memoryview(data), encoded, len(batch))
+    meta = json.dumps({"layout": layout, "headers": headers or {}}, separators=(",", ":")).encode("utf-8")
+    return META_LENGTH.pack(len(meta)) + meta + data
+
+
+def decode_message(payload):
+    """Inverse of ``encode_message``: (batch, headers). ``payload`` may be a view into a memory map"""
+    (meta_length,) = META_LENGTH.unpack_from(payload, 0)
+    start = META_LENGTH.size + meta_length
+    meta = json.loads(bytes(payload[META_LENGTH.size:start]))
+    return from_buffer(payload[start:], meta["layout"]), meta["headers"]
+
+
+class LogRecord:
+    """One message read back from a partition"""
+
+    __slots__ = ("topic", "partition", "offset", "timestamp", "payload")
+
+    def __init__(self, topic, partition, offset, timestamp, payload):
+        self.topic = topic
+        self.partition = partition
+        self.offset = offset
+        self.timestamp = timestamp
+        self.payload = payload
+
+    def decode(self):
+        return decode_message(self.payload)
+
+
+class Segment:
+    """One ``.log`` file and its sparse ``.index``"""
+
+    def __init__(self, directory, base_offset, index_interval_bytes):
+        self.base_offset = base_offset
+        self.index_interval_bytes = index_interval_bytes
+        stem = os.path.join(directory, f"{base_offset:020d}")
+        self.path = stem + ".log"
+        self.index_path = stem + ".index"
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        self._index_fd = os.open(self.index_path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        self.size = os.fstat(self._fd).st_size
+        self.created = os.stat(self.path).st_mtime
+        self.next_offset = base_offset
+        self.max_timestamp = 0.0
+        self._index_offsets = []
+        self._index_positions = []
+        self._bytes_since_index = 0
+        self._map = None
+
+    # ------------------------------------------------------------------
+    # Opening
+    # ------------------------------------------------------------------
+    def load_index(self):
+        with open(self.index_path, "rb") as f:
+            raw = f.read()
+        usable = len(raw) - len(raw) % INDEX_ENTRY.size
+        for relative, position in INDEX_ENTRY.iter_unpack(raw[:usable]):
+            # Entries past the end of the log belong to a tail that was lost
+            if position >= self.size:
+                break
+            self._index_offsets.append(self.base_offset + relative)
+            self._index_positions.append(position)
+        if usable != len(raw) or len(self._index_offsets) != usable // INDEX_ENTRY.size:
+            self._rewrite_index()
+
+    def recover(self):
+        """Scan from the last index entry, truncating the log at the first torn or corrupt message"""
+        position = self._index_positions[-1] if self._index_positions else 0
+        offset = self._index_offsets[-1] if self._index_offsets else self.base_offset
+        view = self._view()
+        last_indexed = position
+        while position + HEADER.size <= self.size:
+            stored_offset, timestamp, length, crc = HEADER.unpack_from(view, position)
+            end = position + HEADER.size + length
+            if stored_offset != offset or end > self.size or zlib.crc32(view[position + HEADER.size:end]) != crc:
+                break
+            self.max_timestamp = max(self.max_timestamp, timestamp)
+            offset += 1
+            position = end
+        if position < self.size:
+            del view
+            self._map = None
+            os.ftruncate(self._fd, position)
+            self.size = position
+        self.next_offset = offset
+        self._bytes_since_index = position - last_indexed
+        if self.size and self.max_timestamp == 0.0:
+            self.max_timestamp = os.stat(self.path).st_mtime
+
+    def _rewrite_index(self):
+        os.ftruncate(self._index_fd, 0)
+        os.write(self._index_fd, b"".join(
+            INDEX_ENTRY.pack(offset - self.base_offset, position)
+            for offset, position in zip(self._index_offsets, self._index_positions)
+        ))
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+    def append(self, payload, timestamp, fsync=False):
+        offset = self.next_offset
+        if not self._index_positions or self._bytes_since_index >= self.index_interval_bytes:
+            self._index_offsets.append(offset)
+            self._index_positions.append(self.size)
+            os.write(self._index_fd, INDEX_ENTRY.pack(offset - self.base_offset, self.size))
+            self._bytes_since_index = 0
+        message = HEADER.pack(offset, timestamp, len(payload), zlib.crc32(payload)) + payload
+        os.write(self._fd, message)
+        if fsync:
+            os.fsync(self._fd)
+        self.size += len(message)
+        self._bytes_since_index += len(message)
+        self.next_offset += 1
+        self.max_timestamp = max(self.max_timestamp, timestamp)
+        return offset
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+    def _view(self):
+        # The active segment grows; map it again once appends pass the mapped length.
+        # A replaced map is left to the garbage collector, since records handed to
+        # readers may still point into it.
+        if self._map is None or len(self._map) < self.size:
+            self._map = mmap.mmap(self._fd, self.size, access=mmap.ACCESS_READ) if self.size else b""
+        return memoryview(self._map)
+
+    def read(self, offset, max_messages, max_bytes):
+        """Messages from ``offset`` on as (offset, timestamp, payload view) tuples"""
+        if offset >= self.next_offset or max_messages <= 0:
+            return []
+        slot = bisect.bisect_right(self._index_offsets, offset) - 1
+        position = self._index_positions[slot] if slot >= 0 else 0
+        current = self._index_offsets[slot] if slot >= 0 else self.base_offset
+        view = self._view()
+        messages = []
+        read_bytes = 0
+        while position + HEADER.size <= self.size and len(messages) < max_messages:
+            _, timestamp, length, _ = HEADER.unpack_from(view, position)
+            start = position + HEADER.size
+            position = start + length
+            if current >= offset:
+                if messages and read_bytes + length > max_bytes:
+                    break
+                messages.append((current, timestamp, view[start:position]))
+                read_bytes += length
+            current += 1
+        return messages
+
+    def close(self):
+        self._map = None
+        os.close(self._fd)
+        os.close(self._index_fd)
+
+    def delete(self):
+        self.close()
+        for path in (self.path, self.index_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+class Partition:
+    """Ordered, append-only sequence of segments for one topic partition"""
+
+    def __init__(self, directory, topic, partition, segment_bytes, segment_seconds, index_interval_bytes, fsync):
+        self.directory = directory
+        self.topic = topic
+        self.partition = partition
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.index_interval_bytes = index_interval_bytes
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self.messages_appended = 0
+        self.bytes_appended = 0
+        self.segments_deleted = 0
+        self.bytes_truncated = 0
+
+        os.makedirs(directory, exist_ok=True)
+        base_offsets = sorted(int(name[:-4]) for name in os.listdir(directory)
+                              if name.endswith(".log") and name[:-4].isdigit())
+        self.segments = []
+        for base_offset in base_offsets:
+            segment = Segment(directory, base_offset, index_interval_bytes)
+            segment.load_index()
+            self.segments.append(segment)
+        if self.segments:
+            # Only the newest segment can have a torn tail; older ones end where the next begins
+            for segment, following in zip(self.segments, self.segments[1:]):
+                segment.next_offset = following.base_offset
+                segment.max_timestamp = os.stat(segment.path).st_mtime
+            newest = self.segments[-1]
+            size_before = newest.size
+            newest.recover()
+            self.bytes_truncated = size_before - newest.size
+        else:
+            self.segments.append(Segment(directory, 0, index_interval_bytes))
+        self._base_offsets = [segment.base_offset for segment in self.segments]
+
+    @property
+    def start_offset(self):
+        return self.segments[0].base_offset
+
+    @property
+    def end_offset(self):
+        """Offset the next appended message will get"""
+        return self.segments[-1].next_offset
+
+    @property
+    def size(self):
+        return sum(segment.size for segment in self.segments)
+
+    def append(self, payload, timestamp):
+        with self._lock:
+            active = self.segments[-1]
+            if active.size and (active.size + HEADER.size + len(payload) > self.segment_bytes
+                                or (self.segment_seconds and timestamp - active.created >= self.segment_seconds)):
+                active = self._roll()
+            offset = active.append(payload, timestamp, self.fsync)
+            self.messages_appended += 1
+            self.bytes_appended += len(payload)
+            return offset
+
+    def _roll(self):
+        segment = Segment(self.directory, self.end_offset, self.index_interval_bytes)
+        self.segments.append(segment)
+        self._base_offsets.append(segment.base_offset)
+        return segment
+
+    def read(self, offset, max_messages=100, max_bytes=16 * 1024 * 1024):
+        """Up to ``max_messages`` LogRecords starting at ``offset``; an offset before the log start reads from the start"""
+        with self._lock:
+            offset = max(offset, self.start_offset)
+            slot = max(0, bisect.bisect_right(self._base_offsets, offset) - 1)
+            records = []
+            read_bytes = 0
+            for segment in self.segments[slot:]:
+                remaining = max_messages - len(records)
+                if remaining <= 0 or read_bytes >= max_bytes:
+                    break
+                for message_offset, timestamp, payload in segment.read(offset, remaining, max_bytes - read_bytes):
+                    records.append(LogRecord(self.topic, self.partition, message_offset, timestamp, payload))
+                    read_bytes += len(payload)
+                    offset = message_offset + 1
+            return records
+
+    def enforce_retention(self, retention_bytes=None, retention_seconds=None, now=None):
+        """Delete the oldest closed segments past the size or age limit; returns how many went"""
+        now = now if now is not None else time.time()
+        deleted = 0
+        with self._lock:
+            while len(self.segments) > 1:
+                oldest = self.segments[0]
+                too_big = retention_bytes is not None and self.size > retention_bytes
+                too_old = retention_seconds is not None and now - oldest.max_timestamp > retention_seconds
+                if not (too_big or too_old):
+                    break
+                oldest.delete()
+                self.segments.pop(0)
+                self._base_offsets.pop(0)
+                deleted += 1
+            self.segments_deleted += deleted
+        return deleted
+
+    def close(self):
+        with self._lock:
+            for segment in self.segments:
+                segment.close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "topic": self.topic,
+                "partition": self.partition,
+                "start_offset": self.start_offset,
+                "end_offset": self.end_offset,
+                "segments": len(self.segments),
+                "bytes": self.size,
+                "messages_appended": self.messages_appended,
+                "bytes_appended": self.bytes_appended,
+                "segments_deleted": self.segments_deleted,
+                "bytes_truncated": self.bytes_truncated,
+            }
+
+
+class IngestLog:
+    """Partitioned segment log under one directory, with no broker.
+
+    ``append`` is thread-safe and picks a partition by hashing ``key``, or
+    round-robin without one. Partitions roll to a new segment after
+    ``segment_bytes`` or ``segment_seconds``, and ``enforce_retention``
+    drops whole closed segments once a partition exceeds
+    ``retention_bytes`` or its oldest segment is older than
+    ``retention_seconds``.
+    """
+
+    def __init__(self, directory, partitions=1, segment_bytes=DEFAULT_SEGMENT_BYTES, segment_seconds=None,
+                 index_interval_bytes=DEFAULT_INDEX_INTERVAL_BYTES, retention_bytes=None,
+                 retention_seconds=None, fsync=False):
+        self.directory = directory
+        self.partitions = partitions
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.index_interval_bytes = index_interval_bytes
+        self.retention_bytes = retention_bytes
+        self.retention_seconds = retention_seconds
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._topics = {}
+        self._round_robin = {}
+        self.append_time = 0.0
+        self.closed = False
+        os.makedirs(directory, exist_ok=True)
+
+    def topic(self, name):
+        """Partitions of topic ``name``, opening (and recovering) them on first use"""
+        with self._lock:
+            partitions = self._topics.get(name)
+            if partitions is None:
+                partitions = [
+                    Partition(os.path.join(self.directory, f"{name}-{i}"), name, i, self.segment_bytes,
+                              self.segment_seconds, self.index_interval_bytes, self.fsync)
+                    for i in range(self.partitions)
+                ]
+                self._topics[name] = partitions
+                self._round_robin[name] = 0
+            return partitions
+
+    def _partition_for(self, topic, key):
+        partitions = self.topic(topic)
+        if key is not None:
+            return partitions[zlib.crc32(str(key).encode("utf-8")) % len(partitions)]
+        with self._lock:
+            index = self._round_robin[topic]
+            self._round_robin[topic] = (index + 1) % len(partitions)
+        return partitions[index]
+
+    def append(self, topic, batch, timestamp=None, headers=None, key=None):
+        """Append one batch; returns (partition, offset)"""
+        started = time.perf_counter()
+        partition = self._partition_for(topic, key)
+        offset = partition.append(encode_message(batch, headers), timestamp if timestamp is not None else time.time())
+        self.append_time += time.perf_counter() - started
+        return partition.partition, offset
+
+    def read(self, topic, partition, offset, max_messages=100, max_bytes=16 * 1024 * 1024):
+        return self.topic(topic)[partition].read(offset, max_messages, max_bytes)
+
+    def enforce_retention(self, now=None):
+        if self.retention_bytes is None and self.retention_seconds is None:
+            return 0
+        with self._lock:
+            partitions = [partition for topic in self._topics.values() for partition in topic]
+        return sum(partition.enforce_retention(self.retention_bytes, self.retention_seconds, now)
+                   for partition in partitions)
+
+    def close(self):
+        """Close every segment file; offsets and stats stay readable"""
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+            partitions = [partition for topic in self._topics.values() for partition in topic]
+        for partition in partitions:
+            partition.close()
+
+    def stats(self):
+        with self._lock:
+            partitions = [partition for topic in self._topics.values() for partition in topic]
+        return [partition.stats() for partition in partitions]
+
+
+class LogConsumer:
+    """Reads every partition of a set of topics, tracking one position per partition.
+
+    Positions start at each partition's log start (``auto.offset.reset:
+    earliest``) unless ``positions`` says otherwise, and only advance as
+    ``poll`` hands records out. A position that retention has overtaken
+    skips ahead to the log start and the skipped messages are counted.
+    """
+
+    def __init__(self, log, topics, positions=None):
+        self.log = log
+        self.topics = list(topics)
+        self.positions = dict(positions or {})
+        self.messages_consumed = 0
+        self.messages_skipped = 0
+        self._next_topic = 0
+        for topic in self.topics:
+            for partition in log.topic(topic):
+                self.positions.setdefault((topic, partition.partition), partition.start_offset)
+
+    def poll(self, max_messages=1000):
+        """Up to ``max_messages`` LogRecords, shared fairly across topics"""
+        records = []
+        if not self.topics:
+            return records
+        share = max(1, max_messages // len(self.topics))
+        for i in range(len(self.topics)):
+            topic = self.topics[(self._next_topic + i) % len(self.topics)]
+            for partition in self.log.topic(topic):
+                remaining = min(share, max_messages - len(records))
+                if remaining <= 0:
+                    break
+                key = (topic, partition.partition)
+                position = self.positions[key]
+                if position < partition.start_offset:
+                    self.messages_skipped += partition.start_offset - position
+                    position = partition.start_offset
+                batch = partition.read(position, remaining)
+                if batch:
+                    position = batch[-1].offset + 1
+                self.positions[key] = position
+                records.extend(batch)
+        self._next_topic = (self._next_topic + 1) % len(self.topics)
+        self.messages_consumed += len(records)
+        return records
+
+    def lag(self):
+        """Messages appended but not yet consumed, per (topic, partition)"""
+        return {
+            (topic, partition.partition): partition.end_offset - max(self.positions[(topic, partition.partition)],
+                                                                    partition.start_offset)
+            for topic in self.topics for partition in self.log.topic(topic)
+        }
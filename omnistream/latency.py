@@ -0,0 +1,197 @@
+"""Streaming latency histograms with sliding-window percentiles per source and stage"""
+import math
+
+import numpy as np
+
+PERCENTILES = (50.0, 90.0, 99.0, 99.9)
+
+# Sliding windows reported in snapshots, in seconds
+WINDOWS = {"1m": 60, "5m": 300, "15m": 900}
+
+# Pseudo-source under which histograms merged across all sources are reported
+ALL_SOURCES = "all"
+
+
+class HistogramLayout:
+    """Log-spaced buckets shared by every histogram that may be merged.
+
+    Bucket ``i >= 1`` covers ``[lowest * growth**(i-1), lowest * growth**i)``
+    and reports its geometric midpoint, so any recorded value is reproduced
+    within ``precision`` (relative). Bucket 0 holds values below ``lowest``
+    and the last bucket everything at or above ``highest``.
+    """
+
+    def __init__(self, lowest=0.01, highest=60_000.0, precision=0.02):
+        self.lowest = lowest
+        self.highest = highest
+        self.precision = precision
+        self.growth = (1 + precision) ** 2
+        self._log_growth = math.log(self.growth)
+        self.size = int(math.ceil(math.log(highest / lowest) / self._log_growth)) + 2
+        self.values = np.empty(self.size)
+        self.values[0] = lowest
+        self.values[1:] = lowest * self.growth ** (np.arange(1, self.size) - 0.5)
+
+    def index(self, value):
+        if value < self.lowest:
+            return 0
+        return min(self.size - 1, 1 + int(math.log(value / self.lowest) / self._log_growth))
+
+
+DEFAULT_LAYOUT = HistogramLayout()
+
+
+class LatencyHistogram:
+    """Fixed-memory latency histogram; histograms with the same layout merge by addition"""
+
+    def __init__(self, layout=DEFAULT_LAYOUT, counts=None, minimum=math.inf, maximum=0.0, total=0.0):
+        self.layout = layout
+        self.counts = counts if counts is not None else np.zeros(layout.size, dtype=np.int64)
+        self.min = minimum
+        self.max = maximum
+        self.sum = total
+
+    @property
+    def count(self):
+        return int(self.counts.sum())
+
+    def record(self, value):
+        self.counts[self.layout.index(value)] += 1
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self.sum += value
+
+    def merge(self, other):
+        if other.layout is not self.layout:
+            raise ValueError("histograms with different layouts cannot be merged")
+        self.counts += other.counts
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.sum += other.sum
+        return self
+
+    def percentiles(self, quantiles=PERCENTILES):
+        """Value at each percentile, clamped to the exact observed min/max"""
+        cumulative = np.cumsum(self.counts)
+        total = cumulative[-1] if len(cumulative) else 0
+        if not total:
+            return {q: 0.0 for q in quantiles}
+        ranks = np.maximum(1, np.ceil(np.asarray(quantiles) / 100 * total))
+        positions = np.searchsorted(cumulative, ranks)
+        values = np.clip(self.layout.values[positions], self.min, self.max)
+        return dict(zip(quantiles, values.tolist()))
+
+
+class WindowedHistogram:
+    """Ring of per-slot histograms covering the last ``slots * slot_seconds`` seconds.
+
+    Recording touches only the current slot, so it is O(1); a slot is
+    cleared when the ring wraps onto it. Windows are resolved to whole
+    slots, i.e. a window may include up to one slot more of history.
+    """
+
+    def __init__(self, slots, slot_seconds, layout=DEFAULT_LAYOUT):
+        self.slots = slots
+        self.slot_seconds = slot_seconds
+        self.layout = layout
+        self.counts = np.zeros((slots, layout.size), dtype=np.int32)
+        self.slot_ids = np.full(slots, -1, dtype=np.int64)
+        self.mins = np.full(slots, math.inf)
+        self.maxs = np.zeros(slots)
+        self.sums = np.zeros(slots)
+
+    def slot_id(self, now):
+        return int(now // self.slot_seconds)
+
+    def record(self, value, now):
+        slot_id = self.slot_id(now)
+        pos = slot_id % self.slots
+        if self.slot_ids[pos] != slot_id:
+            self.counts[pos] = 0
+            self.slot_ids[pos] = slot_id
+            self.mins[pos] = math.inf
+            self.maxs[pos] = 0.0
+            self.sums[pos] = 0.0
+        self.counts[pos, self.layout.index(value)] += 1
+        if value < self.mins[pos]:
+            self.mins[pos] = value
+        if value > self.maxs[pos]:
+            self.maxs[pos] = value
+        self.sums[pos] += value
+
+    def window(self, seconds, now):
+        """Merge the slots that fall inside the last ``seconds`` into one histogram"""
+        current = self.slot_id(now)
+        oldest = current - int(math.ceil(seconds / self.slot_seconds))
+        live = (self.slot_ids > oldest) & (self.slot_ids <= current)
+        if not live.any():
+            return LatencyHistogram(self.layout)
+        return LatencyHistogram(
+            self.layout,
+            counts=self.counts[live].sum(axis=0, dtype=np.int64),
+            minimum=float(self.mins[live].min()),
+            maximum=float(self.maxs[live].max()),
+            total=float(self.sums[live].sum()),
+        )
+
+
+class LatencyTracker:
+    """Windowed latency histograms keyed by (source, stage).
+
+    Memory is bounded by the number of keys: each holds a fixed ring of
+    slots sized for the longest window. Percentiles for a stage across all
+    sources are computed by merging histograms, never by averaging
+    percentiles.
+    """
+
+    def __init__(self, windows=None, slot_seconds=15, layout=DEFAULT_LAYOUT):
+        self.windows = dict(windows or WINDOWS)
+        self.slot_seconds = slot_seconds
+        self.slots = int(math.ceil(max(self.windows.values()) / slot_seconds)) + 1
+        self.layout = layout
+        self._histograms = {}
+
+    def record(self, source, stage, value, now):
+        """Record one latency in milliseconds at ``now`` (seconds since the epoch)"""
+        key = (source, stage)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = WindowedHistogram(self.slots, self.slot_seconds, self.layout)
+        histogram.record(value, now)
+
+    def histogram(self, window, now, source=None, stage=None):
+        """Merged histogram over ``window`` seconds; ``None`` matches every source or stage"""
+        merged = LatencyHistogram(self.layout)
+        for (key_source, key_stage), histogram in self._histograms.items():
+            if (source is None or key_source == source) and (stage is None or key_stage == stage):
+                merged.merge(histogram.window(window, now))
+        return merged
+
+    def percentiles_snapshot(self, now, quantiles=PERCENTILES):
+        """One row per window and (source, stage), plus each stage merged across sources"""
+        rows = []
+        stages = sorted({stage for _, stage in self._histograms})
+        for window_name, seconds in self.windows.items():
+            merged_by_stage = {stage: LatencyHistogram(self.layout) for stage in stages}
+            for (source, stage), windowed in self._histograms.items():
+                histogram = windowed.window(seconds, now)
+                merged_by_stage[stage].merge(histogram)
+                rows.append(self._row(window_name, source, stage, histogram, quantiles))
+            for stage, histogram in merged_by_stage.items():
+                rows.append(self._row(window_name, ALL_SOURCES, stage, histogram, quantiles))
+        return rows
+
+    @staticmethod
+    def _row(window_name, source, stage, histogram, quantiles):
+        count = histogram.count
+        row = {
+            "window": window_name,
+            "source": source,
+            "stage": stage,
+            "count": count,
+            "mean_ms": histogram.sum / count if count else 0.0,
+            "max_ms": histogram.max,
+        }
+        for q, value in histogram.percentiles(quantiles).items():
+            row[f"p{q:g}"] = value
+        return row
@@ -0,0 +1,25 @@
+"""Deferred imports for modules that only some code paths use"""
+import importlib.util
+import sys
+
+
+def lazy_import(name):
+    """Return module ``name`` without running it until an attribute is first read.
+
+    A module that is already imported is returned as is. Otherwise the
+    module object is registered in ``sys.modules`` straight away and its
+    code runs on first attribute access, so an import that no code path
+    reaches costs nothing but finding the module.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
@@ -0,0 +1,440 @@
+"""Stage execution in worker processes with batches handed over in shared memory"""
+import collections
+import os
+import queue
+import secrets
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+import pandas as pd
+
+from omnistream.entities import EntityIndex, EntityResolver
+from omnistream.geo import GeoEnricher
+from omnistream.quality import QualityEngine
+from omnistream.stages import StageRuntime
+from omnistream.temporal import CalendarEnricher
+
+# Column buffers inside a shared block start on this boundary
+_ALIGNMENT = 8
+# Separator between encoded strings; text values must not contain it
+_SEPARATOR = "\x00"
+# Text columns with at most this share of distinct values are dictionary-encoded
+_DICTIONARY_MAX_RATIO = 0.5
+
+
+def _aligned(offset):
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def _encode_column(series):
+    """Split a column into (kind, dtype, buffers, extra) ready to be laid out in shared memory"""
+    if isinstance(series.dtype, np.dtype) and series.dtype.kind in "biufcmM":
+        return "array", series.dtype.str, [np.ascontiguousarray(series.to_numpy())], None
+    # Low-cardinality text (symbols, ids, names) travels as integer codes; only
+    # the distinct values go into the pickled layout
+    codes, uniques = pd.factorize(series)
+    if len(uniques) <= max(_DICTIONARY_MAX_RATIO * len(series), 1):
+        return "dictionary", str(series.dtype), [codes.astype(np.int32)], list(uniques)
+    # Anything else travels as one UTF-8 blob plus a null mask
+    values = series.to_numpy(dtype=object)
+    nulls = pd.isna(values)
+    text = _SEPARATOR.join("" if null else str(value) for value, null in zip(values, nulls))
+    return "text", str(series.dtype), [np.frombuffer(text.encode("utf-8"), dtype=np.uint8), nulls], None
+
+
+def encode_batch(batch):
+    """Encode a batch's columns for ``write_batch``; returns (size in bytes, encoded columns)"""
+    encoded = []
+    size = 0
+    for name in batch.columns:
+        kind, dtype, buffers, extra = _encode_column(batch[name])
+        placed = []
+        for buffer in buffers:
+            size = _aligned(size)
+            placed.append((size, buffer))
+            size += buffer.nbytes
+        encoded.append((name, kind, dtype, placed, extra))
+    return size, encoded
+
+
+def write_batch(buf, encoded, rows):
+    """Copy encoded columns into ``buf`` (at least the encoded size); returns the layout"""
+    layout = {"rows": rows, "columns": []}
+    for name, kind, dtype, placed, extra in encoded:
+        spans = []
+        for offset, buffer in placed:
+            buf[offset:offset + buffer.nbytes] = buffer.view(np.uint8).reshape(-1)
+            spans.append((offset, buffer.nbytes))
+        layout["columns"].append((name, kind, dtype, spans, extra))
+    return layout
+
+
+def to_shared(batch):
+    """Copy a batch into a new shared memory block; returns (block, layout).
+
+    The layout is a small picklable description of where each column
+    lives. The caller owns the block and must ``unlink`` it once the
+    receiving side has read it. The index is not carried over.
+    """
+    size, encoded = encode_batch(batch)
+    block = shared_memory.SharedMemory(create=True, size=max(1, size))
+    return block, write_batch(block.buf, encoded, len(batch))
+
+
+def from_buffer(buf, layout):
+    """Rebuild a batch from any buffer laid out by ``write_batch``; the result owns its memory"""
+    rows = layout["rows"]
+    columns = {}
+    for name, kind, dtype, spans, extra in layout["columns"]:
+        if kind == "array":
+            offset, _ = spans[0]
+            columns[name] = np.frombuffer(buf, dtype=np.dtype(dtype), count=rows, offset=offset).copy()
+            continue
+        if kind == "dictionary":
+            offset, _ = spans[0]
+            codes = np.frombuffer(buf, dtype=np.int32, count=rows, offset=offset)
+            uniques = pd.array(np.array(extra, dtype=object), dtype=dtype)
+            columns[name] = uniques.take(codes, allow_fill=True)
+            continue
+        (text_offset, text_bytes), (null_offset, _) = spans
+        text = bytes(buf[text_offset:text_offset + text_bytes]).decode("utf-8")
+        values = np.array(text.split(_SEPARATOR) if rows else [], dtype=object)
+        nulls = np.frombuffer(buf, dtype=bool, count=rows, offset=null_offset)
+        values[nulls] = None
+        columns[name] = pd.array(values, dtype=dtype)
+    return pd.DataFrame(columns)
+
+
+def from_shared(block, layout):
+    """Rebuild a batch from a shared block; the result owns its memory"""
+    return from_buffer(block.buf, layout)
+
+
+# ----------------------------------------------------------------------
+# Worker process side: ``python -m omnistream.parallel ADDRESS AUTHKEY STEPS``
+# ----------------------------------------------------------------------
+def _attach(name):
+    block = shared_memory.SharedMemory(name=name)
+    # The parent owns every block; keep this process's tracker from unlinking it on exit
+    resource_tracker.unregister(block._name, "shared_memory")
+    return block
+
+
+def _run_shared(runtime, quality, entities, name, layout, source_id, return_output, known):
+    """Run the stages on a shared batch; the output, if wanted, goes back in a new shared block.
+
+    ``known`` holds entities the parent learnt from other workers since
+    this one last heard, and the reply carries the entities this batch
+    taught it.
+    """
+    if known is not None:
+        entities.absorb(*known)
+    block = _attach(name)
+    try:
+        batch = from_shared(block, layout)
+    finally:
+        block.close()
+    output, trace = runtime.run(batch, source_id)
+    out_name = out_layout = None
+    if return_output:
+        out_block, out_layout = to_shared(output)
+        resource_tracker.unregister(out_block._name, "shared_memory")
+        out_block.close()
+        out_name = out_block.name
+    stage_stats = {name: stage.take_stats() for name, stage in runtime.stages if hasattr(stage, "take_stats")}
+    return out_name, out_layout, trace, quality.take_stats(), stage_stats, entities.take_learned()
+
+
+def _worker_main(address, authkey, steps, entity_dir=None):
+    quality = QualityEngine()
+    # Every worker maps the same saved entity index and learns new entities on top of it;
+    # the parent merges what each learns and passes it on to the others
+    entities = EntityResolver(EntityIndex.open(entity_dir) if entity_dir else None, collect=True)
+    runtime = StageRuntime(steps, overrides={
+        "data_validation": quality.validate,
+        "geospatial_enrichment": GeoEnricher(),
+        "data_enrichment": CalendarEnricher(),
+        "entity_resolution": entities,
+    })
+    connection = Client(address, authkey=authkey)
+    while True:
+        try:
+            task = connection.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+        try:
+            reply = _run_shared(runtime, quality, entities, *task)
+        except Exception as exc:
+            reply = ("error", repr(exc))
+        connection.send(reply)
+    connection.close()
+
+
+class StageExecutor:
+    """Runs batches through a StageRuntime on the calling thread.
+
+    ``submit`` queues a batch with an opaque ``tag`` and ``completed``
+    returns ``(tag, output, trace)`` for every batch finished since the
+    last call. ProcessStageExecutor offers the same interface.
+    """
+
+    # Inline execution hands back the loaded batch at no extra cost
+    return_output = True
+
+    def __init__(self, runtime):
+        self.runtime = runtime
+        self._done = []
+
+    def start(self):
+        return self
+
+    def stop(self, timeout=None):
+        pass
+
+    def offloads(self, batch):
+        """Whether ``submit`` hands this batch to another process, and so may block, instead of running it"""
+        return False
+
+    def submit(self, batch, source_id, tag=None):
+        output, trace = self.runtime.run(batch, source_id)
+        self._done.append((tag, output, trace))
+
+    def completed(self):
+        done, self._done = self._done, []
+        return done
+
+    def stats(self):
+        return {"mode": "inline", "workers": 0}
+
+    def worker_pids(self):
+        return []
+
+
+class ProcessStageExecutor(StageExecutor):
+    """Spreads batches across a set of worker processes.
+
+    Each worker holds its own StageRuntime and QualityEngine; traces, rule
+    counters and the counters of every stage with ``take_stats`` (the
+    geospatial, calendar and entity stages) come back with the results and
+    are folded into the parent's ``runtime``, ``quality`` and stages so
+    the dashboard sees one set of statistics. Batches cross the process boundary in shared memory and
+    only a small layout descriptor is pickled. With ``entity_dir`` every
+    worker's entity resolution stage memory-maps the index saved there.
+    Entities a worker learns come back with its results and are absorbed
+    into the parent's resolver, whose index is the one saved; each worker
+    receives the ones it has not seen with its next batch.
+
+    Submitted batches wait in a queue bounded by ``max_pending``; when it
+    is full ``submit`` blocks, which backs up into the connector queue.
+    Batches under ``inline_below`` rows are not worth the hand-off and run
+    on the calling thread. With ``return_output=False`` loaded batches
+    stay in the workers and ``completed`` yields ``None`` in their place.
+
+    Workers are started as ``python -m omnistream.parallel`` rather than
+    through multiprocessing's spawn machinery, which would re-run the
+    caller's ``__main__`` (under Streamlit, the whole dashboard script).
+    """
+
+    def __init__(self, runtime, quality, workers=None, max_pending=None, inline_below=0, return_output=True,
+                 start_timeout=30.0, entity_dir=None):
+        super().__init__(runtime)
+        self.entity_dir = entity_dir
+        self.return_output = return_output
+        self.quality = quality
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or 2 * self.workers
+        self.inline_below = inline_below
+        self.start_timeout = start_timeout
+        self._tasks = queue.Queue(maxsize=self.max_pending)
+        self._finished = collections.deque()
+        self._counter_lock = threading.Lock()
+        # Stateful stages' counters come back from the workers and are merged into these
+        self._stages = dict(runtime.stages)
+        # The parent's entity resolver, and every batch of entities it absorbed from a worker, in order
+        entities = self._stages.get("entity_resolution")
+        self.entities = entities if hasattr(entities, "absorb") else None
+        self._absorbed = []
+        self._listener = None
+        self._processes = []
+        self._threads = []
+        self.in_flight = 0
+        self.batches_offloaded = 0
+        self.batches_inline = 0
+        self.worker_failures = 0
+        self.wait_time = 0.0
+
+    def start(self):
+        if self._listener is not None:
+            return self
+        authkey = secrets.token_bytes(16)
+        self._listener = Listener(family="AF_UNIX", authkey=authkey)
+        package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [package_root, env.get("PYTHONPATH")]))
+        command = [sys.executable, "-m", "omnistream.parallel", self._listener.address, authkey.hex(),
+                   ",".join(self.runtime.steps), self.entity_dir or ""]
+        for i in range(self.workers):
+            self._processes.append(subprocess.Popen(command, env=env, stdin=subprocess.DEVNULL))
+            thread = threading.Thread(target=self._dispatch, name=f"omnistream-stage-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout=None):
+        if self._listener is None:
+            return
+        # Drop batches that never reached a worker, then release every dispatcher
+        while True:
+            try:
+                task = self._tasks.get_nowait()
+            except queue.Empty:
+                break
+            if task is not None:
+                self._release(task[0])
+        for thread in self._threads:
+            if thread.is_alive():
+                self._tasks.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._listener.close()
+        for process in self._processes:
+            try:
+                process.wait(timeout if timeout is not None else self.start_timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self._listener = None
+        self._processes = []
+        self._threads = []
+        # Release the output blocks of batches that finished but were never collected
+        while self._finished:
+            _, _, reply = self._finished.popleft()
+            if reply[0] not in (None, "error"):
+                self._release(shared_memory.SharedMemory(name=reply[0]))
+
+    @staticmethod
+    def _release(block):
+        block.close()
+        block.unlink()
+
+    def _dispatch(self):
+        """Feed one worker process: send a queued batch, wait for its reply, repeat"""
+        try:
+            connection = self._listener.accept()
+        except OSError:
+            return
+        seen = 0
+        with connection:
+            while True:
+                task = self._tasks.get()
+                if task is None:
+                    connection.send(None)
+                    return
+                block, layout, source_id, tag, records_in = task
+                seen, known = self._entities_since(seen)
+                try:
+                    connection.send((block.name, layout, source_id, self.return_output, known))
+                    reply = connection.recv()
+                except (EOFError, OSError) as exc:
+                    # The worker is gone: fail this batch and stop feeding it
+                    self.worker_failures += 1
+                    self._complete(block, tag, records_in, ("error", repr(exc)))
+                    return
+                self._complete(block, tag, records_in, reply)
+
+    def _entities_since(self, seen):
+        """Entities absorbed after the first ``seen`` batches of them: (batches absorbed, arrays or None)"""
+        with self._counter_lock:
+            absorbed = self._absorbed[seen:]
+        if not absorbed:
+            return seen, None
+        return seen + len(absorbed), (np.concatenate([signatures for signatures, _ in absorbed]),
+                                      np.concatenate([ids for _, ids in absorbed]))
+
+    def _complete(self, block, tag, records_in, reply):
+        self._release(block)
+        with self._counter_lock:
+            self.in_flight -= 1
+        self._finished.append((tag, records_in, reply))
+
+    def offloads(self, batch):
+        # Fall back to the calling thread if every worker has died
+        return (self._listener is not None and len(batch) >= self.inline_below
+                and any(thread.is_alive() for thread in self._threads))
+
+    def submit(self, batch, source_id, tag=None):
+        if not self.offloads(batch):
+            self.batches_inline += 1
+            super().submit(batch, source_id, tag)
+            return
+
+        block, layout = to_shared(batch)
+        with self._counter_lock:
+            self.in_flight += 1
+        started = time.perf_counter()
+        self._tasks.put((block, layout, source_id, tag, len(batch)))
+        self.wait_time += time.perf_counter() - started
+        self.batches_offloaded += 1
+
+    def completed(self):
+        done = super().completed()
+        while self._finished:
+            tag, records_in, reply = self._finished.popleft()
+            if reply[0] == "error":
+                # The batch could not be run: fail it at the first stage
+                trace = [self.runtime._trace_entry(self.runtime.steps[0], records_in, 0, records_in, 0.0, reply[1])]
+                self.runtime.record_trace(trace)
+                done.append((tag, pd.DataFrame(), trace))
+                continue
+            name, layout, trace, quality_stats, stage_stats, learned = reply
+            output = None
+            if name is not None:
+                out_block = shared_memory.SharedMemory(name=name)
+                try:
+                    output = from_shared(out_block, layout)
+                finally:
+                    self._release(out_block)
+            self.runtime.record_trace(trace)
+            self.quality.add_stats(quality_stats)
+            for stage, taken in stage_stats.items():
+                if hasattr(self._stages.get(stage), "add_stats"):
+                    self._stages[stage].add_stats(taken)
+            if learned is not None and self.entities is not None:
+                added = self.entities.absorb(*learned)
+                if len(added[1]):
+                    with self._counter_lock:
+                        self._absorbed.append(added)
+            done.append((tag, output, trace))
+        return done
+
+    def stats(self):
+        return {
+            "mode": "process",
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "in_flight": self.in_flight,
+            "batches_offloaded": self.batches_offloaded,
+            "batches_inline": self.batches_inline,
+            "worker_failures": self.worker_failures,
+            "submit_wait_s": self.wait_time,
+        }
+
+    def worker_pids(self):
+        return [process.pid for process in self._processes if process.poll() is None]
+
+
+def make_executor(runtime, quality, workers=0, **kwargs):
+    """Inline executor for ``workers=0``, otherwise a process pool"""
+    if not workers:
+        return StageExecutor(runtime)
+    return ProcessStageExecutor(runtime, quality, workers=workers, **kwargs)
+
+
+if __name__ == "__main__":
+    _worker_main(sys.argv[1], bytes.fromhex(sys.argv[2]), sys.argv[3].split(","), sys.argv[4] or None)
@@ -0,0 +1,221 @@
+"""Write-behind persistence of pipeline summaries, metrics, alerts and events"""
+import functools
+import os
+import queue
+import threading
+import time
+
+DEFAULT_DATABASE_URL = "sqlite:///omnistream.db"
+
+
+@functools.cache
+def schema():
+    """The table definitions as (metadata, tables by name).
+
+    Built on first use, so importing this module (and with it the engine)
+    does not load SQLAlchemy until a writer actually starts.
+    """
+    from sqlalchemy import Column, DateTime, Float, Integer, MetaData, String, Table, Text
+
+    metadata = MetaData()
+
+    Table(
+        "batch_summaries", metadata,
+        Column("id", Integer, primary_key=True),
+        Column("processed_at", DateTime, nullable=False, index=True),
+        Column("source_id", String(64), nullable=False),
+        Column("records_in", Integer, nullable=False),
+        Column("records_out", Integer, nullable=False),
+        Column("records_rejected", Integer, nullable=False),
+        Column("wall_ms", Float, nullable=False),
+    )
+
+    Table(
+        "metrics", metadata,
+        Column("id", Integer, primary_key=True),
+        Column("recorded_at", DateTime, nullable=False, index=True),
+        Column("metric", String(64), nullable=False),
+        Column("value", Float, nullable=False),
+    )
+
+    Table(
+        "alerts", metadata,
+        Column("id", Integer, primary_key=True),
+        Column("created_at", DateTime, nullable=False, index=True),
+        Column("source", String(128), nullable=False),
+        Column("message", Text, nullable=False),
+        Column("severity", String(16), nullable=False),
+        Column("status", String(16), nullable=False),
+    )
+
+    Table(
+        "events", metadata,
+        Column("id", Integer, primary_key=True),
+        Column("created_at", DateTime, nullable=False, index=True),
+        Column("component", String(128), nullable=False),
+        Column("message", Text, nullable=False),
+        Column("type", String(16), nullable=False),
+    )
+
+    return metadata, {table.name: table for table in metadata.sorted_tables}
+
+
+def __getattr__(name):
+    # ``metadata``, ``TABLES`` and the tables themselves stay importable by name
+    if name == "metadata":
+        return schema()[0]
+    if name == "TABLES":
+        return schema()[1]
+    tables = schema()[1]
+    if name in tables:
+        return tables[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class WriteBehindWriter:
+    """Buffers rows in a bounded queue and flushes them from a background thread.
+
+    ``submit`` never blocks: when the queue is full the row is dropped and
+    counted, so a slow database cannot stall the tick loop or a render.
+    The writer flushes once ``batch_size`` rows are pending or
+    ``flush_interval`` seconds have passed, issuing one multi-row
+    ``executemany`` insert per table inside a single transaction.
+
+    The database engine and any missing tables are created on the writer
+    thread too, so ``start`` returns at once even if the database is slow
+    or unreachable. Until that succeeds every flush retries it and drops
+    its rows, and the failure shows in ``stats``.
+    """
+
+    def __init__(self, database_url=None, batch_size=500, flush_interval=1.0, max_queue=10_000):
+        self.database_url = database_url or os.environ.get("OMNISTREAM_DATABASE_URL", DEFAULT_DATABASE_URL)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._engine = None
+        self._tables = None
+
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self.flushes = 0
+        self.flush_errors = 0
+        self.schema_errors = 0
+        self.last_flush_ms = 0.0
+        self.last_error = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        # Tables are checked again on every start, on the writer thread
+        self._tables = None
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="omnistream-writer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """Flush whatever is queued and stop the writer thread"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._engine is not None:
+            self._engine.dispose()
+            self._engine = None
+
+    def submit(self, table_name, row):
+        """Queue a row for insertion; returns False if it had to be dropped"""
+        try:
+            self._queue.put_nowait((table_name, row))
+            return True
+        except queue.Full:
+            self.rows_dropped += 1
+            return False
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _connect(self):
+        """Create the database engine and any missing tables; returns whether the tables are ready"""
+        try:
+            from sqlalchemy import create_engine
+
+            metadata, tables = schema()
+            if self._engine is None:
+                self._engine = create_engine(self.database_url, future=True)
+            metadata.create_all(self._engine)
+        except Exception as exc:
+            self.schema_errors += 1
+            self.last_error = repr(exc)
+            return False
+        self._tables = tables
+        return True
+
+    def _run(self):
+        self._connect()
+        while not self._stop_event.is_set():
+            rows = self._collect()
+            if rows:
+                self._flush(rows)
+        # Drain anything left behind on shutdown
+        rows = self._collect(block=False)
+        while rows:
+            self._flush(rows)
+            rows = self._collect(block=False)
+
+    def _collect(self, block=True):
+        """Gather up to ``batch_size`` rows, waiting at most ``flush_interval``"""
+        rows = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(rows) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                if block and timeout > 0:
+                    rows.append(self._queue.get(timeout=timeout))
+                else:
+                    rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def _flush(self, rows):
+        if self._tables is None and not self._connect():
+            # No tables to write to yet; the next flush tries again
+            self.rows_dropped += len(rows)
+            return
+        grouped = {}
+        for table_name, row in rows:
+            grouped.setdefault(table_name, []).append(row)
+
+        started = time.perf_counter()
+        try:
+            with self._engine.begin() as conn:
+                for table_name, table_rows in grouped.items():
+                    conn.execute(self._tables[table_name].insert(), table_rows)
+        except Exception as exc:
+            # Keep the writer alive; the rows in this flush are lost
+            self.flush_errors += 1
+            self.rows_dropped += len(rows)
+            self.last_error = repr(exc)
+            return
+        self.last_flush_ms = (time.perf_counter() - started) * 1000
+        self.rows_written += len(rows)
+        self.flushes += 1
+
+    def stats(self):
+        from sqlalchemy.engine import make_url
+
+        return {
+            "database_url": make_url(self.database_url).render_as_string(hide_password=True),
+            "pending": self.pending(),
+            "rows_written": self.rows_written,
+            "rows_dropped": self.rows_dropped,
+            "flushes": self.flushes,
+            "flush_errors": self.flush_errors,
+            "schema_ready": self._tables is not None,
+            "schema_errors": self.schema_errors,
+            "last_flush_ms": self.last_flush_ms,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,227 @@
+"""Samples CPU, memory and I/O of the engine's threads and worker processes from /proc"""
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from omnistream.timeseries import TimeSeriesStore
+
+RESOURCE_COLUMNS = ("cpu_pct", "memory_pct", "disk_mb_s", "syscall_mb_s")
+
+# Engine threads by name prefix; anything else in the process is reported together
+THREAD_COMPONENTS = (
+    ("omnistream-engine", "Engine tick loop"),
+    ("omnistream-connectors", "Source connectors"),
+    ("omnistream-stage-worker", "Stage dispatch"),
+    ("omnistream-writer", "Persistence writer"),
+    ("omnistream-metrics", "Metrics exporter"),
+    ("omnistream-resources", "Resource sampler"),
+)
+OTHER_THREADS = "Dashboard & other threads"
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _cpu_seconds(stat_path):
+    """utime + stime from a /proc stat file, in seconds"""
+    with open(stat_path, "rb") as f:
+        # The command name may contain spaces; fields resume after its closing parenthesis
+        fields = f.read().rpartition(b")")[2].split()
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+
+def _io_bytes(io_path):
+    """(storage bytes, read/write syscall bytes) from a /proc io file; zeros when not readable"""
+    try:
+        with open(io_path, "rb") as f:
+            values = dict(line.split(b":") for line in f.read().splitlines())
+    except (OSError, ValueError):
+        return 0, 0
+    return int(values[b"read_bytes"]) + int(values[b"write_bytes"]), int(values[b"rchar"]) + int(values[b"wchar"])
+
+
+def _rss_bytes(pid):
+    with open(f"/proc/{pid}/statm", "rb") as f:
+        return int(f.read().split()[1]) * PAGE_SIZE
+
+
+def _memory_total():
+    try:
+        with open("/proc/meminfo", "rb") as f:
+            for line in f:
+                if line.startswith(b"MemTotal:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def proc_available():
+    return os.path.exists("/proc/self/stat")
+
+
+class ResourceSampler:
+    """Background sampler of the pipeline's own resource usage.
+
+    Every ``interval`` seconds it reads ``/proc`` for each engine thread
+    (grouped into components by thread name) and for each stage worker
+    process returned by ``worker_pids()``. CPU is reported as a percentage
+    of one core, memory as a share of host RAM and I/O as MB/s, computed
+    from the counters' change since the previous sample. Process totals go
+    into a fixed-capacity TimeSeriesStore ring; the latest per-component
+    rows are kept for the breakdown. The sampler times itself so its own
+    overhead is visible next to what it measures.
+    """
+
+    def __init__(self, interval=1.0, capacity=900, worker_pids=None):
+        self.interval = interval
+        self.worker_pids = worker_pids or (lambda: [])
+        self.history = TimeSeriesStore(RESOURCE_COLUMNS, capacity=capacity,
+                                       resolution=np.timedelta64(max(1, int(round(interval))), "s"))
+        self.available = proc_available()
+        self.memory_total = _memory_total() if self.available else 0
+        self.cpu_count = os.cpu_count() or 1
+
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._previous = {}  # counter key -> (cpu seconds, disk bytes, syscall bytes)
+        self._previous_time = None
+        self.components = []
+        self.samples = 0
+        self.sample_time = 0.0
+        self.last_sample_ms = 0.0
+
+    def start(self):
+        if not self.available or (self._thread is not None and self._thread.is_alive()):
+            return self
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="omnistream-resources", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        self.sample()
+        while not self._stop_event.wait(self.interval):
+            self.sample()
+
+    # ------------------------------------------------------------------
+    # Sampling
+    # ------------------------------------------------------------------
+    def _read_counters(self):
+        """Current counters keyed by ("thread", tid) and ("process", pid), plus component names"""
+        counters = {}
+        names = {}
+        pid = os.getpid()
+        thread_names = {thread.native_id: thread.name for thread in threading.enumerate()}
+        for entry in os.listdir(f"/proc/{pid}/task"):
+            tid = int(entry)
+            try:
+                cpu = _cpu_seconds(f"/proc/{pid}/task/{tid}/stat")
+            except (OSError, IndexError, ValueError):
+                continue  # the thread exited while we listed it
+            counters[("thread", tid)] = (cpu,) + _io_bytes(f"/proc/{pid}/task/{tid}/io")
+            names[("thread", tid)] = self._thread_component(thread_names.get(tid, ""))
+
+        processes = [(pid, "Pipeline process")]
+        processes += [(worker, f"Stage worker {i}") for i, worker in enumerate(self.worker_pids())]
+        rss = {}
+        for process_id, name in processes:
+            try:
+                cpu = _cpu_seconds(f"/proc/{process_id}/stat")
+                rss[process_id] = _rss_bytes(process_id)
+            except (OSError, IndexError, ValueError):
+                continue
+            counters[("process", process_id)] = (cpu,) + _io_bytes(f"/proc/{process_id}/io")
+            names[("process", process_id)] = name
+        return counters, names, rss
+
+    @staticmethod
+    def _thread_component(thread_name):
+        for prefix, component in THREAD_COMPONENTS:
+            if thread_name.startswith(prefix):
+                return component
+        return OTHER_THREADS
+
+    def sample(self, now=None):
+        """Take one sample; the first only establishes a baseline"""
+        started = time.perf_counter()
+        now = now or datetime.now()
+        wall = time.monotonic()
+        counters, names, rss = self._read_counters()
+
+        components = {}
+        if self._previous_time is not None:
+            elapsed = max(wall - self._previous_time, 1e-6)
+            for key, (cpu, disk, syscall) in counters.items():
+                previous = self._previous.get(key)
+                if previous is None:
+                    continue  # new thread or worker: its rates start with the next sample
+                kind, ident = key
+                row = components.setdefault(names[key], {
+                    "component": names[key],
+                    "kind": kind,
+                    "cpu_pct": 0.0,
+                    "memory_pct": float("nan"),  # threads share their process's memory
+                    "disk_mb_s": 0.0,
+                    "syscall_mb_s": 0.0,
+                    "threads": 0,
+                })
+                row["cpu_pct"] += 100 * (cpu - previous[0]) / elapsed
+                row["disk_mb_s"] += (disk - previous[1]) / elapsed / 1e6
+                row["syscall_mb_s"] += (syscall - previous[2]) / elapsed / 1e6
+                if kind == "thread":
+                    row["threads"] += 1
+                elif self.memory_total:
+                    row["memory_pct"] = 100 * rss[ident] / self.memory_total
+
+        with self._lock:
+            self._previous = counters
+            self._previous_time = wall
+            if components:
+                self.components = list(components.values())
+                processes = [row for row in self.components if row["kind"] == "process"]
+                self.history.add(now, {
+                    # Share of the whole host, so the trend stays within 0-100% on any core count
+                    "cpu_pct": sum(row["cpu_pct"] for row in processes) / self.cpu_count,
+                    "memory_pct": sum(row["memory_pct"] for row in processes),
+                    "disk_mb_s": sum(row["disk_mb_s"] for row in processes),
+                    "syscall_mb_s": sum(row["syscall_mb_s"] for row in processes),
+                })
+            self.samples += 1
+            self.last_sample_ms = (time.perf_counter() - started) * 1000
+            self.sample_time += self.last_sample_ms / 1000
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+    def components_snapshot(self):
+        with self._lock:
+            return [dict(row) for row in self.components]
+
+    def history_frame(self):
+        """Zero-copy frame of process totals, indexed by sample time"""
+        with self._lock:
+            return self.history.frame()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "available": self.available,
+                "interval_s": self.interval,
+                "samples": self.samples,
+                "last_sample_ms": self.last_sample_ms,
+                # Share of one core spent sampling
+                "overhead_pct": 100 * self.last_sample_ms / 1000 / self.interval if self.interval else 0.0,
+                "cpu_count": self.cpu_count,
+                "version": self.history.version,
+            }
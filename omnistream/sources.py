@@ -0,0 +1,130 @@
+"""Synthetic record batches for the simulated data sources"""
+import numpy as np
+import pandas as pd
+
+STOCK_SYMBOLS = np.array(["AAPL", "MSFT", "GOOG", "AMZN", "NVDA", "META", "TSLA", "JPM"])
+WEATHER_STATIONS = np.array(["KSEA", "KSFO", "KJFK", "KORD", "KDEN", "KATL", "KBOS", "KMIA"])
+# Latitude and longitude of each station, in WEATHER_STATIONS order
+STATION_POSITIONS = np.array([
+    (47.449, -122.309), (37.619, -122.375), (40.640, -73.779), (41.979, -87.904),
+    (39.856, -104.674), (33.637, -84.428), (42.363, -71.006), (25.795, -80.287),
+])
+# Sensors are installed at fixed positions; sensor-N sits at SENSOR_POSITIONS[N]
+SENSOR_COUNT = 500
+SENSOR_POSITIONS = np.column_stack([
+    np.random.default_rng(SENSOR_COUNT).uniform(25, 48, SENSOR_COUNT),
+    np.random.default_rng(SENSOR_COUNT + 1).uniform(-124, -70, SENSOR_COUNT),
+])
+SOCIAL_HANDLES = np.array(["dataqueen", "streamguru", "etl_ninja", "pipelinepro", "bytewise", "kafkafan"])
+CUSTOMER_NAMES = np.array([
+    "Maria Garcia", "James Smith", "Li Wei", "Amara Okafor", "Sofia Rossi",
+    "Noah Johnson", "Priya Patel", "Lucas Martin", "Hana Sato", "Omar Haddad",
+])
+STORE_IDS = np.array(["ST-001", "ST-002", "ST-003", "ST-004", "ST-005"])
+
+# Share of generated records that carry a data quality defect
+DEFECT_RATE = 0.015
+
+
+def _emails(handles, defects):
+    emails = np.char.add(handles, "@example.com").astype(object)
+    # Malformed addresses are part of the defect budget
+    if defects.any():
+        emails[defects] = np.char.replace(emails[defects].astype(str), "@", " at ")
+    return emails
+
+
+def _with_nulls(values, defects):
+    values = values.astype(np.float64)
+    values[defects] = np.nan
+    return values
+
+
+def _stock_market(size, rng, defects):
+    base = rng.uniform(50, 900, size)
+    price = np.where(defects, -base, base)  # negative prices are out of range
+    return {
+        "symbol": rng.choice(STOCK_SYMBOLS, size),
+        "price": np.round(price, 2),
+        "volume": rng.integers(100, 50_000, size),
+    }
+
+
+def _weather_data(size, rng, defects):
+    stations = rng.integers(0, len(WEATHER_STATIONS), size)
+    return {
+        "station_id": WEATHER_STATIONS[stations],
+        "temperature_f": _with_nulls(rng.normal(60, 15, size), defects),
+        "humidity": rng.uniform(10, 100, size),
+        "latitude": STATION_POSITIONS[stations, 0],
+        "longitude": STATION_POSITIONS[stations, 1],
+    }
+
+
+def _social_media(size, rng, defects):
+    handles = rng.choice(SOCIAL_HANDLES, size)
+    return {
+        "user_handle": handles,
+        "email": _emails(handles, defects),
+        "likes": rng.poisson(40, size),
+        "shares": rng.poisson(5, size),
+    }
+
+
+def _retail_transactions(size, rng, defects):
+    names = rng.choice(CUSTOMER_NAMES, size)
+    handles = np.char.replace(np.char.lower(names), " ", ".")
+    return {
+        "transaction_id": rng.integers(10**9, 10**10, size),
+        "customer_name": names,
+        "email": _emails(handles, defects),
+        # A few transactions reference stores that are not in the store catalogue
+        "store_id": np.where(rng.random(size) < DEFECT_RATE / 3, "ST-999", rng.choice(STORE_IDS, size)),
+        "amount": np.round(rng.lognormal(3.5, 0.8, size), 2),
+        "latitude": rng.uniform(25, 48, size),
+        "longitude": rng.uniform(-124, -70, size),
+    }
+
+
+def _iot_sensors(size, rng, defects):
+    reading = rng.normal(21, 2, size)
+    sensors = rng.integers(0, SENSOR_COUNT, size)
+    return {
+        "sensor_id": np.char.add("sensor-", sensors.astype(str)),
+        "reading": np.where(defects, reading * 100, reading),  # spikes beyond sensor range
+        "battery_pct": rng.uniform(5, 100, size),
+        "latitude": SENSOR_POSITIONS[sensors, 0],
+        "longitude": SENSOR_POSITIONS[sensors, 1],
+    }
+
+
+GENERATORS = {
+    "stock_market": _stock_market,
+    "weather_data": _weather_data,
+    "social_media": _social_media,
+    "retail_transactions": _retail_transactions,
+    "iot_sensors": _iot_sensors,
+}
+
+
+class BatchGenerator:
+    """Produces DataFrame batches for one source with a small share of defects"""
+
+    def __init__(self, source_id, seed=None, defect_rate=DEFECT_RATE):
+        self.source_id = source_id
+        self.defect_rate = defect_rate
+        self._generate = GENERATORS[source_id]
+        self._rng = np.random.default_rng(seed)
+        self._next_record_id = 0
+
+    def generate(self, size, now):
+        rng = self._rng
+        defects = rng.random(size) < self.defect_rate
+        columns = {
+            "record_id": np.arange(self._next_record_id, self._next_record_id + size, dtype=np.int64),
+            # Records arrive with up to a minute of source-side delay
+            "event_time": np.datetime64(now, "ms") - rng.integers(0, 60_000, size).astype("timedelta64[ms]"),
+        }
+        columns.update(self._generate(size, rng, defects))
+        self._next_record_id += size
+        return pd.DataFrame(columns)
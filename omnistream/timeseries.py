@@ -0,0 +1,289 @@
+"""Columnar ring-buffer stores for bucketed pipeline metrics"""
+import numpy as np
+import pandas as pd
+
+
+class TimeSeriesStore:
+    """Fixed-capacity, time-bucketed metric history backed by NumPy arrays.
+
+    Every value is written twice, at ``pos`` and ``pos + physical`` (the
+    "mirrored ring" layout), so the most recent ``capacity`` points are always
+    one contiguous slice. ``frame()`` therefore hands out zero-copy views and
+    appends stay O(1) with no trimming copies. The physical ring holds
+    ``slack`` more slots than the logical window, so a view taken by a reader
+    is not overwritten until ``slack`` further buckets have been appended.
+
+    Timestamps are floored to ``resolution`` and stored as ``datetime64[s]``.
+    Looking up the bucket for a timestamp is a dict hit, not a scan.
+    """
+
+    def __init__(self, columns, capacity=48, resolution=np.timedelta64(1, "h"), slack=64):
+        self.columns = tuple(columns)
+        self.capacity = int(capacity)
+        self.resolution = np.timedelta64(resolution, "s")
+        self._column_index = {name: i for i, name in enumerate(self.columns)}
+        self._physical = self.capacity + int(slack)
+
+        self._timestamps = np.zeros(2 * self._physical, dtype="datetime64[s]")
+        self._values = np.zeros((len(self.columns), 2 * self._physical), dtype=np.float64)
+        self._appended = 0  # total number of buckets ever appended
+        self._slots = {}    # bucket start (int seconds) -> append sequence number
+
+        # Bumped on every write so readers can tell when their data is stale
+        self.version = 0
+
+    def __len__(self):
+        return min(self._appended, self.capacity)
+
+    def __getstate__(self):
+        # The mirrored half is rebuilt on load, so copies and checkpoints carry one
+        state = self.__dict__.copy()
+        state["_timestamps"] = self._timestamps[:self._physical].copy()
+        state["_values"] = self._values[:, :self._physical].copy()
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._timestamps = np.concatenate([self._timestamps, self._timestamps])
+        self._values = np.concatenate([self._values, self._values], axis=1)
+
+    def bucket(self, timestamp):
+        """Floor a timestamp to the start of its bucket"""
+        seconds = np.datetime64(timestamp, "s").astype(np.int64)
+        step = self.resolution.astype(np.int64)
+        return (seconds // step * step).astype("datetime64[s]")
+
+    def latest(self):
+        """Timestamp of the newest bucket, or None when empty"""
+        if not self._appended:
+            return None
+        return self._timestamps[(self._appended - 1) % self._physical]
+
+    def add(self, timestamp, values, accumulate=(), minimum=(), maximum=()):
+        """Write ``values`` into the bucket containing ``timestamp``.
+
+        Columns named in ``accumulate`` are summed into an existing bucket,
+        those in ``minimum`` and ``maximum`` keep the smaller or larger value;
+        all other columns overwrite it. Returns False if the bucket has
+        already fallen out of the window.
+        """
+        bucket = self.bucket(timestamp)
+        key = int(bucket.astype(np.int64))
+        seq = self._slots.get(key)
+
+        if seq is None:
+            newest = self.latest()
+            if newest is not None and bucket < newest:
+                return False
+            seq = self._append_slot(bucket, key)
+            accumulate = minimum = maximum = ()
+
+        pos = seq % self._physical
+        for name, value in values.items():
+            row = self._values[self._column_index[name]]
+            if name in accumulate:
+                value = row[pos] + value
+            elif name in minimum:
+                value = min(row[pos], value)
+            elif name in maximum:
+                value = max(row[pos], value)
+            row[pos] = value
+            row[pos + self._physical] = value
+
+        self.version += 1
+        return True
+
+    def extend(self, timestamps, values):
+        """Append whole buckets at once, e.g. to load history.
+
+        ``timestamps`` must be bucket starts in increasing order, all newer
+        than the latest bucket; ``values`` maps column names to arrays of the
+        same length, and columns left out are zero.
+        """
+        timestamps = np.asarray(timestamps, dtype="datetime64[s]")[-self.capacity:]
+        count = len(timestamps)
+        if not count:
+            return
+        positions = (self._appended + np.arange(count)) % self._physical
+        block = np.zeros((len(self.columns), count))
+        for name, column in values.items():
+            block[self._column_index[name]] = np.asarray(column, dtype=np.float64)[-count:]
+        for offset in (0, self._physical):
+            self._timestamps[positions + offset] = timestamps
+            self._values[:, positions + offset] = block
+        self._appended += count
+
+        # Rebuilt rather than patched: a load may push the whole window out
+        window = self.timestamps().astype(np.int64).tolist()
+        self._slots = dict(zip(window, range(self._appended - len(window), self._appended)))
+        self.version += 1
+
+    def _append_slot(self, bucket, key):
+        seq = self._appended
+        pos = seq % self._physical
+
+        # Buckets that fell out of the logical window are no longer writable
+        if seq >= self.capacity:
+            stale = int(self._timestamps[(seq - self.capacity) % self._physical].astype(np.int64))
+            if self._slots.get(stale) == seq - self.capacity:
+                del self._slots[stale]
+
+        self._timestamps[pos] = bucket
+        self._timestamps[pos + self._physical] = bucket
+        self._values[:, pos] = 0.0
+        self._values[:, pos + self._physical] = 0.0
+        self._slots[key] = seq
+        self._appended += 1
+        return seq
+
+    def _window(self):
+        size = len(self)
+        start = (self._appended - size) % self._physical
+        return start, start + size
+
+    def timestamps(self):
+        """Read-only view of bucket timestamps, oldest first"""
+        start, stop = self._window()
+        view = self._timestamps[start:stop]
+        view.flags.writeable = False
+        return view
+
+    def column(self, name):
+        """Read-only view of one metric column, oldest first"""
+        start, stop = self._window()
+        view = self._values[self._column_index[name], start:stop]
+        view.flags.writeable = False
+        return view
+
+    def frame(self):
+        """Zero-copy DataFrame of the window, indexed by bucket timestamp"""
+        start, stop = self._window()
+        block = self._values[:, start:stop]
+        block.flags.writeable = False
+        index = pd.DatetimeIndex(self._timestamps[start:stop], name="Timestamp", copy=False)
+        return pd.DataFrame(block.T, index=index, columns=list(self.columns), copy=False)
+
+
+class RollupStore:
+    """Metric history rolled up at several resolutions at once.
+
+    ``levels`` lists ``(resolution, capacity)`` pairs, finest first. Every
+    point is folded into one TimeSeriesStore per level as a sample count,
+    sum, minimum and maximum, so each level is complete without ever
+    re-reading a finer one and a long span is read from a coarse level.
+    ``query`` picks the coarsest level that still gives a chart one bucket
+    per pixel and merges anything finer with ``downsample_minmax``.
+    """
+
+    def __init__(self, columns, levels):
+        self.columns = tuple(columns)
+        self.levels = tuple((np.timedelta64(resolution, "s"), int(capacity)) for resolution, capacity in levels)
+        self._sums = tuple(f"{name}_sum" for name in self.columns)
+        self._minimums = tuple(f"{name}_min" for name in self.columns)
+        self._maximums = tuple(f"{name}_max" for name in self.columns)
+        fields = ("samples",) + self._sums + self._minimums + self._maximums
+        self.stores = [TimeSeriesStore(fields, capacity=capacity, resolution=resolution)
+                       for resolution, capacity in self.levels]
+        self._accumulate = ("samples",) + self._sums
+        self.version = 0
+
+    def add(self, timestamp, values):
+        """Fold one point (column name -> value) into every level"""
+        fields = {"samples": 1}
+        for name, value in values.items():
+            fields[f"{name}_sum"] = value
+            fields[f"{name}_min"] = value
+            fields[f"{name}_max"] = value
+        for store in self.stores:
+            store.add(timestamp, fields, accumulate=self._accumulate,
+                      minimum=self._minimums, maximum=self._maximums)
+        self.version += 1
+
+    def extend(self, level, timestamps, values):
+        """Load one value per bucket (column name -> array) into a single level"""
+        fields = {"samples": np.ones(len(timestamps))}
+        for name, column in values.items():
+            for suffix in ("_sum", "_min", "_max"):
+                fields[name + suffix] = column
+        self.stores[level].extend(timestamps, fields)
+        self.version += 1
+
+    def latest(self):
+        """Timestamp of the newest bucket at any level, or None when empty"""
+        latest = [store.latest() for store in self.stores if len(store)]
+        return max(latest) if latest else None
+
+    def level_for(self, seconds, width):
+        """Index of the level to read the last ``seconds`` from for a chart ``width`` pixels wide.
+
+        Only levels whose window spans ``seconds`` are considered (the
+        coarsest if none does); of those, the coarsest with at least
+        ``width`` buckets in the span wins, else the finest.
+        """
+        spans = [capacity * int(resolution.astype(np.int64)) for resolution, capacity in self.levels]
+        covering = [i for i, span in enumerate(spans) if span >= seconds] or [len(self.levels) - 1]
+        filling = [i for i in covering if seconds // int(self.levels[i][0].astype(np.int64)) >= width]
+        return filling[-1] if filling else covering[0]
+
+    def query(self, seconds, width, end=None):
+        """DataFrame of the ``seconds`` up to ``end`` (default: the newest point), at most ``width`` rows.
+
+        Columns are ``samples`` and, per metric, its mean, ``_min`` and
+        ``_max``. ``attrs["resolution"]`` is the bucket width read, in seconds.
+        """
+        level = self.level_for(seconds, width)
+        store = self.stores[level]
+        columns = ["samples"] + [f"{name}{suffix}" for name in self.columns for suffix in ("", "_min", "_max")]
+        end = self.latest() if end is None else end
+        first = len(store)
+        if end is not None:
+            start = store.bucket(np.datetime64(end, "s") - np.timedelta64(int(seconds), "s"))
+            first = int(np.searchsorted(store.timestamps(), start))
+        timestamps = store.timestamps()[first:]
+        samples = store.column("samples")[first:]
+        block = np.empty((len(columns), len(timestamps)))
+        block[0] = samples
+        for row, (total, low, high) in enumerate(zip(self._sums, self._minimums, self._maximums)):
+            np.divide(store.column(total)[first:], samples, out=block[3 * row + 1])
+            block[3 * row + 2] = store.column(low)[first:]
+            block[3 * row + 3] = store.column(high)[first:]
+        timestamps, block = _merge_slices(timestamps, block, columns, width)
+        frame = pd.DataFrame(block.T, index=pd.DatetimeIndex(timestamps, name="Timestamp"), columns=columns, copy=False)
+        frame.attrs["resolution"] = int(self.levels[level][0].astype(np.int64))
+        return frame
+
+
+def _merge_slices(timestamps, block, columns, width):
+    # Rows of ``block`` are the columns; returns new arrays either way
+    if len(timestamps) <= width:
+        return timestamps.copy(), block
+    seconds = timestamps.astype("datetime64[s]").astype(np.int64)
+    slices = (seconds - seconds[0]) * width // (seconds[-1] - seconds[0] + 1)
+    starts = np.flatnonzero(np.diff(slices, prepend=-1))
+    lows = [row for row, name in enumerate(columns) if name.endswith("_min")]
+    highs = [row for row, name in enumerate(columns) if name.endswith("_max")]
+    means = [row for row, name in enumerate(columns) if row not in lows and row not in highs and name != "samples"]
+    samples = block[columns.index("samples")]
+    totals = np.add.reduceat(samples, starts)
+    merged = np.empty((len(columns), len(starts)))
+    merged[columns.index("samples")] = totals
+    merged[lows] = np.minimum.reduceat(block[lows], starts, axis=1)
+    merged[highs] = np.maximum.reduceat(block[highs], starts, axis=1)
+    merged[means] = np.add.reduceat(block[means] * samples, starts, axis=1) / totals
+    return timestamps[starts], merged
+
+
+def downsample_minmax(frame, width):
+    """Merge a ``RollupStore.query`` frame into at most ``width`` equal time slices.
+
+    Means are weighted by ``samples``; ``_min`` and ``_max`` columns keep the
+    extremes of their slice, so a one-bucket spike still reaches the chart.
+    """
+    if len(frame) <= width:
+        return frame
+    columns = list(frame.columns)
+    timestamps, block = _merge_slices(frame.index.values, frame.to_numpy().T, columns, width)
+    downsampled = pd.DataFrame(block.T, index=pd.DatetimeIndex(timestamps, name=frame.index.name),
+                               columns=columns, copy=False)
+    downsampled.attrs.update(frame.attrs)
+    return downsampled
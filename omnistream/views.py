@@ -0,0 +1,16 @@
+"""Tables the dashboard displays, built from engine snapshots without importing Streamlit"""
+import pandas as pd
+
+
+def source_status_frame(data_sources):
+    """One display row per source for the Data Source Status table"""
+    sources = list(data_sources.values())
+    return pd.DataFrame({
+        "Source Name": [source["name"] for source in sources],
+        "Status": [source["status"] for source in sources],
+        "Records Processed": [f"{source['records_processed']:,}" for source in sources],
+        "Failures": [source["failures"] for source in sources],
+        "Rejected Records": [f"{source['records_rejected']:,}" for source in sources],
+        "Last Update": [source["last_update"].strftime("%H:%M:%S") for source in sources],
+        "Latency (ms)": [round(source["latency_ms"], 1) for source in sources],
+    })
@@ -0,0 +1,253 @@
+"""HttpJsonConnector and ConnectorPool against local stub HTTP servers"""
+import asyncio
+import json
+import threading
+import time
+import unittest
+
+import pandas as pd
+
+from omnistream.connectors import CONNECTOR_FAILURE, ConnectorError, ConnectorPool, HttpJsonConnector
+from omnistream.stages import StageRuntime
+from omnistream.temporal import host_zone
+
+RECORDS = [{"symbol": "AAPL", "price": 187.5}, {"symbol": "MSFT", "price": 411.2}]
+
+
+def _response(status, body=b"", headers=(), chunked=False):
+    reason = {200: "OK", 401: "Unauthorized", 403: "Forbidden", 429: "Too Many Requests"}.get(status, "Error")
+    lines = [f"HTTP/1.1 {status} {reason}", "Content-Type: application/json", *headers]
+    if chunked:
+        lines.append("Transfer-Encoding: chunked")
+        # Split the body into small chunks so dechunking is exercised across boundaries
+        body = b"".join(b"%x\r\n%s\r\n" % (len(part), part) for part in
+                        (body[start:start + 7] for start in range(0, len(body), 7))) + b"0\r\n\r\n"
+    else:
+        lines.append(f"Content-Length: {len(body)}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+
+class StubServer:
+    """Answers every request on 127.0.0.1 with ``response``; ``hang`` never answers"""
+
+    def __init__(self, response=None, hang=False):
+        self.response = response
+        self.hang = hang
+        self.requests = []
+
+    async def __aenter__(self):
+        self._closed = asyncio.Event()
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.url = f"http://127.0.0.1:{self._server.sockets[0].getsockname()[1]}/records?limit=10"
+        return self
+
+    async def __aexit__(self, *exc):
+        # Let hanging handlers return before the loop goes away
+        self._closed.set()
+        await asyncio.sleep(0)
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        self.requests.append(await reader.readuntil(b"\r\n\r\n"))
+        if self.hang:
+            await self._closed.wait()
+            writer.close()
+            return
+        writer.write(self.response)
+        await writer.drain()
+        writer.close()
+
+
+class HttpJsonConnectorTest(unittest.IsolatedAsyncioTestCase):
+
+    async def fetch(self, response, **kwargs):
+        async with StubServer(response) as server:
+            return await HttpJsonConnector("stock_market", server.url, **kwargs).fetch(), server
+
+    async def fetch_error(self, response):
+        with self.assertRaises(ConnectorError) as raised:
+            await self.fetch(response)
+        return raised.exception
+
+    async def test_plain_response(self):
+        batch, server = await self.fetch(_response(200, json.dumps(RECORDS).encode()),
+                                         headers={"Authorization": "Bearer token"})
+        self.assertEqual(batch.to_dict("records"), RECORDS)
+        request = server.requests[0].decode("latin-1")
+        self.assertTrue(request.startswith("GET /records?limit=10 HTTP/1.1\r\n"))
+        self.assertIn("Authorization: Bearer token\r\n", request)
+
+    async def test_fields_are_mapped_to_pipeline_columns(self):
+        expected = pd.Timestamp("2026-07-01T12:00:00Z").tz_convert(host_zone()).tz_localize(None)
+        # The same instant as ISO 8601 text and as epoch seconds, plus a time that cannot be read
+        for stamp, parsed in (("2026-07-01T12:00:00Z", expected), (1782907200, expected), ("soon", pd.NaT)):
+            with self.subTest(stamp=stamp):
+                body = json.dumps([{"id": "a1", "ts": stamp, "last": 187.5}]).encode()
+                batch, _ = await self.fetch(_response(200, body),
+                                            fields={"id": "record_id", "ts": "event_time", "last": "price"})
+                self.assertEqual(list(batch.columns), ["record_id", "event_time", "price"])
+                if pd.isna(parsed):
+                    self.assertTrue(pd.isna(batch["event_time"].iloc[0]))
+                else:
+                    self.assertEqual(batch["event_time"].iloc[0], parsed)
+
+    async def test_batches_run_through_the_stages(self):
+        body = json.dumps([{"id": "a1", "ts": "2026-07-01T12:00:00Z", "last": 187.5}]).encode()
+        for fields in ({"id": "record_id", "ts": "event_time", "last": "price"}, None):
+            with self.subTest(fields=fields):
+                batch, _ = await self.fetch(_response(200, body), fields=fields)
+                output, trace = StageRuntime().run(batch, "stock_market")
+                self.assertEqual([step["exception"] for step in trace], [None] * len(trace))
+                self.assertEqual(len(output), 1)
+
+    async def test_chunked_response(self):
+        batch, _ = await self.fetch(_response(200, json.dumps(RECORDS).encode(), chunked=True))
+        self.assertEqual(batch.to_dict("records"), RECORDS)
+
+    async def test_empty_array(self):
+        batch, _ = await self.fetch(_response(200, b"[]"))
+        self.assertEqual(len(batch), 0)
+
+    async def test_rate_limited_with_retry_after(self):
+        error = await self.fetch_error(_response(429, headers=["Retry-After: 7"]))
+        self.assertEqual(error.failure_type, "Rate Limit Exceeded")
+        self.assertEqual(error.retry_after, 7.0)
+
+    async def test_rate_limited_without_retry_after(self):
+        error = await self.fetch_error(_response(429))
+        self.assertEqual(error.failure_type, "Rate Limit Exceeded")
+        self.assertIsNone(error.retry_after)
+
+    async def test_authentication_failures(self):
+        for status in (401, 403):
+            with self.subTest(status=status):
+                error = await self.fetch_error(_response(status))
+                self.assertEqual(error.failure_type, "Authentication Failure")
+
+    async def test_server_error(self):
+        error = await self.fetch_error(_response(503))
+        self.assertEqual(error.failure_type, "Connection Error")
+
+    async def test_bodies_that_are_not_records(self):
+        for body in (b'{"records": []}', b"[1, 2, 3]", b'["a", {"b": 1}]', b"not json"):
+            with self.subTest(body=body):
+                error = await self.fetch_error(_response(200, body))
+                self.assertEqual(error.failure_type, "Malformed Response")
+
+    async def test_response_over_max_bytes(self):
+        with self.assertRaises(ConnectorError) as raised:
+            await self.fetch(_response(200, json.dumps(RECORDS * 100).encode()), max_bytes=1024)
+        self.assertEqual(raised.exception.failure_type, "Malformed Response")
+        self.assertIn("larger than", str(raised.exception))
+
+    async def test_invalid_chunked_encoding(self):
+        response = _response(200, json.dumps(RECORDS).encode(), chunked=True).replace(b"\r\n7\r\n", b"\r\nzz\r\n", 1)
+        error = await self.fetch_error(response)
+        self.assertEqual(error.failure_type, "Malformed Response")
+
+    async def test_connection_refused(self):
+        async with StubServer() as server:
+            url = server.url
+        with self.assertRaises(ConnectorError) as raised:
+            await HttpJsonConnector("stock_market", url).fetch()
+        self.assertEqual(raised.exception.failure_type, "Connection Error")
+
+
+class BrokenConnector(HttpJsonConnector):
+    """Fails with an exception the pool has no specific handler for"""
+
+    async def fetch(self):
+        raise TypeError("unexpected payload")
+
+
+class UndecodableConnector(HttpJsonConnector):
+    """Fails to decode its payload the way a connector parsing its own format would"""
+
+    async def fetch(self):
+        raise ValueError("unexpected payload")
+
+
+class EndingConnector(HttpJsonConnector):
+    """Ends its poll loop, and with it the pool's event loop, on the first fetch"""
+
+    async def fetch(self):
+        raise asyncio.CancelledError
+
+
+class ConnectorPoolTest(unittest.TestCase):
+    """The pool runs its own event loop thread, so these tests drive it from the outside"""
+
+    def poll(self, connector, results=2, deadline=5.0):
+        pool = ConnectorPool([connector]).start()
+        collected = []
+        started = time.monotonic()
+        try:
+            while len(collected) < results and time.monotonic() - started < deadline:
+                collected.extend(pool.drain())
+                time.sleep(0.01)
+        finally:
+            pool.stop(timeout=5)
+        return pool, collected
+
+    def serve(self, server):
+        """Run a stub server on a private event loop thread for the duration of a test"""
+        loop = asyncio.new_event_loop()
+        ready = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(server.__aenter__())
+            ready.set()
+            loop.run_forever()
+            loop.run_until_complete(server.__aexit__(None, None, None))
+            loop.close()
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        ready.wait()
+
+        def shutdown():
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(5)
+
+        self.addCleanup(shutdown)
+        return server
+
+    def test_timeout(self):
+        server = self.serve(StubServer(hang=True))
+        connector = HttpJsonConnector("stock_market", server.url, timeout=0.1, backoff_base=0.01, backoff_cap=0.02)
+        pool, results = self.poll(connector)
+        self.assertGreaterEqual(len(results), 2)
+        self.assertTrue(all(result.failure_type == "API Timeout" for result in results))
+        self.assertEqual(results[1].consecutive_failures, 2)
+
+    def test_records_reach_the_pool(self):
+        server = self.serve(StubServer(_response(200, json.dumps(RECORDS).encode(), chunked=True)))
+        connector = HttpJsonConnector("stock_market", server.url, poll_interval=0.01, rate_limit=100)
+        pool, results = self.poll(connector)
+        self.assertTrue(all(result.failure_type is None for result in results))
+        self.assertEqual(results[0].batch.to_dict("records"), RECORDS)
+        self.assertEqual(pool.stats["stock_market"]["failures"], 0)
+
+    def test_unexpected_errors_keep_polling(self):
+        connector = BrokenConnector("stock_market", "http://127.0.0.1:9/", backoff_base=0.01, backoff_cap=0.02)
+        pool, results = self.poll(connector, results=3)
+        self.assertGreaterEqual(len(results), 3)
+        self.assertTrue(all(result.failure_type == CONNECTOR_FAILURE for result in results))
+        self.assertIn("TypeError", results[0].message)
+
+    def test_decoding_errors_are_malformed_responses(self):
+        connector = UndecodableConnector("stock_market", "http://127.0.0.1:9/", backoff_base=0.01, backoff_cap=0.02)
+        pool, results = self.poll(connector)
+        self.assertTrue(all(result.failure_type == "Malformed Response" for result in results))
+
+    def test_stop_after_the_loop_has_closed(self):
+        pool = ConnectorPool([EndingConnector("stock_market", "http://127.0.0.1:9/")]).start()
+        pool._thread.join(5)
+        self.assertFalse(pool._thread.is_alive())
+        pool.stop(timeout=5)
+        pool.stop(timeout=5)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+"""PipelineEngine with its stages in worker processes"""
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from omnistream.engine import PipelineEngine
+from omnistream.entities import EntityIndex
+
+
+class ProcessModeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="omnistream-test-")
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def run_engine(self, until, deadline=30.0):
+        engine = PipelineEngine(tick_interval=0.2, workers=2, entity_dir=self.directory)
+        engine.start()
+        started = time.monotonic()
+        try:
+            while not until(engine.snapshot()) and time.monotonic() - started < deadline:
+                time.sleep(0.2)
+        finally:
+            engine.stop(timeout=10)
+        return engine.snapshot()
+
+    def test_entities_learnt_by_workers_are_saved(self):
+        state = self.run_engine(lambda state: state["entity_stats"]["entities"] > 0)
+        self.assertGreater(state["entity_stats"]["entities"], 0)
+        self.assertIsNone(state["entity_stats"]["save_error"])
+        self.assertTrue(os.path.exists(os.path.join(self.directory, "CURRENT")))
+        self.assertEqual(len(EntityIndex.open(self.directory)), state["entity_stats"]["entities"])
+
+    def test_stage_counters_come_back_from_workers(self):
+        counted = ("entity_stats", "geo_stats", "calendar_stats")
+        state = self.run_engine(lambda state: all(state[name]["records"] > 0 for name in counted))
+        for name in counted:
+            with self.subTest(stats=name):
+                self.assertGreater(state[name]["records"], 0)
+                self.assertGreater(state[name]["us_per_record"], 0)
+        self.assertGreater(state["geo_stats"]["cells"], 0)
+        self.assertGreater(state["entity_stats"]["keys_resolved"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
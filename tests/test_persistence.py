@@ -0,0 +1,47 @@
+"""WriteBehindWriter against SQLite databases that can and cannot be opened"""
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from datetime import datetime
+
+from omnistream.persistence import WriteBehindWriter
+
+ROW = {"recorded_at": datetime(2026, 1, 1), "metric": "records_per_second", "value": 1.0}
+
+
+class WriteBehindWriterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="omnistream-test-")
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def write(self, url, rows=3):
+        writer = WriteBehindWriter(url, flush_interval=0.05)
+        started = time.perf_counter()
+        writer.start()
+        start_s = time.perf_counter() - started
+        for _ in range(rows):
+            writer.submit("metrics", dict(ROW))
+        writer.stop(timeout=10)
+        return writer.stats(), start_s
+
+    def test_rows_reach_the_database(self):
+        stats, _ = self.write(f"sqlite:///{self.directory}/omnistream.db")
+        self.assertTrue(stats["schema_ready"])
+        self.assertEqual(stats["rows_written"], 3)
+        self.assertEqual(stats["schema_errors"], 0)
+
+    def test_unreachable_database_does_not_fail_start(self):
+        stats, start_s = self.write(f"sqlite:///{os.path.join(self.directory, 'missing', 'omnistream.db')}")
+        self.assertLess(start_s, 0.5)
+        self.assertFalse(stats["schema_ready"])
+        self.assertGreater(stats["schema_errors"], 0)
+        self.assertIn("OperationalError", stats["last_error"])
+        self.assertEqual(stats["rows_dropped"], 3)
+        self.assertEqual(stats["rows_written"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+"""QualityEngine on batches that lack columns its rules check, and the freshness rule's reference time"""
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from omnistream.quality import QualityEngine
+from omnistream.sources import BatchGenerator
+
+SOURCES = ["stock_market", "weather_data", "retail_transactions", "iot_sensors", "social_media"]
+
+
+class MissingColumnTest(unittest.TestCase):
+
+    def test_every_rule_tolerates_a_missing_column(self):
+        engine = QualityEngine()
+        now = np.datetime64(datetime.now(), "ms")
+        for source_id in SOURCES:
+            batch = BatchGenerator(source_id, seed=1).generate(200, datetime.now())
+            rejected, counts = engine.evaluate(batch, source_id, now)
+            # The generator's defects give the unrelated rules something to find
+            self.assertGreater(sum(counts.values()), 0)
+            for column in batch.columns:
+                with self.subTest(source=source_id, column=column):
+                    dropped, dropped_counts = engine.evaluate(batch.drop(columns=[column]), source_id, now)
+                    self.assertEqual(set(dropped_counts), set(counts))
+                    required = False
+                    for rule in engine.plan(source_id):
+                        if column not in rule.columns(source_id):
+                            # Rules that never read the column are unaffected
+                            self.assertEqual(dropped_counts[rule.rule_id], counts[rule.rule_id], rule.rule_id)
+                        elif rule.kind == "completeness":
+                            required = True
+                            self.assertEqual(dropped_counts[rule.rule_id], len(batch), rule.rule_id)
+                        else:
+                            # Other rules skip the column rather than fail the batch
+                            self.assertLessEqual(dropped_counts[rule.rule_id], counts[rule.rule_id], rule.rule_id)
+                    if required:
+                        self.assertEqual(int(dropped.sum()), len(batch))
+                    else:
+                        self.assertFalse((dropped & ~rejected).any())
+                        self.assertLess(int(dropped.sum()), len(batch))
+                    valid, errors = engine.validate(batch.drop(columns=[column]), source_id)
+                    self.assertEqual(errors, int(dropped.sum()))
+                    self.assertEqual(len(valid), len(batch) - errors)
+
+
+class FreshnessTest(unittest.TestCase):
+
+    def stale_rows(self, event_age, fetched_age):
+        now = datetime.now()
+        batch = BatchGenerator("stock_market", seed=1).generate(50, now - event_age)
+        batch["fetched_at"] = np.datetime64(now - fetched_age, "ms")
+        _, counts = QualityEngine().evaluate(batch, "stock_market")
+        return counts["QR-004"]
+
+    def test_measured_against_fetch_time(self):
+        # Stale when fetched, however recently
+        self.assertEqual(self.stale_rows(timedelta(minutes=20), timedelta(0)), 50)
+        # Fresh when fetched, however long ago
+        self.assertEqual(self.stale_rows(timedelta(minutes=20), timedelta(minutes=20)), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
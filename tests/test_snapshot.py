@@ -0,0 +1,47 @@
+"""PipelineEngine's published snapshot: copied outside the engine lock, shared until the state changes"""
+import copy
+import unittest
+from unittest import mock
+
+from omnistream.engine import PipelineEngine
+
+real_deepcopy = copy.deepcopy
+
+
+class SnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = PipelineEngine()
+        self.addCleanup(self.engine.stop)
+        self.engine.tick()
+
+    def test_copied_without_the_engine_lock(self):
+        held = []
+
+        def deepcopy(value, *args, **kwargs):
+            held.append(self.engine._lock.locked())
+            return real_deepcopy(value, *args, **kwargs)
+
+        with mock.patch("omnistream.engine.copy.deepcopy", deepcopy):
+            self.engine.snapshot()
+        self.assertTrue(held)
+        self.assertFalse(any(held))
+
+    def test_shared_until_the_state_changes(self):
+        first = self.engine.snapshot()
+        self.assertIs(self.engine.snapshot(), first)
+        source_id = next(iter(first["data_sources"]))
+        status = first["data_sources"][source_id]["status"]
+
+        self.engine.data_sources[source_id]["status"] = "changed"
+        self.engine.tick()
+        second = self.engine.snapshot()
+        self.assertIsNot(second, first)
+        self.assertGreater(second["versions"]["snapshot"], first["versions"]["snapshot"])
+        self.assertEqual(second["tick_count"], first["tick_count"] + 1)
+        # The earlier snapshot kept the values it was built from
+        self.assertEqual(first["data_sources"][source_id]["status"], status)
+
+
+if __name__ == "__main__":
+    unittest.main()
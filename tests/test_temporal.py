@@ -0,0 +1,39 @@
+"""CalendarEnricher on event times outside its tables"""
+import unittest
+from datetime import datetime
+
+import pandas as pd
+
+from omnistream.temporal import CalendarEnricher
+
+
+class CalendarEnricherTest(unittest.TestCase):
+
+    def enrich(self, enricher, times):
+        batch = pd.DataFrame({"event_time": pd.to_datetime(pd.Series(times, dtype="object"))})
+        return enricher(batch, "weather")[0]
+
+    def test_missing_times_are_left_untagged(self):
+        enricher = CalendarEnricher(source_zone="UTC")
+        year = datetime.now().year
+        batch = self.enrich(enricher, [datetime(year, 7, 1, 10), None])
+        self.assertEqual(batch["hour_of_day"].tolist(), [10, -1])
+        self.assertTrue(pd.isna(batch["event_time_utc"].iloc[1]))
+        self.assertTrue(pd.isna(batch["season"].iloc[1]))
+        self.assertFalse(batch["is_business_day"].iloc[1])
+        self.assertEqual(enricher.stats()["rebuilds"], 0)
+        self.assertEqual(enricher.stats()["untagged"], 1)
+
+    def test_table_stops_at_the_horizon(self):
+        enricher = CalendarEnricher(source_zone="UTC", horizon=3)
+        year = datetime.now().year
+        for _ in range(3):
+            batch = self.enrich(enricher, [datetime(2226, 1, 1), datetime(1900, 1, 1), datetime(year + 2, 6, 1, 9)])
+        self.assertEqual(enricher.stats()["years"], (year - 3, year + 3))
+        self.assertEqual(enricher.stats()["rebuilds"], 1)
+        self.assertEqual(batch["hour_of_day"].tolist(), [-1, -1, 9])
+        self.assertEqual(batch["season"].iloc[2], "summer")
+
+
+if __name__ == "__main__":
+    unittest.main()